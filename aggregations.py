@@ -0,0 +1,85 @@
+"""
+Grouped aggregation primitives shared by the metric, legacy and lineup code.
+"""
+import numpy as np
+import pandas as pd
+
+
+def group_sums(codes, n_groups, *columns):
+    """
+    Sum each of `columns` per integer group code in [0, n_groups).
+
+    Rows are stably sorted by group once, so each group is one contiguous
+    slice. Groups of the same size are gathered into one (groups x size)
+    matrix and reduced along its rows, which NumPy sums pairwise exactly as
+    Series.sum does on the group's rows, so every sum is bit-for-bit the
+    same. The only Python loop is over distinct group sizes. Codes are
+    narrowed first so NumPy can radix sort them.
+
+    Returns:
+        One float64 array of length n_groups per column
+    """
+    codes = codes.astype(np.min_scalar_type(max(n_groups - 1, 0)), copy=False)
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    # (groups, row positions in the sorted order) per distinct non-zero group size
+    blocks = []
+    for size in np.unique(counts[counts > 0]):
+        groups = np.flatnonzero(counts == size)
+        blocks.append((groups, order[starts[groups, None] + np.arange(size)]))
+    sums = []
+    for values in columns:
+        group_sum = np.zeros(n_groups, dtype='float64')
+        for groups, rows in blocks:
+            group_sum[groups] = np.add.reduce(values[rows], axis=1)
+        sums.append(group_sum)
+    return sums
+
+
+def grouped_weighted_mean(values, weights, by=None, positive_weights=True,
+                          full_denominator=False, fill_value=np.nan):
+    """
+    Weighted mean of `values` within each group of `by`, broadcast back to every row.
+
+    Args:
+        values: Values to average
+        weights: Weight per row
+        by: Group key per row; None treats all rows as one group
+        positive_weights: Leave out rows whose weight is not > 0
+        full_denominator: Divide by the sum of every non-NaN weight in the
+            group rather than only the weights of rows that were kept
+        fill_value: Result for groups whose weight sum is zero
+
+    Rows with a NaN value or weight never contribute to the numerator, and
+    rows with a NaN key get NaN.
+
+    Returns:
+        NumPy array aligned with `values`
+    """
+    values = np.asarray(values, dtype='float64')
+    weights = np.asarray(weights, dtype='float64')
+    if by is None:
+        codes, n_groups = np.zeros(len(values), dtype=np.intp), 1
+    else:
+        codes, uniques = pd.factorize(np.asarray(by))
+        n_groups = len(uniques)
+
+    products = values * weights
+    keep = ~np.isnan(products) & (codes >= 0)
+    if positive_weights:
+        keep &= weights > 0
+    if full_denominator:
+        # Series.sum over the group's weight column: NaN weights count as zero
+        rows = codes >= 0
+        den_weights = np.where(np.isnan(weights), 0.0, weights)
+        if positive_weights:
+            den_weights = np.where(weights > 0, den_weights, 0.0)
+        numerator, = group_sums(codes[keep], n_groups, products[keep])
+        denominator, = group_sums(codes[rows], n_groups, den_weights[rows])
+    else:
+        numerator, denominator = group_sums(codes[keep], n_groups, products[keep], weights[keep])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(denominator == 0, fill_value, numerator / denominator)
+    return np.append(mean, np.nan)[codes]
@@ -1,12 +1,18 @@
+import argparse
 import pandas as pd
-import requests
 import os
 import time
 import random
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Lock
 
+import perf_profile
+from perf_trace import traced
+
+@traced()
 def scrape_pbp_data(max_workers=5):
+    import requests
+
     # 1. Setup Input/Output
     input_file = 'data/wnba_game_dates.csv'
     output_dir = 'pbp_data'
@@ -157,6 +163,15 @@ def scrape_pbp_data(max_workers=5):
 
     print(f"\nScrape complete! Success: {success_count}, Failed: {fail_count}")
 
-if __name__ == "__main__":
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch the play-by-play of every game in data/wnba_game_dates.csv.")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
     # Adjust max_workers based on your needs (5-10 is usually safe)
-    scrape_pbp_data(max_workers=1)
\ No newline at end of file
+    scrape_pbp_data(max_workers=1)
+
+
+if __name__ == "__main__":
+    main()
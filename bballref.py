@@ -1,25 +1,25 @@
+import argparse
 import pandas as pd
 import os
 import time
-import requests
-from bs4 import BeautifulSoup
+
+import perf_profile
+from perf_trace import traced
 
 years = list(range(2009, 2026))
 
 base_reg = "https://www.basketball-reference.com/wnba/years/{}_totals.html"
 base_ps  = "https://www.basketball-reference.com/wnba/playoffs/{}_totals.html"
 
-os.makedirs("data", exist_ok=True)
-
 HEADERS = {
     "User-Agent": "Mozilla/5.0"
 }
 
-def scrape_table_with_links(url):
-    r = requests.get(url, headers=HEADERS)
-    r.raise_for_status()
+def parse_totals_table(html):
+    """The totals table of a Basketball Reference page, with each player's link and id."""
+    from bs4 import BeautifulSoup
 
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = BeautifulSoup(html, "html.parser")
     table = soup.find("table", id="totals")
 
     # Get column headers
@@ -91,35 +91,59 @@ def scrape_table_with_links(url):
         for h in hrefs
     ]
     df["player_id"] = player_ids
+    return df
 
+
+@traced()
+def scrape_table_with_links(url):
+    import requests
+
+    r = requests.get(url, headers=HEADERS)
+    r.raise_for_status()
+
+    df = parse_totals_table(r.text)
     print(df)
     return df
 
-for year in years:
-    print(f"\n--- {year} ---")
-
-    # ---------- Regular Season ----------
-    try:
-        reg_url = base_reg.format(year)
-        reg_df = scrape_table_with_links(reg_url)
-        reg_out = f"data/{year}_bballref.csv"
-        reg_df.to_csv(reg_out, index=False)
-        print(f"Saved regular → {reg_out}")
-    except Exception as e:
-        print(f"Regular season failed for {year}: {e}")
-
-    time.sleep(2)
-
-    # ---------- Playoffs ----------
-    try:
-        ps_url = base_ps.format(year)
-        ps_df = scrape_table_with_links(ps_url)
-        ps_out = f"data/{year}ps_bballref.csv"
-        ps_df.to_csv(ps_out, index=False)
-        print(f"Saved playoffs → {ps_out}")
-    except Exception as e:
-        print(f"Playoffs failed for {year}: {e}")
-
-    time.sleep(2)
-
-print("\nDone.")
\ No newline at end of file
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape Basketball Reference season and playoff totals.")
+    parser.add_argument('--years', type=int, nargs='+', default=years,
+                        help="seasons to scrape, regular season and playoffs (default 2009-2025)")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
+    os.makedirs("data", exist_ok=True)
+
+    for year in args.years:
+        print(f"\n--- {year} ---")
+
+        # ---------- Regular Season ----------
+        try:
+            reg_url = base_reg.format(year)
+            reg_df = scrape_table_with_links(reg_url)
+            reg_out = f"data/{year}_bballref.csv"
+            reg_df.to_csv(reg_out, index=False)
+            print(f"Saved regular → {reg_out}")
+        except Exception as e:
+            print(f"Regular season failed for {year}: {e}")
+
+        time.sleep(2)
+
+        # ---------- Playoffs ----------
+        try:
+            ps_url = base_ps.format(year)
+            ps_df = scrape_table_with_links(ps_url)
+            ps_out = f"data/{year}ps_bballref.csv"
+            ps_df.to_csv(ps_out, index=False)
+            print(f"Saved playoffs → {ps_out}")
+        except Exception as e:
+            print(f"Playoffs failed for {year}: {e}")
+
+        time.sleep(2)
+
+    print("\nDone.")
+
+
+if __name__ == "__main__":
+    main()
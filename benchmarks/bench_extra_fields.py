@@ -0,0 +1,55 @@
+"""
+Benchmark merge_data.extra_fields per season: wall time and peak traced
+memory. Inputs are the checked-in {year}{ps}_combined.csv files with their
+derived columns stripped off again.
+"""
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_match_players import DATA_DIR
+from merge_data import extra_fields
+
+
+def season_inputs(data_folder=DATA_DIR):
+    seasons = []
+    for f in sorted(os.listdir(data_folder)):
+        match = re.match(r'(\d+)(ps)?_combined\.csv$', f)
+        if match:
+            df = pd.read_csv(os.path.join(data_folder, f))
+            seasons.append((f"{match.group(1)}{match.group(2) or ''}", df.loc[:, :'basic_TOVPG']))
+    return seasons
+
+
+def measure(df, avg, repeat=5, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            extra_fields(df, avg_shooting_df=avg, **kwargs)
+            best = min(best, time.perf_counter() - start)
+        tracemalloc.start()
+        extra_fields(df, avg_shooting_df=avg, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return best, peak
+
+
+if __name__ == "__main__":
+    avg = pd.read_csv(os.path.join(DATA_DIR, 'avg_shooting.csv'))
+    kwargs = {'outputs': sys.argv[1:]} if len(sys.argv) > 1 else {}
+    total_time, max_peak = 0.0, 0
+    for label, df in season_inputs():
+        best, peak = measure(df, avg, **kwargs)
+        total_time += best
+        max_peak = max(max_peak, peak)
+        print(f"{label:>7}: {df.shape[0]:>4} rows  {best * 1000:7.2f} ms  peak {peak / 2**20:6.2f} MiB")
+    print(f"  total: {total_time * 1000:.1f} ms, max peak {max_peak / 2**20:.2f} MiB")
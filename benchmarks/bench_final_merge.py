@@ -0,0 +1,95 @@
+"""
+Benchmark final_merge: the former pivot_table of on_off_master.csv plus a
+three-key string merge against the indexed join on the keyed wide table.
+A scratch copy first builds the master (merge_data) and both on/off files
+(lineup_calc); each variant is then timed and its peak traced allocation
+(tracemalloc) recorded, for the join alone and for the whole script, which
+is dominated by reading and writing the master. Both must add the same
+columns to the same rows.
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_merge_workers import REPO_DIR, scratch_copy
+from final_merge import join_on_off, merge_on_off, shooting_stats
+from lineup_calc import run_on_off_pipeline
+from merge_data import process_wnba_pipeline
+
+
+def pivot_join(master_df, on_off_path):
+    """The join step of final_merge.py before the wide table, kept as the reference."""
+    on_off_df = pd.read_csv(on_off_path)
+    on_off_df = on_off_df[~on_off_df.year_season.str.contains('2009')]
+    pivot_on_off = on_off_df.pivot_table(index=['player_id', 'team_id', 'year_season'], columns='status',
+                                         values=shooting_stats)
+    pivot_on_off.columns = [f"{col[0]}_{col[1]}" for col in pivot_on_off.columns]
+    pivot_on_off.reset_index(inplace=True)
+    pivot_on_off = pivot_on_off.rename(columns={'team_id': 'TeamId'})
+    pivot_on_off['year'] = pivot_on_off['year_season'].astype(str).str.extract(r'(\d+)').astype(int)
+    master_df = master_df.assign(
+        year_season_key=master_df['year'].astype(str) + master_df['is_playoffs'].map({True: 'ps', False: ''}))
+    final_master = pd.merge(master_df, pivot_on_off, left_on=['player_id', 'TeamId', 'year_season_key'],
+                            right_on=['player_id', 'TeamId', 'year_season'], how='left')
+    final_master = final_master.drop(columns=['year_season_key', 'year_x'])
+    final_master.rename(columns={'year_y': 'year'}, inplace=True)
+    return final_master
+
+
+def pivot_merge(master_path, on_off_path, new_path):
+    master_df = pd.read_csv(master_path)
+    master_df = master_df[master_df.year > 2009]
+    final_master = pivot_join(master_df, on_off_path)
+    final_master.to_csv(new_path, index=False)
+    return len(final_master)
+
+
+def measure(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / 2**20
+
+
+if __name__ == "__main__":
+    root = scratch_copy()
+    os.symlink(os.path.join(REPO_DIR, 'lineup_data'), os.path.join(root, 'lineup_data'))
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            process_wnba_pipeline(rebuild=True)
+            run_on_off_pipeline()
+        master_df = pd.read_csv('data/wnba_master.csv')
+        master_df = master_df[master_df.year > 2009]
+        join_times = [measure(pivot_join, master_df, 'data/on_off_master.csv'),
+                      measure(join_on_off, master_df, 'data/on_off_wide.csv')]
+        full_times = [measure(pivot_merge, 'data/wnba_master.csv', 'data/on_off_master.csv', 'data/old.csv'),
+                      measure(merge_on_off, 'data/wnba_master.csv', 'data/on_off_wide.csv', 'data/new.csv')]
+        old, new = pd.read_csv('data/old.csv'), pd.read_csv('data/new.csv')
+        assert list(old.columns) == list(new.columns) and len(old) == len(new)
+        stats = [c for c in new.columns if c.endswith(('_ON', '_OFF'))]
+        np.testing.assert_allclose(old[stats].to_numpy(), new[stats].to_numpy(), rtol=1e-12)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root)
+    print(f"{len(new)} master rows, {len(stats)} on/off columns")
+    for step, (old, new) in [('join only', join_times), ('full script', full_times)]:
+        print(f"{step}:")
+        print(f"  pivot + merge: {old[0] * 1000:8.1f} ms, peak {old[1]:6.1f} MiB")
+        print(f"  indexed join:  {new[0] * 1000:8.1f} ms, peak {new[1]:6.1f} MiB")
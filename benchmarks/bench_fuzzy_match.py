@@ -0,0 +1,83 @@
+"""
+Benchmark fuzzy_match.match_candidates against the nested SequenceMatcher
+loop it replaced, on the full roster history with perturbed names, replicated
+to emulate several leagues' worth of seasons.
+"""
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_match_players import load_seasons
+from fuzzy_match import match_candidates
+from name_normalization import normalize_name
+
+
+def perturb(name, rng):
+    """Swap one letter, the kind of spelling drift seen between sources."""
+    positions = [i for i, c in enumerate(name) if c.isalpha()]
+    if not positions:
+        return name
+    i = rng.choice(positions)
+    return name[:i] + rng.choice('aeiouy') + name[i + 1:]
+
+
+def roster_history(factor, seed=0):
+    rng = random.Random(seed)
+    ref_names, ref_blocks, pbp_names, pbp_blocks = [], [], [], []
+    for label, _, pbp in load_seasons():
+        names = [normalize_name(n) for n in pbp['Name']]
+        for k in range(factor):
+            block = f"{label}_{k}"
+            copy = [f"{name} {k}" if k else name for name in names]
+            pbp_names.extend(copy)
+            pbp_blocks.extend([block] * len(copy))
+            # Reference rows arrive in a different order from the PBP rows
+            rng.shuffle(copy)
+            ref_names.extend(perturb(name, rng) for name in copy)
+            ref_blocks.extend([block] * len(copy))
+    return ref_names, ref_blocks, pbp_names, pbp_blocks
+
+
+def nested_loop(ref_names, ref_blocks, pbp_names, pbp_blocks, threshold=0.85):
+    by_block = {}
+    for j, block in enumerate(pbp_blocks):
+        by_block.setdefault(block, []).append(j)
+    used, n = set(), 0
+    for i, name in enumerate(ref_names):
+        for j in by_block.get(ref_blocks[i], []):
+            if j in used:
+                continue
+            p = pbp_names[j]
+            if ((name in p or p in name) and len(name) > 5) or SequenceMatcher(None, name, p).ratio() > threshold:
+                used.add(j)
+                n += 1
+                break
+    return n
+
+
+def greedy(matches):
+    taken_ref, taken_pbp = set(), set()
+    for i, j, _, _ in matches:
+        if i not in taken_ref and j not in taken_pbp:
+            taken_ref.add(i)
+            taken_pbp.add(j)
+    return len(taken_ref)
+
+
+if __name__ == "__main__":
+    factors = [int(a) for a in sys.argv[1:]] or [1, 10]
+    for factor in factors:
+        args = roster_history(factor)
+        start = time.perf_counter()
+        n_indexed = greedy(match_candidates(*args))
+        t_indexed = time.perf_counter() - start
+        line = f"{factor:>3}x history ({len(args[0])} names): indexed {t_indexed:7.3f}s, {n_indexed} matches"
+        if factor == 1:
+            start = time.perf_counter()
+            n_nested = nested_loop(*args)
+            line += f" | nested {time.perf_counter() - start:7.3f}s, {n_nested} matches"
+        print(line)
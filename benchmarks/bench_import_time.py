@@ -0,0 +1,58 @@
+"""
+Benchmark the import time of every entry-point module.
+
+Each module is imported in a fresh interpreter under `python -X importtime`,
+from a scratch directory so nothing done at import time can touch the
+checked-in data, and the best cumulative time of its top-level import over a
+few runs is reported together with the heaviest third-party packages it
+pulled in.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_merge_workers import REPO_DIR
+
+MODULES = ['make_index', 'merge_data', 'lineup_calc', 'final_merge', 'lineup_combos', 'wowy', 'pipeline',
+           'bballref', 'wnba_totals', 'wnba_lineups', 'wnba_schedule', 'async_pbp_scrape', 'wnba_playbyplay',
+           'cli']
+HEAVY = ['pandas', 'numpy', 'scipy', 'requests', 'bs4', 'tqdm', 'plotly']
+
+
+def import_times(module, cwd):
+    """{imported module: cumulative seconds} for one fresh `import module`."""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, PYTHONDONTWRITEBYTECODE='1')
+    env.pop('PIPELINE_TRACE', None)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], cwd=cwd, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Keep the first (outermost) entry of a name
+        times.setdefault(name.strip(), int(cumulative) / 1e6)
+    return times
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    cwd = tempfile.mkdtemp(prefix='bench_import_')
+    print(f"{'module':<18} {'import s':>9}  heavy packages imported")
+    for module in MODULES:
+        if not os.path.exists(os.path.join(REPO_DIR, f"{module}.py")):
+            continue
+        runs = [import_times(module, cwd) for _ in range(repeat)]
+        runs = [r for r in runs if r is not None]
+        if not runs:
+            print(f"{module:<18} {'failed':>9}")
+            continue
+        best = min(runs, key=lambda r: r[module])
+        heavy = ', '.join(f"{name} {max(t for m, t in best.items() if m.split('.')[0] == name):.2f}"
+                          for name in HEAVY if name in best)
+        print(f"{module:<18} {best[module]:>9.3f}  {heavy}")
@@ -0,0 +1,68 @@
+"""
+Benchmark legacy/normalization.legacy_chain on the master. A scratch copy
+first builds the master (merge_data). The chain runs twice: with the inputs
+the WNBA master lacks left NaN, and with them filled by seeded random values
+(including zeros and NaN) so the hustle, on/off and playtype formulas run on
+real numbers. Reports the best time and the PerformanceWarnings pandas raised
+for fragmented frames. tests/test_legacy_normalization.py checks the values.
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'legacy'))
+
+from bench_merge_workers import scratch_copy
+from merge_data import process_wnba_pipeline
+from normalization import OPTIONAL_INPUTS, legacy_chain
+
+
+def with_tracking_inputs(master_df, seed=0):
+    rng = np.random.default_rng(seed)
+    values = {}
+    for col in OPTIONAL_INPUTS:
+        v = rng.uniform(0, 50, len(master_df))
+        v[rng.random(len(master_df)) < 0.05] = 0
+        v[rng.random(len(master_df)) < 0.1] = np.nan
+        values[col] = v
+    return master_df.assign(**values)
+
+
+def measure(func, df, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        frame = df.copy()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', pd.errors.PerformanceWarning)
+            start = time.perf_counter()
+            result = func(frame)
+            best = min(best, time.perf_counter() - start)
+    fragmented = sum(issubclass(w.category, pd.errors.PerformanceWarning) for w in caught)
+    return best, fragmented, result
+
+
+if __name__ == "__main__":
+    warnings.simplefilter('ignore', FutureWarning)
+    root = scratch_copy()
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            process_wnba_pipeline(rebuild=True)
+        master_df = pd.read_csv('data/wnba_master.csv')
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root)
+
+    for label, df in [('master', master_df), ('with tracking inputs', with_tracking_inputs(master_df))]:
+        seconds, fragmented, result = measure(legacy_chain, df)
+        print(f"{label}: {len(result)} rows, {result.shape[1] - df.shape[1]} columns added, "
+              f"{seconds * 1000:.1f} ms, {fragmented} PerformanceWarnings")
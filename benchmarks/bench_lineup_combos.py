@@ -0,0 +1,61 @@
+"""
+Benchmark lineup_combos over the whole lineup_data/ archive: loading, then the
+duo and trio reductions against a Python loop over each lineup's EntityId
+string that accumulates every combination's sums in a dict. Both must give
+identical sums and lineup counts.
+"""
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_merge_workers import REPO_DIR
+from lineup_combos import combination_table, load_archive, team_seasons
+
+
+def python_loop(players, season_codes, totals, size):
+    sums, counts = {}, {}
+    lineup_ids = ['-'.join(row) for row in players.astype(str)]
+    for lineup_id, code, row in zip(lineup_ids, season_codes, totals):
+        for combo in itertools.combinations(sorted(set(lineup_id.split('-')), key=int), size):
+            key = (code, combo)
+            if key in sums:
+                sums[key] += row
+                counts[key] += 1
+            else:
+                sums[key] = row.copy()
+                counts[key] = 1
+    return sums, counts
+
+
+if __name__ == "__main__":
+    cwd = os.getcwd()
+    os.chdir(REPO_DIR)
+    try:
+        start = time.perf_counter()
+        seasons = team_seasons()
+        players, season_codes, totals = load_archive(seasons)
+        load_time = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+    print(f"{len(seasons)} team-seasons, {len(players)} lineups, loaded in {load_time:.2f} s")
+
+    for size, name in [(2, 'duos'), (3, 'trios')]:
+        start = time.perf_counter()
+        members, codes, lineup_counts, sums = combination_table(players, season_codes, totals, size)
+        new_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loop_sums, loop_counts = python_loop(players, season_codes, totals, size)
+        old_time = time.perf_counter() - start
+
+        assert len(loop_sums) == len(members)
+        for k, (member_row, code) in enumerate(zip(members.astype(str), codes)):
+            key = (code, tuple(member_row))
+            assert loop_counts[key] == lineup_counts[k] and np.array_equal(loop_sums[key], sums[k])
+        print(f"{name}: {len(members)} combinations, python loop {old_time:6.2f} s, "
+              f"grouped reduction {new_time:6.3f} s ({old_time / new_time:.0f}x)")
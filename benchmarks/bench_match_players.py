@@ -0,0 +1,61 @@
+"""
+Benchmark make_index.match_players on the real seasons and on synthetic
+rosters scaled up by replicating every season N times.
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import make_index
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+def load_seasons(data_folder=DATA_DIR):
+    seasons = []
+    for yr in range(2009, 2026):
+        for suffix in ['', 'ps']:
+            f_ref = os.path.join(data_folder, f"{yr}{suffix}_bballref.csv")
+            f_pbp = os.path.join(data_folder, f"{yr}{suffix}_pbp.csv")
+            if os.path.exists(f_ref) and os.path.exists(f_pbp):
+                seasons.append((f"{yr}{suffix}", pd.read_csv(f_ref), pd.read_csv(f_pbp)))
+    return seasons
+
+
+def scale_roster(df_ref, df_pbp, factor):
+    """Replicate a season `factor` times with distinct ids and names per copy."""
+    refs, pbps = [], []
+    for k in range(factor):
+        ref = df_ref.copy()
+        pbp = df_pbp.copy()
+        if k:
+            ref['player_id'] = ref['player_id'].astype(str) + f"_{k}"
+            ref['player'] = ref['player'] + f" {k}"
+            pbp['EntityId'] = pbp['EntityId'] + k * 10_000_000
+            pbp['Name'] = pbp['Name'] + f" {k}"
+        refs.append(ref)
+        pbps.append(pbp)
+    return pd.concat(refs, ignore_index=True), pd.concat(pbps, ignore_index=True)
+
+
+def run(seasons, factor):
+    make_index.global_id_map.clear()
+    scaled = [(label, *scale_roster(ref, pbp, factor)) for label, ref, pbp in seasons]
+    start = time.perf_counter()
+    n_matches = 0
+    for label, ref, pbp in scaled:
+        m, _ = make_index.match_players(ref, pbp, label)
+        n_matches += len(m)
+    return time.perf_counter() - start, n_matches
+
+
+if __name__ == "__main__":
+    factors = [int(a) for a in sys.argv[1:]] or [1, 10]
+    seasons = load_seasons()
+    for factor in factors:
+        elapsed, n_matches = run(seasons, factor)
+        print(f"{factor:>3}x rosters: {elapsed:8.3f}s  ({n_matches} matches over {len(seasons)} seasons)")
@@ -0,0 +1,64 @@
+"""
+Benchmark peak RSS of a full merge_data.py rebuild, run as a child process
+in a scratch copy of the inputs. --scale N repeats every season's players N
+times under fresh ids so the master grows while each season stays a season.
+Pass another checkout's directory to measure its merge_data.py instead.
+"""
+import argparse
+import glob
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from bench_merge_workers import REPO_DIR, scratch_copy
+
+ENTITY_OFFSET = 10 ** 8
+
+
+def scale_inputs(root, scale):
+    for path in glob.glob(os.path.join(root, 'data', '*_bballref.csv')):
+        df = pd.read_csv(path)
+        pd.concat([df.assign(player_id=df['player_id'] + ('' if k == 0 else f'_{k}')) for k in range(scale)]
+                  ).to_csv(path, index=False)
+    for path in glob.glob(os.path.join(root, 'data', '*_pbp.csv')):
+        if os.path.basename(path).startswith('team_'):
+            continue
+        df = pd.read_csv(path)
+        pd.concat([df.assign(EntityId=df['EntityId'] + k * ENTITY_OFFSET) for k in range(scale)]
+                  ).to_csv(path, index=False)
+    index_path = os.path.join(root, 'player_index_map.csv')
+    index = pd.read_csv(index_path)
+    pd.concat([index.assign(player_id=index['player_id'] + ('' if k == 0 else f'_{k}'),
+                            EntityId=index['EntityId'] + k * ENTITY_OFFSET) for k in range(scale)]
+              ).to_csv(index_path, index=False)
+
+
+def measure(code_dir, scale=1, workers=1):
+    root = scratch_copy()
+    try:
+        if scale > 1:
+            scale_inputs(root, scale)
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(code_dir, 'merge_data.py'), '--rebuild',
+                        '--workers', str(workers)],
+                       cwd=root, check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        master_mib = os.path.getsize(os.path.join(root, 'data', 'wnba_master.csv')) / 2**20
+    finally:
+        shutil.rmtree(root)
+    # ru_maxrss is in KiB on Linux and covers the largest child waited for so far
+    return elapsed, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, master_mib
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('code_dir', nargs='?', default=REPO_DIR)
+    parser.add_argument('--scale', type=int, default=1)
+    args = parser.parse_args()
+    elapsed, peak, master_mib = measure(os.path.abspath(args.code_dir), args.scale)
+    print(f"scale {args.scale}: {elapsed:.2f} s, master {master_mib:.0f} MiB on disk, peak RSS {peak:.0f} MiB")
@@ -0,0 +1,48 @@
+"""
+Benchmark merge_data.process_wnba_pipeline wall time for 1/2/4/8 workers.
+Inputs are copied into a scratch directory so the checked-in combined files
+are never rewritten.
+"""
+import contextlib
+import glob
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_match_players import DATA_DIR
+from merge_data import process_wnba_pipeline
+
+REPO_DIR = os.path.dirname(DATA_DIR)
+
+
+def scratch_copy():
+    root = tempfile.mkdtemp(prefix='bench_merge_')
+    os.mkdir(os.path.join(root, 'data'))
+    for pattern in ['*_bballref.csv', '*_pbp.csv']:
+        for path in glob.glob(os.path.join(DATA_DIR, pattern)):
+            shutil.copy(path, os.path.join(root, 'data'))
+    shutil.copy(os.path.join(REPO_DIR, 'player_index_map.csv'), root)
+    return root
+
+
+if __name__ == "__main__":
+    worker_counts = [int(w) for w in sys.argv[1:]] or [1, 2, 4, 8]
+    root = scratch_copy()
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        print(f"{os.cpu_count()} CPUs available")
+        for workers in worker_counts:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                rows = process_wnba_pipeline(workers=workers, rebuild=True)
+            elapsed = time.perf_counter() - start
+            print(f"{workers} worker(s): {elapsed:6.2f} s  ({rows} rows)")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root)
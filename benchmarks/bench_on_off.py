@@ -0,0 +1,74 @@
+"""
+Benchmark the ON/OFF totals step of lineup_calc.run_on_off_pipeline over every
+team-season in lineup_data/: the old per-player string-split mask plus two
+df[mask].sum() calls against one sparse membership product per team-season.
+File loading is excluded. Count columns are checked for exact equality, the
+summed rate columns (unused downstream) to within rounding.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_merge_workers import REPO_DIR
+from lineup_calc import load_lineups, membership_matrix, on_off_totals
+
+
+def load_team_seasons():
+    index = pd.read_csv(os.path.join(REPO_DIR, 'player_index_map.csv'))
+    cwd = os.getcwd()
+    os.chdir(REPO_DIR)
+    try:
+        team_seasons = []
+        for (year_season, team_id), players in index.groupby(['year_season', 'team_id']):
+            df = load_lineups(year_season, team_id)
+            if df is not None:
+                team_seasons.append((df, players['EntityId'].astype(str).tolist()))
+    finally:
+        os.chdir(cwd)
+    return team_seasons
+
+
+def masked_sums(df, player_ids):
+    results = []
+    for eid in player_ids:
+        on_mask = df['EntityId'].astype(str).apply(lambda x: eid in x.split('-'))
+        results.append([df[mask].sum(numeric_only=True).to_numpy(dtype='float64') if mask.any() else None
+                        for mask in (on_mask, ~on_mask)])
+    return results
+
+
+def sparse_sums(df, player_ids):
+    membership = membership_matrix(df['EntityId'].astype(str).tolist(), player_ids)
+    return on_off_totals(df, membership)
+
+
+if __name__ == "__main__":
+    team_seasons = load_team_seasons()
+    n_players = sum(len(players) for _, players in team_seasons)
+    n_lineups = sum(len(df) for df, _ in team_seasons)
+    print(f"{len(team_seasons)} team-seasons, {n_players} players, {n_lineups} lineups")
+
+    start = time.perf_counter()
+    old = [masked_sums(df, players) for df, players in team_seasons]
+    old_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = [sparse_sums(df, players) for df, players in team_seasons]
+    new_time = time.perf_counter() - start
+
+    for (df, _), rows, (columns, on_totals, off_totals, on_counts) in zip(team_seasons, old, new):
+        values = df[columns].to_numpy(dtype='float64', na_value=0.0)
+        counts = (values == np.round(values)).all(axis=0)
+        for k, (on, off) in enumerate(rows):
+            assert (on is None) == (on_counts[k] == 0) and (off is None) == (on_counts[k] == len(df))
+            for expected, got in ((on, on_totals[k]), (off, off_totals[k])):
+                if expected is not None:
+                    assert np.array_equal(expected[counts], got[counts])
+                    np.testing.assert_allclose(expected, got, rtol=1e-9, atol=1e-9)
+    print(f"per-player masks: {old_time:7.2f} s")
+    print(f"sparse M @ X:     {new_time:7.2f} s  ({old_time / new_time:.0f}x)")
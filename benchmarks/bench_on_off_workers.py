@@ -0,0 +1,50 @@
+"""
+Benchmark lineup_calc.run_on_off_pipeline wall time for 1/2/4/8 workers over
+the full lineup_data/. Runs in a scratch directory that links lineup_data/ so
+the checked-in on_off_master.csv is never rewritten; every run must write the
+same file.
+"""
+import contextlib
+import filecmp
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_merge_workers import REPO_DIR
+from lineup_calc import run_on_off_pipeline
+
+
+def scratch_dir():
+    root = tempfile.mkdtemp(prefix='bench_on_off_')
+    os.mkdir(os.path.join(root, 'data'))
+    os.symlink(os.path.join(REPO_DIR, 'lineup_data'), os.path.join(root, 'lineup_data'))
+    shutil.copy(os.path.join(REPO_DIR, 'player_index_map.csv'), root)
+    return root
+
+
+if __name__ == "__main__":
+    worker_counts = [int(w) for w in sys.argv[1:]] or [1, 2, 4, 8]
+    root = scratch_dir()
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        print(f"{os.cpu_count()} CPUs available")
+        reference = None
+        for workers in worker_counts:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                run_on_off_pipeline(workers=workers)
+            elapsed = time.perf_counter() - start
+            output = os.path.join('data', f'on_off_master_{workers}.csv')
+            os.replace(os.path.join('data', 'on_off_master.csv'), output)
+            reference = reference or output
+            assert filecmp.cmp(reference, output, shallow=False)
+            print(f"{workers} worker(s): {elapsed:6.2f} s")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root)
@@ -0,0 +1,72 @@
+"""
+Benchmark make_index.stats_candidates (the pass-4 tolerance join) against
+per-player boolean masking, on a real season padded with thousands of
+synthetic unmatched players.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_match_players import DATA_DIR
+from make_index import stats_candidates
+
+
+def synthetic_season(n_extra, seed=0):
+    rng = np.random.default_rng(seed)
+    ref = pd.read_csv(os.path.join(DATA_DIR, '2025_bballref.csv'))
+    pbp = pd.read_csv(os.path.join(DATA_DIR, '2025_pbp.csv'))
+    teams = pbp['TeamAbbreviation'].unique()
+    games = rng.integers(1, 45, n_extra)
+    minutes = rng.integers(0, 1500, n_extra)
+    points = rng.integers(0, 800, n_extra)
+    extra_team = rng.choice(np.append(teams, 'TOT'), n_extra)
+    extra_ref = pd.DataFrame({
+        'team': extra_team, 'g': games, 'mp': minutes, 'pts': points,
+    })
+    extra_pbp = pd.DataFrame({
+        'TeamAbbreviation': np.where(extra_team == 'TOT', rng.choice(teams, n_extra), extra_team),
+        'GamesPlayed': games,
+        'Minutes': minutes + rng.integers(-6, 7, n_extra),
+        'Points': points + rng.integers(-3, 4, n_extra),
+    })
+    ref = pd.concat([ref[['team', 'g', 'mp', 'pts']], extra_ref], ignore_index=True)
+    ref['team_mapped'] = ref['team'].replace({'SAS': 'SAN'})
+    pbp = pd.concat([pbp[['TeamAbbreviation', 'GamesPlayed', 'Minutes', 'Points']], extra_pbp], ignore_index=True)
+    return ref.to_dict('records'), pbp
+
+
+def masked(ref_rows, df_pbp):
+    pairs = {}
+    for i, row in enumerate(ref_rows):
+        potential = df_pbp
+        if row['team'] != 'TOT':
+            potential = potential[potential['TeamAbbreviation'] == row['team_mapped']]
+        stat_match = potential[
+            (potential['GamesPlayed'] == row['g']) &
+            (abs(potential['Minutes'] - row['mp']) <= 5) &
+            (abs(potential['Points'] - row['pts']) <= 2)
+        ]
+        if len(stat_match):
+            pairs[i] = stat_match.index.tolist()
+    return pairs
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 5000, 20000]
+    for n_extra in sizes:
+        ref_rows, df_pbp = synthetic_season(n_extra)
+        start = time.perf_counter()
+        joined = stats_candidates(ref_rows, df_pbp.to_dict('records'))
+        t_join = time.perf_counter() - start
+        line = f"+{n_extra:>6} players: tolerance join {t_join:7.3f}s"
+        if n_extra <= 5000:
+            start = time.perf_counter()
+            reference = masked(ref_rows, df_pbp)
+            line += f" | per-player masks {time.perf_counter() - start:7.3f}s"
+            assert joined == reference, "candidate sets differ"
+        print(line)
@@ -0,0 +1,61 @@
+"""
+Benchmark per-year weighted averages on a synthetic master frame: the
+checked-in {year}{ps}_combined.csv files stacked and repeated (100x by
+default), comparing the old groupby('year').apply pattern against
+aggregations.grouped_weighted_mean.
+"""
+import glob
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aggregations import grouped_weighted_mean
+from bench_match_players import DATA_DIR
+
+PAIRS = [('mod_ts', 'TSA'), ('2TS_percent', '2TSA'), ('3TS_percent', '3TSA')]
+
+
+def synthetic_master(scale, data_folder=DATA_DIR):
+    columns = ['year'] + [c for pair in PAIRS for c in pair]
+    frames = [pd.read_csv(f, usecols=columns) for f in sorted(glob.glob(os.path.join(data_folder, '*_combined.csv')))]
+    master = pd.concat(frames * scale, ignore_index=True)
+    return master.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def groupby_apply(df, value_col, weight_col):
+    mask = (~np.isnan(df[value_col])) & (df[weight_col] > 0)
+    grouped = df[mask].groupby('year')
+    weighted_sum = grouped.apply(lambda x: (x[value_col] * x[weight_col]).sum())
+    return df['year'].map(weighted_sum / grouped[weight_col].sum()).to_numpy()
+
+
+def primitive(df, value_col, weight_col):
+    return grouped_weighted_mean(df[value_col], df[weight_col], by=df['year'])
+
+
+def timed(func, df, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [func(df, v, w) for v, w in PAIRS]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+if __name__ == "__main__":
+    warnings.simplefilter('ignore', FutureWarning)
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    df = synthetic_master(scale)
+    print(f"{scale}x master: {len(df)} rows, {df['year'].nunique()} years, {len(PAIRS)} averages")
+    old_time, old = timed(groupby_apply, df)
+    new_time, new = timed(primitive, df)
+    for a, b in zip(old, new):
+        np.testing.assert_allclose(a, b, rtol=1e-12)
+    print(f"groupby.apply:         {old_time * 1000:8.1f} ms")
+    print(f"grouped_weighted_mean: {new_time * 1000:8.1f} ms  ({old_time / new_time:.1f}x)")
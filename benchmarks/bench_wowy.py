@@ -0,0 +1,78 @@
+"""
+Benchmark wowy.WowyIndex over every team-season in lineup_data/: index build
+time, single two-player queries against the old EntityId string match plus
+df[mask].sum(), and the all-pairs batch. Single-player queries are checked
+against the on/off pipeline's ON and OFF rows.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_merge_workers import REPO_DIR
+from lineup_calc import calculate_basketball_percentages, load_lineups, process_team_season
+from wowy import WowyIndex
+
+
+def string_match_query(df, eid_a, eid_b):
+    """Lineups with both players, the way one-off scripts filter them today."""
+    both = df['EntityId'].astype(str).apply(lambda x: eid_a in x.split('-') and eid_b in x.split('-'))
+    return calculate_basketball_percentages(pd.DataFrame([df[both].sum(numeric_only=True)]))
+
+
+def check_against_on_off(wowy, year_season, team_id, players):
+    rows = pd.DataFrame(process_team_season((year_season, team_id, players)))
+    for row in rows.itertuples(index=False):
+        on, off = ([row.player_id], []) if row.status == 'ON' else ([], [row.player_id])
+        got = wowy.query(on, off)
+        for metric in ['FGA', 'TsPct', 'ORtg', 'DRtg', 'AtRimFrequency', 'OffFGReboundPct', 'DefTwoPtReboundPct']:
+            np.testing.assert_allclose(got[metric], getattr(row, metric), rtol=1e-9, atol=1e-12)
+
+
+if __name__ == "__main__":
+    index = pd.read_csv(os.path.join(REPO_DIR, 'player_index_map.csv'))
+    cwd = os.getcwd()
+    os.chdir(REPO_DIR)
+    try:
+        build_time = query_time = old_time = pairs_time = 0.0
+        n_teams = n_queries = n_old = n_pair_rows = 0
+        for (year_season, team_id), group in index.groupby(['year_season', 'team_id']):
+            players = group[['player_id', 'EntityId']]
+            lineups = load_lineups(year_season, team_id)
+            if lineups is None or len(players) < 2:
+                continue
+            start = time.perf_counter()
+            wowy = WowyIndex(lineups, players)
+            build_time += time.perf_counter() - start
+            n_teams += 1
+
+            pairs = list(zip(wowy.player_ids[:-1], wowy.player_ids[1:]))
+            start = time.perf_counter()
+            for a, b in pairs:
+                wowy.query([a, b])
+            query_time += time.perf_counter() - start
+            n_queries += len(pairs)
+
+            eids = players['EntityId'].astype(str).tolist()
+            start = time.perf_counter()
+            string_match_query(lineups, eids[0], eids[1])
+            old_time += time.perf_counter() - start
+            n_old += 1
+
+            start = time.perf_counter()
+            n_pair_rows += len(wowy.pairs())
+            pairs_time += time.perf_counter() - start
+
+            check_against_on_off(wowy, year_season, team_id, players)
+    finally:
+        os.chdir(cwd)
+
+    print(f"{n_teams} team-seasons")
+    print(f"index build:        {build_time / n_teams * 1000:8.3f} ms per team-season")
+    print(f"string-match query: {old_time / n_old * 1000:8.3f} ms per query")
+    print(f"bitmask query:      {query_time / n_queries * 1000:8.3f} ms per query ({n_queries} queries)")
+    print(f"all pairs:          {pairs_time / n_teams * 1000:8.3f} ms per team-season ({n_pair_rows} split rows)")
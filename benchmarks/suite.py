@@ -0,0 +1,298 @@
+"""
+Benchmark suite for the pipeline's hot functions, with stored baselines.
+
+Every case runs on a fixture: a scratch directory holding a slice of the
+checked-in data/ and lineup_data/ (the seasons of one SCALES entry) and the
+matching rows of player_index_map.csv, or for the x10/x100 scales a league
+from synthetic_league.py with its index built by make_index. Building a
+fixture runs merge_data and lineup_calc once so the cases downstream of them
+have their inputs. Nothing
+touches the network; the bballref case parses totals pages rendered from the
+fixture's {year}{ps}_bballref.csv files and checks they parse back to them.
+
+    python benchmarks/suite.py run [--scale small medium full x10 x100] [--case ...] [--save]
+    python benchmarks/suite.py compare [--results FILE] [--threshold 0.2]
+
+`run` prints and writes benchmarks/results.json; --save also stores it as
+benchmarks/baselines.json. `compare` runs the suite (or reads --results) and
+exits 1 when a case's best time exceeds its baseline by more than the
+threshold. Baselines are per machine; compare warns when they were recorded
+on a different one.
+"""
+import argparse
+import contextlib
+import glob
+import html
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import make_index
+from bballref import parse_totals_table
+from bench_merge_workers import REPO_DIR
+from bench_match_players import DATA_DIR
+from final_merge import merge_on_off
+from lineup_calc import calculate_basketball_percentages, load_lineups, run_on_off_pipeline
+from merge_data import extra_fields, process_wnba_pipeline
+from synthetic_league import generate_league
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baselines.json')
+RESULTS_PATH = os.path.join(BENCH_DIR, 'results.json')
+
+# Seasons of each real-data fixture, each year bringing its regular season and
+# playoffs, or the synthetic_league.generate_league arguments of a synthetic
+# one; the real league is about 12 teams over 17 seasons
+SCALES = {
+    'small': [2024],
+    'medium': [2021, 2022, 2023, 2024],
+    'full': list(range(2009, 2026)),
+    'x10': {'teams': 120, 'seasons': 17},
+    'x100': {'teams': 240, 'seasons': 85},
+}
+# Changes smaller than this are noise whatever the ratio
+MIN_DELTA_S = 0.005
+
+
+def season_labels(years):
+    return [f"{year}{ps}" for year in years for ps in ['', 'ps']]
+
+
+def build_fixture(scale):
+    """A scratch directory with the scale's inputs and merge/on-off outputs; returns its path."""
+    root = tempfile.mkdtemp(prefix='bench_suite_')
+    if isinstance(scale, dict):
+        generate_league(root, pbp_games=False, **scale)
+        with fixture_cwd(root), quiet():
+            make_index.build_index(rebuild=True)
+    else:
+        copy_seasons(root, scale)
+    with fixture_cwd(root), quiet():
+        process_wnba_pipeline(rebuild=True)
+        run_on_off_pipeline()
+    return root
+
+
+def copy_seasons(root, years):
+    """The checked-in inputs and index rows of `years`, lineup folders linked rather than copied."""
+    os.mkdir(os.path.join(root, 'data'))
+    os.mkdir(os.path.join(root, 'lineup_data'))
+    labels = season_labels(years)
+    for label in labels:
+        for name in [f"{label}_bballref.csv", f"{label}_pbp.csv", f"team_{label}_pbp.csv"]:
+            if os.path.exists(os.path.join(DATA_DIR, name)):
+                shutil.copy(os.path.join(DATA_DIR, name), os.path.join(root, 'data'))
+    for year in years:
+        if os.path.isdir(os.path.join(REPO_DIR, 'lineup_data', str(year))):
+            os.symlink(os.path.join(REPO_DIR, 'lineup_data', str(year)), os.path.join(root, 'lineup_data', str(year)))
+    index = pd.read_csv(os.path.join(REPO_DIR, 'player_index_map.csv'), dtype={'year_season': str})
+    index[index['year_season'].isin(labels)].to_csv(os.path.join(root, 'player_index_map.csv'), index=False)
+
+
+@contextlib.contextmanager
+def fixture_cwd(root):
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def quiet():
+    stack = contextlib.ExitStack()
+    stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+    stack.enter_context(contextlib.redirect_stderr(io.StringIO()))
+    return stack
+
+
+def render_totals_page(df):
+    """A Basketball Reference totals page holding `df`, header rows repeated every 20 rows as on the site."""
+    stats = [c for c in df.columns if c not in ('player', 'player_href', 'player_url', 'player_id')]
+    header = ('<tr><th data-stat="player">Player</th>'
+              + ''.join(f'<th data-stat="{c}">{c}</th>' for c in stats) + '</tr>')
+    rows = []
+    for i, row in enumerate(df.itertuples(index=False)):
+        if i and i % 20 == 0:
+            rows.append(header.replace('<tr>', '<tr class="thead">'))
+        values = row._asdict()
+        name = html.escape(values['player'])
+        player = f'<a href="{values["player_href"]}">{name}</a>' if values['player_href'] else name
+        rows.append(f'<tr><th data-stat="player">{player}</th>'
+                    + ''.join(f'<td data-stat="{c}">{html.escape(values[c])}</td>' for c in stats) + '</tr>')
+    return (f'<html><body><div class="table_container"><table id="totals">'
+            f'<thead><tr class="over_header"><th></th></tr>{header}</thead>'
+            f'<tbody>{"".join(rows)}</tbody></table></div></body></html>')
+
+
+# Each case prepares its inputs inside the fixture directory and returns
+# (zero-argument callable to time, number of input rows).
+
+def case_match_players():
+    seasons = []
+    for ref_path in sorted(glob.glob('data/*_bballref.csv')):
+        label = os.path.basename(ref_path).split('_')[0]
+        seasons.append((label, pd.read_csv(ref_path), pd.read_csv(f"data/{label}_pbp.csv")))
+
+    def run():
+        make_index.global_id_map.clear()
+        for label, ref, pbp in seasons:
+            make_index.match_players(ref, pbp, label)
+    return run, sum(len(ref) for _, ref, _ in seasons)
+
+
+def case_extra_fields():
+    # The combined files with their derived columns stripped, called as process_season does
+    avg = pd.read_csv('data/avg_shooting.csv')
+    seasons = [pd.read_csv(path).loc[:, :'basic_TOVPG'] for path in sorted(glob.glob('data/*_combined.csv'))]
+
+    def run():
+        for df in seasons:
+            extra_fields(df, avg_shooting_df=avg)
+    return run, sum(len(df) for df in seasons)
+
+
+def case_process_wnba_pipeline():
+    return lambda: process_wnba_pipeline(rebuild=True), len(pd.read_csv('data/wnba_master.csv', usecols=[0]))
+
+
+def case_run_on_off_pipeline():
+    return run_on_off_pipeline, len(pd.read_csv('player_index_map.csv', usecols=[0]))
+
+
+def case_calculate_basketball_percentages():
+    index = pd.read_csv('player_index_map.csv', dtype={'year_season': str})
+    frames = [load_lineups(year_season, team_id) for year_season, team_id
+              in index[['year_season', 'team_id']].drop_duplicates().itertuples(index=False)]
+    lineups = pd.concat([df for df in frames if df is not None], ignore_index=True)
+    return lambda: calculate_basketball_percentages(lineups), len(lineups)
+
+
+def case_final_merge():
+    rows = len(pd.read_csv('data/wnba_master.csv', usecols=['year']))
+    return lambda: merge_on_off(new_path='data/bench_updated_master.csv'), rows
+
+
+def case_bballref_parse():
+    pages, expected = [], []
+    for path in sorted(glob.glob('data/*_bballref.csv')):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        pages.append(render_totals_page(df))
+        expected.append(df)
+    for page, df in zip(pages, expected):
+        parsed = parse_totals_table(page).fillna('')
+        pd.testing.assert_frame_equal(parsed, df, check_dtype=False)
+    return lambda: [parse_totals_table(page) for page in pages], sum(len(df) for df in expected)
+
+
+CASES = {
+    'match_players': case_match_players,
+    'extra_fields': case_extra_fields,
+    'process_wnba_pipeline': case_process_wnba_pipeline,
+    'run_on_off_pipeline': case_run_on_off_pipeline,
+    'calculate_basketball_percentages': case_calculate_basketball_percentages,
+    'final_merge': case_final_merge,
+    'bballref_parse': case_bballref_parse,
+}
+
+
+def measure(run, repeat, min_time=1.0, max_repeat=50):
+    """Best and median seconds over at least `repeat` calls, more for fast cases until `min_time` has passed."""
+    times = []
+    while len(times) < repeat or (sum(times) < min_time and len(times) < max_repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+
+def machine():
+    return {'platform': platform.platform(), 'python': platform.python_version(), 'pandas': pd.__version__,
+            'cpus': os.cpu_count()}
+
+
+def run_suite(scales, cases, repeat=3):
+    """{'machine': ..., 'results': {'case/scale': {'best_s', 'median_s', 'rows'}}}."""
+    results = {}
+    for scale in scales:
+        root = build_fixture(SCALES[scale])
+        try:
+            with fixture_cwd(root):
+                for name in cases:
+                    with quiet():
+                        run, rows = CASES[name]()
+                        best, median = measure(run, repeat)
+                    results[f"{name}/{scale}"] = {'best_s': best, 'median_s': median, 'rows': rows}
+                    print(f"{name + '/' + scale:<42} {rows:>8} rows  best {best * 1000:9.1f} ms  "
+                          f"median {median * 1000:9.1f} ms")
+        finally:
+            shutil.rmtree(root)
+    return {'machine': machine(), 'results': results}
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Cases present in both runs with their best times.
+
+    Returns:
+        DataFrame with baseline_s, current_s, change and 'REGRESSION' in
+        flag where the best time grew by more than `threshold`
+    """
+    keys = [k for k in current['results'] if k in baseline['results']]
+    table = pd.DataFrame({'baseline_s': [baseline['results'][k]['best_s'] for k in keys],
+                          'current_s': [current['results'][k]['best_s'] for k in keys]}, index=keys)
+    table['change'] = table['current_s'] / table['baseline_s'] - 1
+    slower = (table['change'] > threshold) & (table['current_s'] - table['baseline_s'] > MIN_DELTA_S)
+    table['flag'] = slower.map({True: 'REGRESSION', False: ''})
+    return table
+
+
+def write_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmark suite or compare it with the stored baselines.")
+    parser.add_argument('command', choices=['run', 'compare'])
+    parser.add_argument('--scale', nargs='+', choices=list(SCALES), default=['small', 'medium'])
+    parser.add_argument('--case', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3, help="time each case at least this many times and keep the best")
+    parser.add_argument('--save', action='store_true', help=f"store the run as {os.path.relpath(BASELINE_PATH)}")
+    parser.add_argument('--results', help="compare this results file instead of running the suite")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="flag cases whose best time grew by more than this fraction")
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results) as f:
+            current = json.load(f)
+    else:
+        current = run_suite(args.scale, args.case, args.repeat)
+        write_json(current, RESULTS_PATH)
+        if args.save:
+            write_json(current, BASELINE_PATH)
+            print(f"Saved baselines to {BASELINE_PATH}")
+
+    if args.command == 'compare':
+        if not os.path.exists(BASELINE_PATH):
+            sys.exit(f"No baselines at {BASELINE_PATH}; record them with `run --save` first.")
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        if baseline['machine'] != current['machine']:
+            print(f"Warning: baselines were recorded on {baseline['machine']}")
+        table = compare(baseline, current, args.threshold)
+        with pd.option_context('display.width', 160, 'display.max_columns', None, 'display.float_format', '{:.4f}'.format):
+            print(table)
+        sys.exit(1 if (table['flag'] != '').any() else 0)
@@ -0,0 +1,401 @@
+"""
+Synthetic league generator for scale testing the pipeline.
+
+Writes a league of any size in the layout the scrapers produce:
+data/{season}_pbp.csv, data/team_{season}_pbp.csv, data/{season}_bballref.csv,
+lineup_data/{year}/{team_id}[_vs][_ps].csv and pbp_data/{game_id}.csv, for
+regular seasons and playoffs. Column sets, dtypes and empty cells follow the
+checked-in TEMPLATE_YEAR files: every synthetic row is a real template row
+(player, team, lineup or game event) with counts rescaled to the season
+length and identities replaced, so make_index, merge_data and lineup_calc run
+on it unchanged.
+
+Players carry over between seasons and some are traded mid-season, giving
+Basketball Reference a 'TOT' row plus one row per team while pbpstats keeps
+a single row on the last team, as on the real sites. A share of players get
+a different name on each side: accents and punctuation (exact after
+normalization), transposed letters and dropped married names (fuzzy and
+substring passes) and changed surnames (only the stats pass can match them).
+
+    python benchmarks/synthetic_league.py OUT_DIR [--teams 120] [--seasons 17] [--roster 13] [--games 40]
+"""
+import argparse
+import glob
+import os
+import string
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_merge_workers import REPO_DIR
+
+TEMPLATE_YEAR = 2024
+FIRST_YEAR = 2010
+TEAM_ID_BASE = 1612700000
+PLAYER_ID_BASE = 3000000
+# Template columns kept as they are when rescaling a row to another season length
+RATE_MARKERS = ('Pct', 'Frequency', 'Accuracy', 'Avg', 'Rtg', 'Usage', 'Per', 'Pace', 'Distance')
+IDENTITY_COLUMNS = ['EntityId', 'TeamId', 'Name', 'ShortName', 'RowId', 'TeamAbbreviation', 'year']
+POSITIONS = ['G', 'G', 'G-F', 'F-G', 'F', 'F', 'F-C', 'C-F', 'C']
+# Share of players whose Basketball Reference and pbpstats names differ, by kind
+NAME_VARIANTS = {'accent': 0.03, 'punctuation': 0.03, 'typo': 0.03, 'married': 0.02, 'renamed': 0.01}
+SYLLABLES = ['ka', 'ri', 'mo', 'la', 'ne', 'sha', 'ty', 'de', 'jo', 'an', 'na', 'bri', 'el', 'sa', 'vo',
+             'ta', 'ro', 'mi', 'ke', 'lu', 'ra', 'zi', 'co', 'da', 'ya', 'ni', 'be', 'ha', 'qui', 'ster']
+
+
+def load_templates(repo_dir=REPO_DIR, year=TEMPLATE_YEAR, n_games=40):
+    """The real files synthetic rows are drawn from."""
+    data = os.path.join(repo_dir, 'data')
+    lineup_files = sorted(glob.glob(os.path.join(repo_dir, 'lineup_data', str(year), '*[0-9].csv')))
+    game_files = sorted(glob.glob(os.path.join(repo_dir, 'pbp_data', f"102{year % 100:02d}*.csv")))[:n_games]
+    players = pd.read_csv(os.path.join(data, f"{year}_pbp.csv"))
+    return {
+        'players': players[players['Minutes'] > 0].reset_index(drop=True),
+        'teams': pd.read_csv(os.path.join(data, f"team_{year}_pbp.csv")),
+        'bballref_columns': list(pd.read_csv(os.path.join(data, f"{year}_bballref.csv"), nrows=0).columns),
+        # copy() consolidates the concatenated blocks, which makes drawing rows one take per dtype
+        'lineups': pd.concat([pd.read_csv(f) for f in lineup_files], ignore_index=True).copy(),
+        'lineups_vs': pd.concat([pd.read_csv(f.replace('.csv', '_vs.csv')) for f in lineup_files],
+                                ignore_index=True).copy(),
+        'games': [pd.read_csv(f) for f in game_files],
+    }
+
+
+def rescale(rows, factor, int_columns):
+    """Template rows with their count columns multiplied by `factor` and rounded."""
+    rows = rows.reset_index(drop=True)
+    counts = [c for c in rows.select_dtypes('number').columns
+              if c not in IDENTITY_COLUMNS and not any(m in c for m in RATE_MARKERS)]
+    factor = np.asarray(factor, dtype='float64').reshape(-1, 1) if np.ndim(factor) else factor
+    scaled = (rows[counts].to_numpy(dtype='float64') * factor).round()
+    rows[counts] = scaled
+    for col in int_columns:
+        if col in counts:
+            rows[col] = rows[col].fillna(0).astype('int64')
+    return rows
+
+
+def make_word(rng, syllables):
+    return ''.join(rng.choice(SYLLABLES, size=syllables)).capitalize()
+
+
+def name_variant(rng, first, last):
+    """(Basketball Reference name, pbpstats name, kind) of one player."""
+    kinds = list(NAME_VARIANTS) + ['same']
+    kind = rng.choice(kinds, p=list(NAME_VARIANTS.values()) + [1 - sum(NAME_VARIANTS.values())])
+    name = f"{first} {last}"
+    if kind == 'accent':
+        vowel = next((i for i, c in enumerate(last) if c in 'aeiou'), None)
+        if vowel is not None:
+            return f"{first} {last[:vowel]}{'áéíóú'['aeiou'.index(last[vowel])]}{last[vowel + 1:]}", name, kind
+    if kind == 'punctuation':
+        return f"{first[0]}'{first[1:].lower()} {last}", name, kind
+    if kind == 'typo' and len(last) > 4:
+        i = int(rng.integers(1, len(last) - 2))
+        return name, f"{first} {last[:i]}{last[i + 1]}{last[i]}{last[i + 2:]}", kind
+    if kind == 'married':
+        return f"{first} {last}-{make_word(rng, 2)}", name, kind
+    if kind == 'renamed':
+        return name, f"{first} {make_word(rng, 3)}", kind
+    return name, name, 'same'
+
+
+class League:
+    """Teams, and a player pool that grows as rosters turn over."""
+
+    def __init__(self, rng, teams, templates):
+        self.rng = rng
+        self.templates = templates
+        abbreviations = set()
+        while len(abbreviations) < teams:
+            abbreviations.add(''.join(rng.choice(list(string.ascii_uppercase), size=3)))
+        self.teams = pd.DataFrame({
+            'team_id': TEAM_ID_BASE + np.arange(teams),
+            'abbreviation': sorted(abbreviations),
+            'city': [make_word(rng, 3) for _ in range(teams)],
+            'nickname': [make_word(rng, 2) + 's' for _ in range(teams)],
+        })
+        self.players = []
+        self.ref_ids = set()
+
+    def new_player(self):
+        rng = self.rng
+        first, last = make_word(rng, 2), make_word(rng, int(rng.integers(2, 4)))
+        ref_name, pbp_name, kind = name_variant(rng, first, last)
+        stem = f"{last[:5]}{first[:2]}".lower().encode('ascii', 'ignore').decode()
+        n = 1
+        while f"{stem}{n:02d}w" in self.ref_ids:
+            n += 1
+        ref_id = f"{stem}{n:02d}w"
+        self.ref_ids.add(ref_id)
+        player = {'entity_id': PLAYER_ID_BASE + len(self.players), 'player_id': ref_id,
+                  'ref_name': ref_name, 'pbp_name': pbp_name, 'variant': kind,
+                  'pos': rng.choice(POSITIONS), 'template': int(rng.integers(len(self.templates['players'])))}
+        self.players.append(player)
+        return len(self.players) - 1
+
+
+def season_rosters(league, previous, roster, keep=0.75, trade_rate=0.05):
+    """
+    {team index: player indices} for a season, and the traded players as
+    {player index: (first team, last team)}; traded players are on both rosters.
+    """
+    rng = league.rng
+    rosters, assigned = {}, set()
+    for team in range(len(league.teams)):
+        # A player traded last season returns to one of her teams at most
+        returning = [p for p in previous.get(team, []) if p not in assigned and rng.random() < keep][:roster]
+        assigned.update(returning)
+        rosters[team] = returning + [league.new_player() for _ in range(roster - len(returning))]
+    traded = {}
+    if len(rosters) > 1:
+        movers = [p for players in rosters.values() for p in players if rng.random() < trade_rate]
+        team_of = {p: t for t, players in rosters.items() for p in players}
+        for p in movers:
+            first = team_of[p]
+            last = int(rng.choice([t for t in rosters if t != first]))
+            rosters[last].append(p)
+            traded[p] = (first, last)
+    return rosters, traded
+
+
+def player_rows(league, rosters, traded, year, games):
+    """The season's pbpstats player rows (one per player, on their last team) and bballref rows."""
+    rng = league.rng
+    templates = league.templates['players']
+    team_of = {}
+    for team, players in rosters.items():
+        for p in players:
+            team_of.setdefault(p, team)
+    for p, (_, last) in traded.items():
+        team_of[p] = last
+    order = list(team_of)
+    info = [league.players[p] for p in order]
+    factor = games / templates['GamesPlayed'].max() * rng.uniform(0.85, 1.15, len(order))
+    int_columns = templates.select_dtypes('int64').columns
+    pbp = rescale(templates.iloc[[i['template'] for i in info]], factor, int_columns)
+    pbp['GamesPlayed'] = pbp['GamesPlayed'].clip(1, games)
+    teams = league.teams.iloc[[team_of[p] for p in order]]
+    pbp['EntityId'] = pbp['RowId'] = [i['entity_id'] for i in info]
+    pbp['TeamId'] = teams['team_id'].to_numpy()
+    pbp['Name'] = pbp['ShortName'] = [i['pbp_name'] for i in info]
+    pbp['TeamAbbreviation'] = teams['abbreviation'].to_numpy()
+    if 'year' in pbp.columns:
+        pbp['year'] = year
+
+    ref_rows = []
+    for k, p in enumerate(order):
+        stats = pbp.iloc[k]
+        if p in traded:
+            share = rng.uniform(0.3, 0.7)
+            first, last = traded[p]
+            ref_rows.append(bballref_row(info[k], 'TOT', stats, 1.0))
+            ref_rows.append(bballref_row(info[k], league.teams['abbreviation'].iloc[first], stats, share))
+            ref_rows.append(bballref_row(info[k], league.teams['abbreviation'].iloc[last], stats, 1 - share))
+        else:
+            ref_rows.append(bballref_row(info[k], league.teams['abbreviation'].iloc[team_of[p]], stats, 1.0))
+    columns = league.templates['bballref_columns']
+    ref = pd.DataFrame(ref_rows).reindex(columns=columns)
+    return pbp, ref
+
+
+def pct(made, attempts):
+    """Basketball Reference's percentage format: '.466', '1.000', blank without attempts."""
+    if not attempts:
+        return ''
+    text = f"{made / attempts:.3f}"
+    return text[1:] if text.startswith('0') else text
+
+
+def bballref_row(player, team, stats, share):
+    def count(col):
+        value = stats[col]
+        return 0 if pd.isna(value) else int(round(value * share))
+
+    fg2, fg2a, fg3, fg3a, ft, fta = (count(c) for c in ['FG2M', 'FG2A', 'FG3M', 'FG3A', 'FtPoints', 'FTA'])
+    games = max(1, count('GamesPlayed'))
+    return {
+        'player': player['ref_name'], 'team': team, 'pos': player['pos'], 'g': games,
+        'mp': count('Minutes'), 'gs': int(games * 0.6),
+        'fg': fg2 + fg3, 'fga': fg2a + fg3a, 'fg_pct': pct(fg2 + fg3, fg2a + fg3a),
+        'fg3': fg3, 'fg3a': fg3a, 'fg3_pct': pct(fg3, fg3a),
+        'fg2': fg2, 'fg2a': fg2a, 'fg2_pct': pct(fg2, fg2a),
+        'ft': ft, 'fta': fta, 'ft_pct': pct(ft, fta),
+        'orb': count('OffRebounds'), 'trb': count('Rebounds'), 'ast': count('Assists'), 'stl': count('Steals'),
+        'blk': count('Blocks'), 'tov': count('Turnovers'), 'pf': count('Fouls'), 'pts': count('Points'),
+        'player_href': f"/wnba/players/{player['player_id'][0]}/{player['player_id']}.html",
+        'player_url': f"https://www.basketball-reference.com/wnba/players/{player['player_id'][0]}/"
+                      f"{player['player_id']}.html",
+        'player_id': player['player_id'],
+    }
+
+
+def team_rows(league, team_indices, year, games):
+    templates = league.templates['teams']
+    rows = rescale(templates.iloc[league.rng.integers(len(templates), size=len(team_indices))],
+                   games / templates['GamesPlayed'].max(), templates.select_dtypes('int64').columns)
+    teams = league.teams.iloc[team_indices]
+    rows['EntityId'] = rows['TeamId'] = rows['RowId'] = teams['team_id'].to_numpy()
+    rows['Name'] = rows['ShortName'] = rows['TeamAbbreviation'] = teams['abbreviation'].to_numpy()
+    if 'year' in rows.columns:
+        rows['year'] = year
+    return rows
+
+
+def lineup_files(league, team, players, minutes, year, n_lineups):
+    """A team-season's lineup file and its opponents-of-lineup (_vs) file."""
+    rng = league.rng
+    weights = np.asarray(minutes, dtype='float64') + 1
+    weights /= weights.sum()
+    lineups = set()
+    for _ in range(n_lineups):
+        if len(players) < 5:
+            break
+        lineups.add(tuple(sorted(rng.choice(players, size=5, replace=False, p=weights).tolist(),
+                                 key=lambda p: str(league.players[p]['entity_id']))))
+    lineups = sorted(lineups)
+    ids = ['-'.join(str(league.players[p]['entity_id']) for p in lineup) for lineup in lineups]
+    names = [', '.join(league.players[p]['pbp_name'] for p in lineup) for lineup in lineups]
+    short = [', '.join(league.players[p]['pbp_name'].split(' ', 1)[-1] for p in lineup) for lineup in lineups]
+    team_id = int(league.teams['team_id'].iloc[team])
+    files = []
+    for source, vs in [(league.templates['lineups'], False), (league.templates['lineups_vs'], True)]:
+        rows = source.iloc[rng.integers(len(source), size=len(lineups))].reset_index(drop=True)
+        rows['EntityId'] = rows['RowId'] = ids
+        rows['Name'], rows['ShortName'] = names, short
+        rows['TeamId'] = rows['team_id'] = team_id
+        rows['TeamAbbreviation'] = league.teams['abbreviation'].iloc[team]
+        rows['year'] = rows['season'] = year
+        rows['team_vs'] = vs
+        files.append(rows)
+    return files
+
+
+def game_file(league, template, game_id, home, away, rosters):
+    """A template game's events relabelled to two synthetic teams and their players."""
+    game = template.copy()
+    game['GAME_ID'] = game_id
+    sides = {}
+    for person_type, team in [(4, home), (5, away)]:
+        template_team = game.loc[game['PERSON1TYPE'] == person_type, 'PLAYER1_TEAM_ID'].dropna()
+        if len(template_team):
+            sides[template_team.iloc[0]] = team
+    # Template players take a side's roster spots in order of first appearance
+    ids, names, surnames = {}, {}, {}
+    taken = dict.fromkeys(sides.values(), 0)
+    for k in (1, 2, 3):
+        for template_id, template_name, template_team in game[[f"PLAYER{k}_ID", f"PLAYER{k}_NAME",
+                                                               f"PLAYER{k}_TEAM_ID"]].itertuples(index=False):
+            if template_team in sides and template_id not in ids:
+                team = sides[template_team]
+                player = league.players[rosters[team][taken[team] % len(rosters[team])]]
+                taken[team] += 1
+                ids[template_id] = player['entity_id']
+                names[template_id] = player['pbp_name']
+                if isinstance(template_name, str):
+                    surnames[template_name.split(' ', 1)[-1]] = player['pbp_name'].split(' ', 1)[-1]
+    team_ids = {template_id: int(league.teams['team_id'].iloc[team]) for template_id, team in sides.items()}
+    for k in (1, 2, 3):
+        template_ids, template_teams = game[f"PLAYER{k}_ID"], game[f"PLAYER{k}_TEAM_ID"]
+        game[f"PLAYER{k}_ID"] = template_ids.map(lambda i: ids.get(i, team_ids.get(i, i)))
+        game[f"PLAYER{k}_NAME"] = template_ids.map(names).where(template_ids.isin(list(names)),
+                                                                game[f"PLAYER{k}_NAME"])
+        teams = league.teams.iloc[template_teams.map(sides).fillna(0).astype(int)].reset_index(drop=True)
+        known = template_teams.isin(list(sides)).to_numpy()
+        for col, field in [('TEAM_ID', 'team_id'), ('TEAM_CITY', 'city'), ('TEAM_NICKNAME', 'nickname'),
+                           ('TEAM_ABBREVIATION', 'abbreviation')]:
+            game[f"PLAYER{k}_{col}"] = np.where(known, teams[field].to_numpy(), game[f"PLAYER{k}_{col}"])
+    if surnames:
+        pattern = r'\b(' + '|'.join(sorted(map(lambda s: s.replace('.', r'\.'), surnames), key=len,
+                                           reverse=True)) + r')\b'
+        for col in ['HOMEDESCRIPTION', 'VISITORDESCRIPTION', 'NEUTRALDESCRIPTION']:
+            game[col] = game[col].str.replace(pattern, lambda m: surnames[m.group(1)], regex=True)
+    return game
+
+
+def generate_league(out_dir, teams=12, seasons=17, roster=13, games=40, playoff_teams=None,
+                    lineups_per_game=3.75, pbp_games=True, seed=0, templates=None):
+    """
+    Write a synthetic league under `out_dir` (data/, lineup_data/, pbp_data/).
+
+    Args:
+        teams: Teams per season
+        seasons: Seasons, starting at FIRST_YEAR
+        roster: Players per team before trades
+        games: Regular-season games per team; playoffs are a quarter of that
+        playoff_teams: Teams in each postseason (default two thirds of the league)
+        lineups_per_game: Distinct lineups drawn per team and game
+        pbp_games: Also write a play-by-play file for every game
+        seed: Seed of the random generator; the same arguments give the same files
+
+    Returns:
+        {'player_rows', 'lineup_files', 'game_files'} counts
+    """
+    rng = np.random.default_rng(seed)
+    templates = templates or load_templates()
+    league = League(rng, teams, templates)
+    playoff_teams = playoff_teams or max(2, teams * 2 // 3)
+    for folder in ['data', 'lineup_data', 'pbp_data']:
+        os.makedirs(os.path.join(out_dir, folder), exist_ok=True)
+
+    counts = {'player_rows': 0, 'lineup_files': 0, 'game_files': 0}
+    rosters = {}
+    for year in range(FIRST_YEAR, FIRST_YEAR + seasons):
+        rosters, traded = season_rosters(league, rosters, roster)
+        os.makedirs(os.path.join(out_dir, 'lineup_data', str(year)), exist_ok=True)
+        playoffs = sorted(rng.choice(teams, size=min(playoff_teams, teams), replace=False).tolist())
+        for ps, season_teams, season_games in [('', list(range(teams)), games),
+                                                ('ps', playoffs, max(2, games // 4))]:
+            label = f"{year}{ps}"
+            season = {t: rosters[t] for t in season_teams}
+            pbp, ref = player_rows(league, season, {p: t for p, t in traded.items()
+                                                    if t[0] in season and t[1] in season},
+                                   year, season_games)
+            pbp.to_csv(os.path.join(out_dir, 'data', f"{label}_pbp.csv"), index=False)
+            ref.to_csv(os.path.join(out_dir, 'data', f"{label}_bballref.csv"), index=False)
+            team_rows(league, season_teams, year, season_games).to_csv(
+                os.path.join(out_dir, 'data', f"team_{label}_pbp.csv"), index=False)
+            counts['player_rows'] += len(pbp)
+
+            minutes = dict(zip(pbp['EntityId'], pbp['Minutes']))
+            suffix = '_ps' if ps else ''
+            for team in season_teams:
+                players = season[team]
+                team_file, vs_file = lineup_files(
+                    league, team, players, [minutes.get(league.players[p]['entity_id'], 0) for p in players],
+                    year, int(lineups_per_game * season_games))
+                team_id = int(league.teams['team_id'].iloc[team])
+                team_file.to_csv(os.path.join(out_dir, 'lineup_data', str(year), f"{team_id}{suffix}.csv"),
+                                 index=False)
+                vs_file.to_csv(os.path.join(out_dir, 'lineup_data', str(year), f"{team_id}_vs{suffix}.csv"),
+                               index=False)
+                counts['lineup_files'] += 2
+
+            if pbp_games and templates['games']:
+                for n in range(len(season_teams) * season_games // 2):
+                    home, away = rng.choice(season_teams, size=2, replace=False)
+                    game_id = f"10{4 if ps else 2}{year % 100:02d}{n + 1:05d}"
+                    template = templates['games'][int(rng.integers(len(templates['games'])))]
+                    game_file(league, template, int(game_id), int(home), int(away), rosters).to_csv(
+                        os.path.join(out_dir, 'pbp_data', f"{game_id}.csv"), index=False)
+                    counts['game_files'] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic league in the pipeline's input layout.")
+    parser.add_argument('out_dir', help="directory to create data/, lineup_data/ and pbp_data/ in")
+    parser.add_argument('--teams', type=int, default=12)
+    parser.add_argument('--seasons', type=int, default=17)
+    parser.add_argument('--roster', type=int, default=13, help="players per team before trades")
+    parser.add_argument('--games', type=int, default=40, help="regular-season games per team")
+    parser.add_argument('--no-pbp', action='store_true', help="skip the play-by-play game files")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    counts = generate_league(args.out_dir, teams=args.teams, seasons=args.seasons, roster=args.roster,
+                             games=args.games, pbp_games=not args.no_pbp, seed=args.seed)
+    print(f"Wrote {counts['player_rows']} player rows, {counts['lineup_files']} lineup files and "
+          f"{counts['game_files']} game files to {args.out_dir}")
@@ -0,0 +1,51 @@
+"""
+One command-line entry point for every pipeline script.
+
+    python cli.py <command> [args...]
+
+Each command runs the main() of one module with the remaining arguments, so
+`python cli.py merge --workers 4` is `python merge_data.py --workers 4`. A
+command's module is imported only once it is chosen, so `python cli.py --help`
+loads nothing but the standard library; every module can also be imported on
+its own without running anything.
+"""
+import argparse
+import importlib
+import sys
+
+# command: (module, what it does), in pipeline order
+COMMANDS = {
+    'pipeline': ('pipeline', "run every stage that is out of date"),
+    'totals': ('wnba_totals', "fetch pbpstats player and team totals"),
+    'bballref': ('bballref', "scrape Basketball Reference totals"),
+    'schedule': ('wnba_schedule', "fetch the WNBA schedule"),
+    'pbp': ('async_pbp_scrape', "fetch game play-by-play"),
+    'index': ('make_index', "build the player index"),
+    'lineups': ('wnba_lineups', "pull lineup files from pbpstats"),
+    'merge': ('merge_data', "merge seasons and compute derived metrics"),
+    'on-off': ('lineup_calc', "compute on/off splits"),
+    'final': ('final_merge', "add on/off shooting to the master file"),
+    'combos': ('lineup_combos', "build duo and trio tables"),
+    'wowy': ('wowy', "with-or-without-you splits for one team-season"),
+    'trace': ('perf_trace', "compare two performance traces"),
+    'profile': ('perf_profile', "summarize sampling profiles"),
+}
+
+
+def main(argv=None):
+    listing = '\n'.join(f"  {name:<10} {module + '.py':<20} {text}" for name, (module, text) in COMMANDS.items())
+    parser = argparse.ArgumentParser(description="Run one of the pipeline scripts.",
+                                     epilog=f"commands:\n{listing}\n\n"
+                                            "`python cli.py <command> --help` shows a command's options.",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=list(COMMANDS), metavar='command')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help="arguments passed on to the command")
+    args = parser.parse_args(argv)
+    name = COMMANDS[args.command][0]
+    # As if the script had been run directly: its usage messages and trace files go by its name
+    sys.argv[0] = f"{name}.py"
+    return importlib.import_module(name).main(args.args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,71 +1,85 @@
+import argparse
 import pandas as pd
+import numpy as np
 import os
 
-# 1. Load the data
+import perf_profile
+from identity_store import season_code
+from perf_trace import traced
+
+# 1. Inputs and output
 master_path = 'data/wnba_master.csv'
-on_off_path = 'data/on_off_master.csv'
+on_off_wide_path = 'data/on_off_wide.csv'
 new_path = 'data/updated_wnba_master.csv'
 
-if os.path.exists(master_path) and os.path.exists(on_off_path):
+# 2. Define the specific shooting metrics to extract
+# As per your request, we are only adding frequency and accuracy
+locs = ['AtRim', 'ShortMidRange', 'LongMidRange', 'Corner3', 'Arc3']
+shooting_stats = []
+for loc in locs:
+    shooting_stats.extend([f"{loc}Frequency", f"{loc}Accuracy"])
+
+
+@traced()
+def join_on_off(master_df, wide_path=on_off_wide_path, stats=shooting_stats):
+    """
+    The year_season and ON/OFF columns for `stats` of every master row.
+
+    lineup_calc already writes one on/off row per (player, team, season), so
+    this is a single indexed lookup on compact keys (player code, team id,
+    season code) that reads only those keys and the requested columns.
+    Values are parsed round-trip, so they are exactly what lineup_calc wrote.
+
+    Returns:
+        DataFrame aligned with master_df, NaN where a player has no on/off row
+    """
+    # Column order of the former pivot_table output (sorted, _OFF before _ON)
+    stat_columns = sorted(f"{stat}_{status}" for stat in stats for status in ['ON', 'OFF'])
+    wide = pd.read_csv(wide_path, usecols=['player_id', 'team_id', 'season_code', 'year_season'] + stat_columns,
+                       dtype={'player_id': 'category', 'year_season': str}, float_precision='round_trip')
+
+    # Player codes share the wide table's categories; unknown players get -1 and never match
+    players = wide['player_id'].cat.categories
+    wide_index = pd.MultiIndex.from_arrays([wide['player_id'].cat.codes, wide['team_id'], wide['season_code']])
+    master_keys = pd.MultiIndex.from_arrays([pd.Categorical(master_df['player_id'], categories=players).codes,
+                                             master_df['TeamId'],
+                                             season_code(master_df['year'], master_df['is_playoffs'])])
+    rows = wide_index.get_indexer(master_keys)
+
+    # Left join: a position of -1 picks the trailing NaN
+    return pd.DataFrame({col: np.append(wide[col].to_numpy(), np.nan)[rows]
+                         for col in ['year_season'] + stat_columns}, index=master_df.index)
+
+
+@traced()
+def merge_on_off(master_path=master_path, wide_path=on_off_wide_path, new_path=new_path, stats=shooting_stats):
+    """
+    Write the master with each player's ON/OFF columns for `stats` added.
+
+    Returns:
+        Number of rows written to `new_path`
+    """
     master_df = pd.read_csv(master_path)
-    on_off_df = pd.read_csv(on_off_path)
-    master_df=master_df[master_df.year>2009]
-    on_off_df=on_off_df[~on_off_df.year_season.str.contains('2009')]
-    # 2. Define the specific shooting metrics to extract
-    # As per your request, we are only adding frequency and accuracy
-    locs = ['AtRim', 'ShortMidRange', 'LongMidRange', 'Corner3', 'Arc3']
-    shooting_stats = []
-    for loc in locs:
-        shooting_stats.extend([f"{loc}Frequency", f"{loc}Accuracy"])
-
-    # 3. Pivot the On/Off data
-    # We use player_id, team_id, and year_season as the unique keys
-    pivot_on_off = on_off_df.pivot_table(
-        index=['player_id', 'team_id', 'year_season'],
-        columns='status',
-        values=shooting_stats
-    )
-
-    # Flatten the multi-index columns (e.g., 'AtRimFrequency', 'ON' -> 'AtRimFrequency_ON')
-    pivot_on_off.columns = [f"{col[0]}_{col[1]}" for col in pivot_on_off.columns]
-    pivot_on_off.reset_index(inplace=True)
-
-    # 4. Standardize 'team_id' to 'TeamId' for the merge
-    pivot_on_off = pivot_on_off.rename(columns={'team_id': 'TeamId'})
-
-    pivot_on_off['year'] = pivot_on_off['year_season'].astype(str).str.extract(r'(\d+)').astype(int)
-
-    # 5. Merge with the master dataset
-    # We use a left join to preserve all existing master records
-    pivot_on_off['year']=pivot_on_off['year'].astype(int)
-    master_df['year']=master_df['year'].astype(int)
-
-        
-    # 1. Create a matching year_season key in the master dataframe
-    # Mapping False -> '' (Regular) and True -> 'ps' (Playoffs)
-    master_df['year_season_key'] = (
-        master_df['year'].astype(str) + 
-        master_df['is_playoffs'].map({True: 'ps', False: ''})
-    )
-
-    # 2. Extract year in pivot_on_off (as you already do)
-    pivot_on_off['year'] = pivot_on_off['year_season'].astype(str).str.extract(r'(\d+)').astype(int)
-
-    # 3. Merge using the specific year_season key to ensure a 1:1 match
-    final_master = pd.merge(
-        master_df,
-        pivot_on_off,
-        left_on=['player_id', 'TeamId', 'year_season_key'],
-        right_on=['player_id', 'TeamId', 'year_season'],
-        how='left'
-    )
-
-    # 4. Clean up the helper key
-    final_master = final_master.drop(columns=['year_season_key','year_x'])
-    final_master.rename(columns={'year_y': 'year'},inplace=True)
-
-    # 6. Overwrite the master file with the new columns
+    master_df = master_df[master_df.year > 2009]
+    joined = join_on_off(master_df, wide_path, stats)
+    # 'year' comes from the on/off side as before: the year of its year_season, NaN where no row matched
+    year = pd.to_numeric(joined['year_season'].str.extract(r'(\d+)', expand=False)).rename('year')
+    final_master = pd.concat([master_df.drop(columns=['year']), joined, year], axis=1)
     final_master.to_csv(new_path, index=False)
-    print(f"Successfully added ON/OFF shooting stats to {new_path}")
-else:
-    print("Error: Could not find master or on/off CSV files in the data directory.")
\ No newline at end of file
+    return len(final_master)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add each player's ON/OFF shooting splits to the master file.")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
+    if os.path.exists(master_path) and os.path.exists(on_off_wide_path):
+        merge_on_off()
+        print(f"Successfully added ON/OFF shooting stats to {new_path}")
+    else:
+        print("Error: Could not find master or on/off CSV files in the data directory.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Blocked, indexed fuzzy name matching.
+
+Candidates are restricted to the same block (team, or the whole season for
+rows with no block such as 'TOT'). Within a block every name is reduced to a
+character-count signature, and all pairs are scored at once with the
+SequenceMatcher.quick_ratio upper bound computed in NumPy. Only pairs whose
+bound clears the threshold, or that could be substrings of each other, are
+confirmed with SequenceMatcher, so the result is the same as scoring every
+pair directly. Matches are returned best-first so the caller can assign them
+greedily across the whole block.
+"""
+from difflib import SequenceMatcher
+
+import numpy as np
+
+FUZZY_THRESHOLD = 0.85
+MIN_SUBSTRING_LEN = 6
+# Upper bound on (ref rows x pbp rows x alphabet) cells scored per batch
+BATCH_CELLS = 4_000_000
+
+
+def encode_names(names, alphabet):
+    """Unique names as lists of character codes, plus the inverse index back to `names`."""
+    unique, inverse = np.unique(np.asarray(names, dtype=object), return_inverse=True)
+    coded = [[alphabet.setdefault(c, len(alphabet)) for c in name] for name in unique]
+    return coded, inverse.ravel()
+
+
+def signature_matrix(coded, inverse, width):
+    """(names x alphabet) matrix of character counts."""
+    counts = np.zeros((len(coded), width), dtype=np.int16)
+    for k, codes in enumerate(coded):
+        np.add.at(counts[k], codes, 1)
+    return counts[inverse]
+
+
+def match_candidates(ref_names, ref_blocks, pbp_names, pbp_blocks,
+                     threshold=FUZZY_THRESHOLD, min_substring_len=MIN_SUBSTRING_LEN):
+    """
+    Score every same-block (ref, pbp) name pair and return accepted matches.
+
+    Args:
+        ref_names: Normalized reference names
+        ref_blocks: Block key per reference name, or None to compare against every pbp row
+        pbp_names: Normalized candidate names
+        pbp_blocks: Block key per candidate name
+        threshold: Minimum SequenceMatcher ratio for a 'fuzzy' match
+        min_substring_len: Minimum reference name length for a 'substring' match
+
+    Returns:
+        List of (ref_pos, pbp_pos, method, score) tuples, best score first
+    """
+    if not len(ref_names) or not len(pbp_names):
+        return []
+
+    alphabet = {}
+    ref_coded, ref_inverse = encode_names(ref_names, alphabet)
+    pbp_coded, pbp_inverse = encode_names(pbp_names, alphabet)
+    width = max(len(alphabet), 1)
+    R = signature_matrix(ref_coded, ref_inverse, width)
+    P = signature_matrix(pbp_coded, pbp_inverse, width)
+    ref_len = R.sum(axis=1)
+    pbp_len = P.sum(axis=1)
+
+    # Blocking: encode block keys as integer codes, -1 meaning "any block"
+    codes = {}
+    pbp_codes = np.array([codes.setdefault(b, len(codes)) for b in pbp_blocks])
+    ref_codes = np.array([-1 if b is None else codes.get(b, -2) for b in ref_blocks])
+    all_pbp = np.arange(len(pbp_names))
+
+    row_parts, col_parts = [], []
+    for code in np.unique(ref_codes):
+        if code == -2:
+            continue
+        block_refs = np.flatnonzero(ref_codes == code)
+        pbp_idx = all_pbp if code == -1 else np.flatnonzero(pbp_codes == code)
+        if not len(pbp_idx):
+            continue
+        step = max(1, BATCH_CELLS // (len(pbp_idx) * width))
+        for start in range(0, len(block_refs), step):
+            ref_idx = block_refs[start:start + step]
+            common = np.minimum(R[ref_idx][:, None, :], P[pbp_idx][None, :, :]).sum(axis=2)
+            r_len = ref_len[ref_idx][:, None]
+            p_len = pbp_len[pbp_idx][None, :]
+            bound = 2 * common / np.maximum(r_len + p_len, 1)
+            # Every character of the shorter name present: necessary for a substring hit
+            maybe_substring = (common == np.minimum(r_len, p_len)) & (r_len >= min_substring_len)
+            r, c = np.nonzero((bound > threshold) | maybe_substring)
+            row_parts.append(ref_idx[r])
+            col_parts.append(pbp_idx[c])
+    if not row_parts:
+        return []
+    rows, cols = np.concatenate(row_parts), np.concatenate(col_parts)
+
+    accepted = []
+    matcher = SequenceMatcher()
+    order = np.argsort(cols, kind='stable')
+    for i, j in zip(rows[order].tolist(), cols[order].tolist()):
+        ref_name, pbp_name = ref_names[i], pbp_names[j]
+        if matcher.b is not pbp_name:
+            matcher.set_seq2(pbp_name)
+        matcher.set_seq1(ref_name)
+        score = matcher.ratio()
+        if (ref_name in pbp_name or pbp_name in ref_name) and len(ref_name) >= min_substring_len:
+            accepted.append((i, j, 'substring', score))
+        elif score > threshold:
+            accepted.append((i, j, 'fuzzy', score))
+
+    accepted.sort(key=lambda m: (-m[3], m[0], m[1]))
+    return accepted
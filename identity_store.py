@@ -0,0 +1,89 @@
+"""
+Persisted player identity store and season input manifest for make_index.
+
+The store links each Basketball Reference player_id to a pbpstats EntityId,
+with the method and confidence of the match that established the link and
+the first/last season it was seen. The manifest records a hash of each
+season's input files so unchanged seasons are not re-matched.
+"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+STORE_PATH = 'player_identity_store.csv'
+MANIFEST_PATH = 'index_manifest.csv'
+STORE_COLUMNS = ['player_id', 'EntityId', 'match_method', 'confidence', 'first_season', 'last_season']
+
+
+def season_rank(year_season):
+    """Sort key placing '2010' before '2010ps' before '2011'."""
+    year_season = str(year_season)
+    return int(year_season[:4]), year_season.endswith('ps')
+
+
+def season_code(year, is_playoffs):
+    """Integer season key in season_rank order: 2010 -> 20100, 2010ps -> 20101."""
+    return np.asarray(year, dtype=np.int64) * 10 + np.asarray(is_playoffs, dtype=np.int64)
+
+
+def file_hash(*paths):
+    """SHA-256 over the bytes of every file in `paths`."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_store(path=STORE_PATH):
+    """Return {player_id: record} from the store file, or an empty store."""
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path, dtype={'player_id': str, 'first_season': str, 'last_season': str})
+    return {rec['player_id']: rec for rec in df.to_dict('records')}
+
+
+def save_store(store, path=STORE_PATH):
+    records = sorted(store.values(), key=lambda r: (season_rank(r['first_season']), r['player_id']))
+    pd.DataFrame(records, columns=STORE_COLUMNS).to_csv(path, index=False)
+
+
+def update_store(store, matches):
+    """
+    Upsert one season's matches into the store.
+
+    A match that agrees with the stored EntityId only widens the season range,
+    so the method and confidence of the original link are kept.
+    """
+    for m in matches:
+        season = m['year_season']
+        rec = store.get(m['player_id'])
+        if rec is not None and rec['EntityId'] == m['EntityId']:
+            rec['first_season'] = min(rec['first_season'], season, key=season_rank)
+            rec['last_season'] = max(rec['last_season'], season, key=season_rank)
+            continue
+        store[m['player_id']] = {
+            'player_id': m['player_id'],
+            'EntityId': m['EntityId'],
+            'match_method': m['match_method'],
+            'confidence': m['confidence'],
+            'first_season': season,
+            'last_season': season,
+        }
+    return store
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Return {year_season: input_hash} from the manifest file."""
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path, dtype=str)
+    return dict(zip(df['year_season'], df['input_hash']))
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    rows = [{'year_season': k, 'input_hash': manifest[k]} for k in sorted(manifest, key=season_rank)]
+    pd.DataFrame(rows, columns=['year_season', 'input_hash']).to_csv(path, index=False)
@@ -0,0 +1,168 @@
+"""
+League baselines for every season of a merge_data run, computed once up front.
+
+League ORtg/DRtg and the shooting baselines (TS%, 2TS%, 3TS%, mod_ts) come
+from each season's team_{year}{ps}_pbp.csv totals, evaluated with the same
+metric formulas as the player rows in one pass over all seasons. In the
+playoffs the league TS% is also what every team's opponents shot, which is
+the playoff rTSPct baseline ('opp_ts_pct'). The regular-season rTSPct
+baseline ('avg_ts') keeps the avg_shooting.csv definition over the player pbp
+file. Rows are cached in league_context.csv keyed by a hash of each season's
+input files and of the baseline code, so only new or changed seasons are
+recomputed.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import aggregations
+import metrics
+from aggregations import group_sums
+from identity_store import file_hash, season_rank
+from metrics import evaluate_metrics
+from perf_trace import traced
+
+LEAGUE_CONTEXT_PATH = 'league_context.csv'
+CONTEXT_COLUMNS = ['year_season', 'year', 'is_playoffs', 'input_hash', 'league_ortg', 'league_drtg',
+                   'league_ts', 'league_2ts', 'league_3ts', 'league_mod_ts', 'opp_ts_pct', 'avg_ts']
+# Player pbp columns behind the rTSPct baseline
+AVG_TS_COLUMNS = {'FG2A', 'FG3A', 'Points', 'TwoPtShootingFoulsDrawn', '2pt And 1 Free Throw Trips',
+                  'ThreePtShootingFoulsDrawn', '3pt And 1 Free Throw Trips', 'NonShootingFoulsDrawn',
+                  'Technical Free Throw Trips'}
+TEAM_SHOOTING = {'league_ts': 'TS_pct', 'league_2ts': '2TS_percent', 'league_3ts': '3TS_percent',
+                 'league_mod_ts': 'mod_ts'}
+
+
+class LeagueContext:
+    """League baselines indexed by year_season ('2015', '2015ps', ...)."""
+
+    def __init__(self, table):
+        self.table = table.set_index('year_season', drop=False)
+
+    def season(self, year_season):
+        return self.table.loc[year_season]
+
+    def avg_ts_by_year(self):
+        """Regular-season rTSPct baseline as {year: TS%}, the shape metrics.py expects."""
+        regular = self.table[~self.table['is_playoffs']].dropna(subset=['avg_ts'])
+        return pd.Series(regular['avg_ts'].to_numpy(), index=regular['year'].to_numpy())
+
+    def opp_ts_by_year(self):
+        """Playoff rTSPct baseline as {year: opponent TS%, in percent}."""
+        playoffs = self.table[self.table['is_playoffs']].dropna(subset=['opp_ts_pct'])
+        return pd.Series(playoffs['opp_ts_pct'].to_numpy(), index=playoffs['year'].to_numpy())
+
+    def avg_shooting(self):
+        """The regular-season baselines in the avg_shooting.csv layout."""
+        regular = self.table[~self.table['is_playoffs']].dropna(subset=['avg_ts'])
+        # Season as (year-1)-yy (e.g. 2009-10), which readers increment back to the year
+        seasons = [f"{year - 1}-{str(year)[-2:]}" for year in regular['year']]
+        return pd.DataFrame({'Season': seasons, 'TS%': regular['avg_ts'].to_numpy()})
+
+
+def season_paths(data_folder, year_season):
+    return (os.path.join(data_folder, f"team_{year_season}_pbp.csv"),
+            os.path.join(data_folder, f"{year_season}_pbp.csv"))
+
+
+def input_hash(data_folder, year_season):
+    """Hash of a season's pbp files and of the code computing its baselines, so a formula edit invalidates it."""
+    paths = [p for p in season_paths(data_folder, year_season) if os.path.exists(p)]
+    return file_hash(*paths, __file__, aggregations.__file__, metrics.__file__)
+
+
+def compute_baselines(data_folder, seasons):
+    """Baseline rows for `seasons` (list of year_season) in one vectorized pass."""
+    rows = pd.DataFrame({'year_season': seasons})
+    rows['year'] = rows['year_season'].str[:4].astype(int)
+    rows['is_playoffs'] = rows['year_season'].str.endswith('ps')
+    codes = np.arange(len(seasons))
+
+    # Team totals per season, then every shooting formula over all seasons at once
+    team_frames = []
+    player_frames = []
+    for code, year_season in zip(codes, seasons):
+        team_path, player_path = season_paths(data_folder, year_season)
+        if os.path.exists(team_path):
+            team_frames.append(pd.read_csv(team_path).fillna(0).assign(_season=code))
+        if os.path.exists(player_path):
+            player = pd.read_csv(player_path, usecols=lambda c: c in AVG_TS_COLUMNS)
+            player_frames.append(player.fillna(0).assign(_season=code))
+
+    for col in ['league_ortg', 'league_drtg', *TEAM_SHOOTING]:
+        rows[col] = np.nan
+    if team_frames:
+        teams = pd.concat(team_frames, ignore_index=True).fillna(0)
+        totals = teams.groupby('_season').sum(numeric_only=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            baselines = {
+                'league_ortg': np.where(totals['OffPoss'] > 0, totals['Points'] / totals['OffPoss'] * 100, np.nan),
+                'league_drtg': np.where(totals['DefPoss'] > 0, totals['OpponentPoints'] / totals['DefPoss'] * 100, np.nan),
+            }
+        shooting = evaluate_metrics(totals, list(TEAM_SHOOTING.values()))
+        for col, name in TEAM_SHOOTING.items():
+            baselines[col] = shooting[name]
+        for col, values in baselines.items():
+            rows.loc[totals.index, col] = values
+    # In the playoffs the league TS% is what every team's opponents shot, in percent
+    rows['opp_ts_pct'] = np.where(rows['is_playoffs'], rows['league_ts'] * 100, np.nan)
+
+    # avg_ts: each season summed as one slice so it matches the per-file Series.sum exactly
+    rows['avg_ts'] = np.nan
+    if player_frames:
+        players = pd.concat(player_frames, ignore_index=True).fillna(0)
+        # Components for TSA (as defined in your field_calculations module)
+        s_ft_poss = (players['TwoPtShootingFoulsDrawn'] - players['2pt And 1 Free Throw Trips']) + \
+                    (players['ThreePtShootingFoulsDrawn'] - players['3pt And 1 Free Throw Trips'])
+        tsa = (players['FG2A'] + players['FG3A']) + s_ft_poss + players['NonShootingFoulsDrawn']
+        # Points adjusted for estimated technical FT value
+        pts_adj = players['Points'] - (players.get('Technical Free Throw Trips', 0) * 0.8)
+        league_pts, league_tsa = group_sums(players['_season'].to_numpy(), len(seasons),
+                                            pts_adj.to_numpy(dtype='float64'), tsa.to_numpy(dtype='float64'))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rows['avg_ts'] = np.where(league_tsa > 0, league_pts / (2 * league_tsa), np.nan)
+    return rows
+
+
+def load_context(path=LEAGUE_CONTEXT_PATH):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=CONTEXT_COLUMNS)
+    # round_trip parsing so cached baselines are bit-identical to freshly computed ones
+    return pd.read_csv(path, dtype={'year_season': str, 'input_hash': str}, float_precision='round_trip')
+
+
+@traced()
+def build_league_context(data_folder, seasons, cache_path=LEAGUE_CONTEXT_PATH, rebuild=False):
+    """
+    Baselines for `seasons`, reusing cached rows whose input files are unchanged.
+
+    Args:
+        data_folder: Folder holding the team and player pbp files
+        seasons: year_season labels to cover
+        cache_path: Cache file, or None to skip caching
+        rebuild: Ignore the cache and recompute every season
+
+    Returns:
+        LeagueContext over `seasons`
+    """
+    hashes = {s: input_hash(data_folder, s) for s in seasons}
+    cached = pd.DataFrame(columns=CONTEXT_COLUMNS) if rebuild or cache_path is None else load_context(cache_path)
+    cached = cached[cached['year_season'].isin(seasons)]
+    fresh = cached[cached['year_season'].map(hashes) == cached['input_hash']]
+
+    stale = [s for s in seasons if s not in set(fresh['year_season'])]
+    if stale:
+        print(f"Computing league baselines for {len(stale)} season(s)...")
+        computed = compute_baselines(data_folder, stale)
+        computed['input_hash'] = computed['year_season'].map(hashes)
+        parts = [df for df in (fresh, computed[CONTEXT_COLUMNS]) if len(df)]
+        fresh = pd.concat(parts, ignore_index=True)
+
+    table = fresh.sort_values('year_season', key=lambda s: s.map(season_rank), kind='stable')
+    table = table.reset_index(drop=True)[CONTEXT_COLUMNS]
+    table['year'] = table['year'].astype(int)
+    table['is_playoffs'] = table['is_playoffs'].astype(bool)
+    if stale and cache_path is not None:
+        table.to_csv(cache_path, index=False)
+    return LeagueContext(table)
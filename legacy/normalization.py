@@ -4,6 +4,22 @@ Normalization and additional metrics calculation module.
 import pandas as pd
 import numpy as np
 
+from aggregations import grouped_weighted_mean
+from metrics import attach_columns
+
+
+# Columns the chain reads that the WNBA master does not carry: NBA hustle and
+# defensive tracking, on/off splits and playtype shooting. legacy_chain adds
+# them as NaN so every stage still runs.
+OPTIONAL_INPUTS = [
+    'DEFLECTIONS', 'SCREEN_ASSISTS', 'SCREEN_AST_PTS', 'OFF_LOOSE_BALLS_RECOVERED', 'DEF_LOOSE_BALLS_RECOVERED',
+    'all_dfga', 'dif%', 'rim_dfga', 'rim_dif%',
+    'rim_acc_on', 'rim_acc_off', 'rim_freq_on', 'rim_freq_off', 'ortg_on', 'drtg_on', 'netrtg_on',
+    'ortg_off', 'drtg_off', 'netrtg_off',
+    'final_creation_TS', 'final_shooting_TS', 'final_ee_TS',
+    'final_creation_TSA100', 'final_shooting_TSA100', 'final_ee_TSA100',
+]
+
 
 def normalize_fields(df):
     """
@@ -22,21 +38,21 @@ def normalize_fields(df):
         'FG3A', 'FTA', 'FGA', 'FTOVs', 'DEF_LOOSE_BALLS_RECOVERED'
     ]
     
+    # Stale normalized fields are removed, so the fresh ones land at the end
+    stale = [f'd_{field}{suffix}' for field in fields_to_normalize for suffix in ['_Per100', '_PerGame', '_Per75']]
+    df = df.drop(columns=[col for col in stale if col in df.columns])
+    
+    cols = {}
     for field in fields_to_normalize:
-        # Remove fields if they exist
-        for suffix in ['_Per100', '_PerGame', '_Per75']:
-            col_name = f'd_{field}{suffix}'
-            if col_name in df.columns:
-                df.drop(columns=[col_name], inplace=True)
-        
-        df[f'd_{field}_Per100'] = df[field] * 100 / df['OffPoss']
-        df[f'd_{field}_PerGame'] = df[field] / df['GamesPlayed']
+        cols[f'd_{field}_Per100'] = df[field] * 100 / df['OffPoss']
+        cols[f'd_{field}_PerGame'] = df[field] / df['GamesPlayed']
     
-    df['Points_Created'] = df['Points'] + df['AssistPoints']
-    df['d_Points_Created_Per100'] = df['Points_Created'] * 100 / df['OffPoss']
-    df['d_Points_Created_PerGame'] = df['Points_Created'] / df['GamesPlayed']
+    points_created = df['Points'] + df['AssistPoints']
+    cols['Points_Created'] = points_created
+    cols['d_Points_Created_Per100'] = points_created * 100 / df['OffPoss']
+    cols['d_Points_Created_PerGame'] = points_created / df['GamesPlayed']
     
-    return df
+    return attach_columns(df, cols)
 
 
 def basic_stats(df):
@@ -49,37 +65,38 @@ def basic_stats(df):
     Returns:
         DataFrame with basic stats added
     """
-    df['basic_PPG'] = df['Points'] / df['GamesPlayed']
-    df['basic_aPPG'] = df['AssistPoints'] / df['GamesPlayed']
-    df['basic_APG'] = df['Assists'] / df['GamesPlayed']
-    df['basic_ORB'] = df['OffRebounds'] / df['GamesPlayed']
-    df['basic_DRB'] = df['DefRebounds'] / df['GamesPlayed']
-    df['basic_REB'] = (df['DefRebounds'] + df['OffRebounds']) / df['GamesPlayed']
-    df['basic_TOVPG'] = df['Turnovers'] / df['GamesPlayed']
-    
-    return df
+    return attach_columns(df, {
+        'basic_PPG': df['Points'] / df['GamesPlayed'],
+        'basic_aPPG': df['AssistPoints'] / df['GamesPlayed'],
+        'basic_APG': df['Assists'] / df['GamesPlayed'],
+        'basic_ORB': df['OffRebounds'] / df['GamesPlayed'],
+        'basic_DRB': df['DefRebounds'] / df['GamesPlayed'],
+        'basic_REB': (df['DefRebounds'] + df['OffRebounds']) / df['GamesPlayed'],
+        'basic_TOVPG': df['Turnovers'] / df['GamesPlayed'],
+    })
 
 
 def adj_hustle(df):
     """
     Calculate hustle statistics per 100 possessions.
     
+    StealDeflectionRatio is NaN where a player has no deflections.
+    
     Args:
         df: Input DataFrame
         
     Returns:
         DataFrame with hustle stats added
     """
-    df['Deflections/100'] = df['DEFLECTIONS'] * 100 / df['DefPoss']
-    df['StealDeflectionRatio'] = df.apply(
-        lambda x: '' if x['DEFLECTIONS'] == 0 or pd.isna(x['DEFLECTIONS']) 
-        else x['Steals'] / x['DEFLECTIONS'], axis=1)
-    df['SCREEN_ASSISTS_100'] = df['SCREEN_ASSISTS'] / df['OffPoss'] * 100
-    df['SCREEN_AST_PTS_100'] = df['SCREEN_AST_PTS'] / df['OffPoss'] * 100
-    df['OFF_LOOSE_BALLS_RECOVERED_100'] = df['OFF_LOOSE_BALLS_RECOVERED'] / df['OffPoss'] * 100
-    df['DEF_LOOSE_BALLS_RECOVERED_100'] = df['DEF_LOOSE_BALLS_RECOVERED'] / df['DefPoss'] * 100
-    
-    return df
+    deflections = df['DEFLECTIONS']
+    return attach_columns(df, {
+        'Deflections/100': deflections * 100 / df['DefPoss'],
+        'StealDeflectionRatio': (df['Steals'] / deflections).where(deflections.notna() & (deflections != 0)),
+        'SCREEN_ASSISTS_100': df['SCREEN_ASSISTS'] / df['OffPoss'] * 100,
+        'SCREEN_AST_PTS_100': df['SCREEN_AST_PTS'] / df['OffPoss'] * 100,
+        'OFF_LOOSE_BALLS_RECOVERED_100': df['OFF_LOOSE_BALLS_RECOVERED'] / df['OffPoss'] * 100,
+        'DEF_LOOSE_BALLS_RECOVERED_100': df['DEF_LOOSE_BALLS_RECOVERED'] / df['DefPoss'] * 100,
+    })
 
 
 def calculate_offensive_metrics(df):
@@ -92,30 +109,35 @@ def calculate_offensive_metrics(df):
     Returns:
         DataFrame with offensive metrics added
     """
+    cols = {}
+    
     # Calculate 3pt proficiency
-    df['three_pt_prof'] = (2 / (1 + np.exp(-df['d_FG3A_Per100'])) - 1) * df['3P_PERC']
+    three_pt_prof = (2 / (1 + np.exp(-df['d_FG3A_Per100'])) - 1) * df['3P_PERC']
+    cols['three_pt_prof'] = three_pt_prof
     
     # Calculate Box Creation using 3pt proficiency
-    df['box_creation'] = (df['d_Assists_Per100'] * 0.1843 + 
-                         (df['d_Points_Per100'] + df['d_Turnovers_Per100']) * 0.0969 - 
-                         2.3021 * df['three_pt_prof'] +
-                         0.0582 * (df['d_Assists_Per100'] * (df['d_Points_Per100'] + df['d_Turnovers_Per100']) * df['three_pt_prof']) - 
-                         1.1942)
+    box_creation = (df['d_Assists_Per100'] * 0.1843 + 
+                    (df['d_Points_Per100'] + df['d_Turnovers_Per100']) * 0.0969 - 
+                    2.3021 * three_pt_prof +
+                    0.0582 * (df['d_Assists_Per100'] * (df['d_Points_Per100'] + df['d_Turnovers_Per100']) * three_pt_prof) - 
+                    1.1942)
+    cols['box_creation'] = box_creation
     
     # Calculate Offensive Load using Box Creation
-    df['offensive_load'] = ((df['d_Assists_Per100'] - (0.38 * df['box_creation'])) * 0.75 + 
-                           df['d_FGA_Per100'] + 
-                           df['d_FTA_Per100'] * 0.44 + 
-                           df['box_creation'] + 
-                           df['d_Turnovers_Per100'])
-    df['cTOV'] = df['d_Turnovers_Per100'] / df['offensive_load']
+    offensive_load = ((df['d_Assists_Per100'] - (0.38 * box_creation)) * 0.75 + 
+                      df['d_FGA_Per100'] + 
+                      df['d_FTA_Per100'] * 0.44 + 
+                      box_creation + 
+                      df['d_Turnovers_Per100'])
+    cols['offensive_load'] = offensive_load
+    cols['cTOV'] = df['d_Turnovers_Per100'] / offensive_load
     
     # Calculate field goal percentages by zone
-    df['RimFGPerc'] = df['AtRimFGM'] / df['AtRimFGA']
-    df['ShortMidFGPerc'] = df['ShortMidRangeFGM'] / df['ShortMidRangeFGA']
-    df['LongMidFGPerc'] = df['LongMidRangeFGM'] / df['LongMidRangeFGA']
+    cols['RimFGPerc'] = df['AtRimFGM'] / df['AtRimFGA']
+    cols['ShortMidFGPerc'] = df['ShortMidRangeFGM'] / df['ShortMidRangeFGA']
+    cols['LongMidFGPerc'] = df['LongMidRangeFGM'] / df['LongMidRangeFGA']
     
-    return df
+    return attach_columns(df, cols)
 
 
 def new_modify_df(df):
@@ -128,67 +150,76 @@ def new_modify_df(df):
     Returns:
         DataFrame with new metrics added
     """
-    df['scoring_tovs'] = df['Turnovers'] - df['BadPassTurnovers'] - df['BadPassOutOfBoundsTurnovers']
-    df['ScoringTOV%'] = df['scoring_tovs'] / df['TSA100']
-    df['true_badpass_tovs'] = df['BadPassTurnovers'] + df['BadPassOutOfBoundsTurnovers']
-    df['true_badpass_tovs_100'] = df['true_badpass_tovs'] / df['OffPoss'] * 100
-    df['scoring_tovs_100'] = df['scoring_tovs'] / df['OffPoss'] * 100
-    df['TOV_100'] = df['Turnovers'] / df['OffPoss'] * 100
-    df['OFFD'] = (df['Offensive Fouls Drawn'].fillna(0) + df['Charge Fouls Drawn'].fillna(0))
-    df['OFFD_100'] = (df['OFFD'] / df['DefPoss'] * 100).fillna(0)
-    df['Steals_100'] = (df['Steals'] / df['DefPoss'] * 100).fillna(0)
-    
-    df['FTOVs'] = (df['Steals'].fillna(0) + df['OFFD'].fillna(0))
-    df['FTOVS_PG'] = df['FTOVs'] / df['GamesPlayed']
-    
-    df['FTOV_100'] = (df['OFFD_100'] + df['Steals_100']).fillna(0)
-    df['STOPS'] = (df['FTOVs'] + df['RecoveredBlocks'].fillna(0))
-    df['STOPS_100'] = (df['STOPS'] / df['DefPoss'] * 100).fillna(0)
-    df['block_recov_percent'] = (df['RecoveredBlocks'] / df['Blocks']).fillna(0)
-    df['Blocks_100'] = df['Blocks'] / df['DefPoss'] * 100
-    df['Blocks_PG'] = df['Blocks'] / df['GamesPlayed']
-    df['RecoveredBlocks_100'] = df['RecoveredBlocks'] / df['DefPoss'] * 100
-    
-    # Optimized weighted average calculations
-    def calculate_weighted_avg_by_year(df, value_col, weight_col):
-        """Calculate weighted average by year using vectorized operations."""
-        mask = (~pd.isna(df[value_col])) & (df[weight_col] > 0)
-        if not mask.any():
-            return pd.Series(index=df.index, dtype='float64')
-        
-        grouped = df[mask].groupby('year')
-        weighted_sum = grouped.apply(lambda x: (x[value_col] * x[weight_col]).sum())
-        weight_sum = grouped[weight_col].sum()
-        weighted_avg = weighted_sum / weight_sum
-        
-        return df['year'].map(weighted_avg)
-    
-    df['year_avg_ftov'] = calculate_weighted_avg_by_year(df, 'FTOV_100', 'DefPoss')
-    df['year_avg_stops'] = calculate_weighted_avg_by_year(df, 'STOPS_100', 'DefPoss')
-    df['rFTOV_100'] = df['FTOV_100'] - df['year_avg_ftov']
-    df['rSTOPS_100'] = df['STOPS_100'] - df['year_avg_stops']
-    
-    df['SFC_100'] = df['ShootingFouls'] / df['DefPoss'] * 100
-    df['year_avg_sfc'] = calculate_weighted_avg_by_year(df, 'SFC_100', 'DefPoss')
-    df['rSFC_100'] = df['SFC_100'] - df['year_avg_sfc']
-    
-    df['DumbPenaltyFouls'] = df['NonShootingPenaltyNonTakeFouls']
-    df['DumbPenaltyFouls_100'] = df['DumbPenaltyFouls'] / df['PenaltyDefPoss'] * 100
-    df['year_avg_dpf'] = calculate_weighted_avg_by_year(df, 'DumbPenaltyFouls_100', 'PenaltyDefPoss')
-    df['rDumbPenaltyFouls_100'] = df['DumbPenaltyFouls_100'] - df['year_avg_dpf']
-    df['PenaltyDefPossPct'] = df['PenaltyDefPoss'] / df['DefPoss']
+    cols = {}
+    scoring_tovs = df['Turnovers'] - df['BadPassTurnovers'] - df['BadPassOutOfBoundsTurnovers']
+    cols['scoring_tovs'] = scoring_tovs
+    cols['ScoringTOV%'] = scoring_tovs / df['TSA100']
+    true_badpass_tovs = df['BadPassTurnovers'] + df['BadPassOutOfBoundsTurnovers']
+    cols['true_badpass_tovs'] = true_badpass_tovs
+    cols['true_badpass_tovs_100'] = true_badpass_tovs / df['OffPoss'] * 100
+    cols['scoring_tovs_100'] = scoring_tovs / df['OffPoss'] * 100
+    cols['TOV_100'] = df['Turnovers'] / df['OffPoss'] * 100
+    offd = (df['Offensive Fouls Drawn'].fillna(0) + df['Charge Fouls Drawn'].fillna(0))
+    cols['OFFD'] = offd
+    offd_100 = (offd / df['DefPoss'] * 100).fillna(0)
+    cols['OFFD_100'] = offd_100
+    steals_100 = (df['Steals'] / df['DefPoss'] * 100).fillna(0)
+    cols['Steals_100'] = steals_100
+    
+    ftovs = (df['Steals'].fillna(0) + offd.fillna(0))
+    cols['FTOVs'] = ftovs
+    cols['FTOVS_PG'] = ftovs / df['GamesPlayed']
+    
+    ftov_100 = (offd_100 + steals_100).fillna(0)
+    cols['FTOV_100'] = ftov_100
+    stops = (ftovs + df['RecoveredBlocks'].fillna(0))
+    cols['STOPS'] = stops
+    stops_100 = (stops / df['DefPoss'] * 100).fillna(0)
+    cols['STOPS_100'] = stops_100
+    cols['block_recov_percent'] = (df['RecoveredBlocks'] / df['Blocks']).fillna(0)
+    cols['Blocks_100'] = df['Blocks'] / df['DefPoss'] * 100
+    cols['Blocks_PG'] = df['Blocks'] / df['GamesPlayed']
+    cols['RecoveredBlocks_100'] = df['RecoveredBlocks'] / df['DefPoss'] * 100
+    
+    def weighted_avg_by_year(values, weight_col):
+        """Weighted average of values by year, over rows with a positive weight."""
+        return pd.Series(grouped_weighted_mean(values, df[weight_col], by=df['year']), index=df.index)
+    
+    year_avg_ftov = weighted_avg_by_year(ftov_100, 'DefPoss')
+    year_avg_stops = weighted_avg_by_year(stops_100, 'DefPoss')
+    cols['year_avg_ftov'] = year_avg_ftov
+    cols['year_avg_stops'] = year_avg_stops
+    cols['rFTOV_100'] = ftov_100 - year_avg_ftov
+    cols['rSTOPS_100'] = stops_100 - year_avg_stops
+    
+    sfc_100 = df['ShootingFouls'] / df['DefPoss'] * 100
+    year_avg_sfc = weighted_avg_by_year(sfc_100, 'DefPoss')
+    cols['SFC_100'] = sfc_100
+    cols['year_avg_sfc'] = year_avg_sfc
+    cols['rSFC_100'] = sfc_100 - year_avg_sfc
+    
+    dumb_penalty_fouls = df['NonShootingPenaltyNonTakeFouls']
+    dumb_penalty_fouls_100 = dumb_penalty_fouls / df['PenaltyDefPoss'] * 100
+    year_avg_dpf = weighted_avg_by_year(dumb_penalty_fouls_100, 'PenaltyDefPoss')
+    cols['DumbPenaltyFouls'] = dumb_penalty_fouls
+    cols['DumbPenaltyFouls_100'] = dumb_penalty_fouls_100
+    cols['year_avg_dpf'] = year_avg_dpf
+    cols['rDumbPenaltyFouls_100'] = dumb_penalty_fouls_100 - year_avg_dpf
+    cols['PenaltyDefPossPct'] = df['PenaltyDefPoss'] / df['DefPoss']
     
     # Calculate per 100 versions of assist types
+    assists_100 = {}
     for col in ['AtRimAssists', 'ShortMidRangeAssists', 'LongMidRangeAssists', 'ThreePtAssists']:
-        df[f'{col}/100'] = (df[col] / df['OffPoss']) * 100
+        assists_100[col] = (df[col] / df['OffPoss']) * 100
+        cols[f'{col}/100'] = assists_100[col]
     
-    df['Assists/100'] = (df['Assists'] / df['OffPoss']) * 100
-    df['AdjAssists/100'] = (df['AtRimAssists/100'] + df['ShortMidRangeAssists/100'] + 
-                           df['LongMidRangeAssists/100'] + df['ThreePtAssists/100'] * 1.5)
-    df['AssistPoints/100'] = (df['AtRimAssists/100'] * 2 + df['ShortMidRangeAssists/100'] * 2 + 
-                              df['LongMidRangeAssists/100'] * 2 + df['ThreePtAssists/100'] * 3)
+    cols['Assists/100'] = (df['Assists'] / df['OffPoss']) * 100
+    cols['AdjAssists/100'] = (assists_100['AtRimAssists'] + assists_100['ShortMidRangeAssists'] + 
+                              assists_100['LongMidRangeAssists'] + assists_100['ThreePtAssists'] * 1.5)
+    cols['AssistPoints/100'] = (assists_100['AtRimAssists'] * 2 + assists_100['ShortMidRangeAssists'] * 2 + 
+                                assists_100['LongMidRangeAssists'] * 2 + assists_100['ThreePtAssists'] * 3)
     
-    return df
+    return attach_columns(df, cols)
 
 
 def add_new_fields(df):
@@ -201,47 +232,46 @@ def add_new_fields(df):
     Returns:
         DataFrame with new fields added
     """
-    df['rTS'] = (df['TS_pct'] - df['avg_ts'])
+    cols = {'rTS': (df['TS_pct'] - df['avg_ts'])}
     
-    # Convert columns to numeric
+    # Numeric inputs, with NaN and infinities read as 0
     numeric_columns = ['all_dfga', 'dif%', 'rim_dfga', 'rim_dif%', 'DefPoss', 'rTS', 'TSA100']
     for col in numeric_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    df[numeric_columns] = df[numeric_columns].fillna(0)
-    df[numeric_columns] = df[numeric_columns].replace([np.inf, -np.inf], 0)
+        values = cols[col] if col in cols else df[col]
+        cols[col] = pd.to_numeric(values, errors='coerce').fillna(0).replace([np.inf, -np.inf], 0)
     
-    # Vectorized calculations instead of apply
-    df['points_saved'] = np.where(
-        (df['all_dfga'].notna()) & (df['dif%'].notna()),
-        df['all_dfga'] * df['dif%'] * -2 / 100,
+    points_saved = pd.Series(np.where(
+        (cols['all_dfga'].notna()) & (cols['dif%'].notna()),
+        cols['all_dfga'] * cols['dif%'] * -2 / 100,
         np.nan
-    )
-    df['rim_points_saved'] = np.where(
-        (df['rim_dfga'].notna()) & (df['rim_dif%'].notna()),
-        df['rim_dfga'] * df['rim_dif%'] * -2 / 100,
+    ), index=df.index)
+    rim_points_saved = pd.Series(np.where(
+        (cols['rim_dfga'].notna()) & (cols['rim_dif%'].notna()),
+        cols['rim_dfga'] * cols['rim_dif%'] * -2 / 100,
         np.nan
-    )
-    
-    df['points_saved_100'] = np.where(
-        (df['points_saved'].notna()) & (df['DefPoss'] > 0),
-        (df['points_saved'] / df['DefPoss']) * 100,
+    ), index=df.index)
+    cols['points_saved'] = points_saved
+    cols['rim_points_saved'] = rim_points_saved
+    
+    def_poss = cols['DefPoss']
+    cols['points_saved_100'] = np.where(
+        (points_saved.notna()) & (def_poss > 0),
+        (points_saved / def_poss) * 100,
         np.nan
     )
-    df['rim_points_saved_100'] = np.where(
-        (df['rim_points_saved'].notna()) & (df['DefPoss'] > 0),
-        (df['rim_points_saved'] / df['DefPoss']) * 100,
+    cols['rim_points_saved_100'] = np.where(
+        (rim_points_saved.notna()) & (def_poss > 0),
+        (rim_points_saved / def_poss) * 100,
         np.nan
     )
     
-    df['TS_added_100'] = np.where(
-        (df['rTS'].notna()) & (df['TSA100'].notna()),
-        df['rTS'] * 2 * df['TSA100'],
+    cols['TS_added_100'] = np.where(
+        (cols['rTS'].notna()) & (cols['TSA100'].notna()),
+        cols['rTS'] * 2 * cols['TSA100'],
         np.nan
     )
     
-    return df
+    return attach_columns(df, cols)
 
 
 def create_dfg_breakdown_columns(df):
@@ -259,60 +289,43 @@ def create_dfg_breakdown_columns(df):
         'rim_freq_on', 'rim_freq_off', 'ortg_on', 'drtg_on', 'netrtg_on',
         'ortg_off', 'drtg_off', 'netrtg_off'
     ]
-    for col in numeric_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # Optimized yearly average calculations
-    def weighted_avg_transform(group, value_col, weight_col):
-        """Calculate weighted average using vectorized operations."""
-        mask = group[weight_col] > 0
-        if not mask.any():
-            return pd.Series(index=group.index, dtype='float64')
-        weights = group.loc[mask, weight_col]
-        values = group.loc[mask, value_col]
-        weighted_avg = (values * weights).sum() / weights.sum()
-        return pd.Series(weighted_avg, index=group.index)
-    
-    # Calculate yearly averages
-    yearly_rim_acc_avg = df.groupby('year').apply(
-        lambda x: (x['rim_acc_on'] * x['DefPoss']).sum() / x['DefPoss'].sum()
-    )
-    yearly_rim_freq_avg = df.groupby('year').apply(
-        lambda x: (x['rim_freq_on'] * x['DefPoss']).sum() / x['DefPoss'].sum()
-    )
-    yearly_ortg_avg = df.groupby('year').apply(
-        lambda x: (x['ortg_on'] * x['OffPoss']).sum() / x['OffPoss'].sum()
-    )
-    yearly_drtg_avg = df.groupby('year').apply(
-        lambda x: (x['drtg_on'] * x['DefPoss']).sum() / x['DefPoss'].sum()
-    )
-    
-    df['rim_acc_onoff'] = df['rim_acc_on'] - df['rim_acc_off']
-    df['rim_freq_onoff'] = df['rim_freq_on'] - df['rim_freq_off']
-    df['rortg_on_off'] = df['ortg_on'] - df['ortg_off']
-    df['rdrtg_on_off'] = df['drtg_on'] - df['drtg_off']
-    df['rdrtg_on_off'] = df['rdrtg_on_off'] * -1
-    df['netrtg_on_off'] = df['netrtg_on'] - df['netrtg_off']
-    
-    # Calculate relative values using map instead of apply
-    df['rim_acc_on'] = df['rim_acc_on'] - df['year'].map(yearly_rim_acc_avg)
-    df['rim_freq_on'] = df['rim_freq_on'] - df['year'].map(yearly_rim_freq_avg)
-    df['rortg_on'] = df['ortg_on'] - df['year'].map(yearly_ortg_avg)
+    cols = {col: pd.to_numeric(df[col], errors='coerce') for col in numeric_columns if col in df.columns}
+    
+    def num(col):
+        return cols[col] if col in cols else df[col]
+    
+    # Yearly averages weight every non-NaN row, zero and negative weights included.
+    # A missing product stays in the year's sum as 0, as in Series.sum over the
+    # whole year, so the pairwise summation order is the same.
+    def yearly_avg(value_col, weight_col):
+        values, weights = num(value_col), num(weight_col)
+        missing = (values * weights).isna()
+        return grouped_weighted_mean(values.mask(missing, 0), weights.mask(missing & weights.isna(), 0),
+                                     by=df['year'], positive_weights=False, full_denominator=True)
+    
+    yearly_rim_acc_avg = yearly_avg('rim_acc_on', 'DefPoss')
+    yearly_rim_freq_avg = yearly_avg('rim_freq_on', 'DefPoss')
+    yearly_ortg_avg = yearly_avg('ortg_on', 'OffPoss')
+    
+    # Rim percentages are reported out of 100
+    cols['rim_acc_onoff'] = (num('rim_acc_on') - num('rim_acc_off')) * 100
+    cols['rim_freq_onoff'] = (num('rim_freq_on') - num('rim_freq_off')) * 100
+    cols['rortg_on_off'] = num('ortg_on') - num('ortg_off')
+    cols['rdrtg_on_off'] = (num('drtg_on') - num('drtg_off')) * -1
+    cols['netrtg_on_off'] = num('netrtg_on') - num('netrtg_off')
+    
+    # Relative values against the yearly averages
+    cols['rim_acc_on'] = (num('rim_acc_on') - yearly_rim_acc_avg) * 100
+    cols['rim_freq_on'] = (num('rim_freq_on') - yearly_rim_freq_avg) * 100
+    cols['rortg_on'] = num('ortg_on') - yearly_ortg_avg
     # Note: Original script has a bug - uses yearly_ortg_avg instead of yearly_drtg_avg for rdrtg_on
     # Matching original behavior to ensure identical outputs
-    df['rdrtg_on'] = df['drtg_on'] - df['year'].map(yearly_ortg_avg)
-    df['rdrtg_on'] = df['rdrtg_on'] * -1
+    cols['rdrtg_on'] = (num('drtg_on') - yearly_ortg_avg) * -1
     
-    df['dfga/100'] = (df['all_dfga'] / df['DefPoss']) * 100
-    df['rimdfga/100'] = (df['rim_dfga'] / df['DefPoss']) * 100
+    cols['dfga/100'] = (num('all_dfga') / num('DefPoss')) * 100
+    cols['rimdfga/100'] = (num('rim_dfga') / num('DefPoss')) * 100
     
-    rim_percentage_columns = ['rim_acc_on', 'rim_acc_onoff', 'rim_freq_onoff', 'rim_freq_on']
-    for col in rim_percentage_columns:
-        if col in df.columns:
-            df[col] = df[col] * 100
-    
-    return df
+    return attach_columns(df, cols)
 
 
 def calculate_weighted_ts_averages(df):
@@ -326,58 +339,36 @@ def calculate_weighted_ts_averages(df):
         DataFrame with weighted TS averages added
     """
     df = df.copy()
-    df['final_creation_TSA100'] = pd.to_numeric(df['final_creation_TSA100'], errors='coerce')
-    df['final_shooting_TSA100'] = pd.to_numeric(df['final_shooting_TSA100'], errors='coerce')
-    df['final_ee_TSA100'] = pd.to_numeric(df['final_ee_TSA100'], errors='coerce')
-    df['OffPoss'] = pd.to_numeric(df['OffPoss'], errors='coerce')
-    
-    df['final_creation_TSA'] = df['final_creation_TSA100'] * df['OffPoss'] / 100
-    df['final_shooting_TSA'] = df['final_shooting_TSA100'] * df['OffPoss'] / 100
-    df['final_ee_TSA'] = df['final_ee_TSA100'] * df['OffPoss'] / 100
-    
-    def weighted_avg(group, value_col, weight_col):
-        values = pd.to_numeric(group[value_col], errors='coerce')
-        weights = pd.to_numeric(group[weight_col], errors='coerce')
-        mask = values.notna() & weights.notna() & (weights > 0)
-        if mask.any():
-            return np.average(values[mask], weights=weights[mask])
-        return np.nan
-    
-    creation_avgs = df.groupby('year').apply(
-        lambda x: weighted_avg(x, 'final_creation_TS', 'final_creation_TSA'),
-        include_groups=False
-    ).reset_index()
-    creation_avgs.columns = ['year', 'final_creation_avg_ts']
-    
-    shooting_avgs = df.groupby('year').apply(
-        lambda x: weighted_avg(x, 'final_shooting_TS', 'final_shooting_TSA'),
-        include_groups=False
-    ).reset_index()
-    shooting_avgs.columns = ['year', 'final_shooting_avg_ts']
-    
-    ee_avgs = df.groupby('year').apply(
-        lambda x: weighted_avg(x, 'final_ee_TS', 'final_ee_TSA'),
-        include_groups=False
-    ).reset_index()
-    ee_avgs.columns = ['year', 'final_ee_avg_ts']
-    
-    df = df.merge(creation_avgs, on='year', how='left')
-    df = df.merge(shooting_avgs, on='year', how='left')
-    df = df.merge(ee_avgs, on='year', how='left')
-    
-    df['final_creation_rTS'] = df['final_creation_TS'] - df['final_creation_avg_ts']
-    df['final_shooting_rTS'] = df['final_shooting_TS'] - df['final_shooting_avg_ts']
-    df['final_ee_rTS'] = df['final_ee_TS'] - df['final_ee_avg_ts']
-    
-    df['SFC_pct'] = df['SFC_100'] / df['dfga/100'] * 100
-    
-    return df
+    cols = {col: pd.to_numeric(df[col], errors='coerce')
+            for col in ['final_creation_TSA100', 'final_shooting_TSA100', 'final_ee_TSA100', 'OffPoss']}
+    
+    for playtype in ['creation', 'shooting', 'ee']:
+        cols[f'final_{playtype}_TSA'] = cols[f'final_{playtype}_TSA100'] * cols['OffPoss'] / 100
+    
+    for playtype in ['creation', 'shooting', 'ee']:
+        cols[f'final_{playtype}_avg_ts'] = grouped_weighted_mean(
+            pd.to_numeric(df[f'final_{playtype}_TS'], errors='coerce'),
+            cols[f'final_{playtype}_TSA'],
+            by=df['year'],
+        )
+    
+    for playtype in ['creation', 'shooting', 'ee']:
+        cols[f'final_{playtype}_rTS'] = df[f'final_{playtype}_TS'] - cols[f'final_{playtype}_avg_ts']
+    
+    cols['SFC_pct'] = df['SFC_100'] / df['dfga/100'] * 100
+    
+    return attach_columns(df, cols)
 
 
 def positional_added_values(df, weighted_avg_func):
     """
     Calculate position-adjusted added values.
     
+    Each row's positional average is interpolated between the two positions
+    around its Position_Number. The averages are gathered with integer
+    indexing from dense (year x position) tables, one per value, sharing the
+    same row and position indices.
+    
     Args:
         df: Input DataFrame
         weighted_avg_func: Function to calculate weighted averages by group
@@ -385,34 +376,74 @@ def positional_added_values(df, weighted_avg_func):
     Returns:
         DataFrame with position-adjusted values added
     """
-    ts_weighted_avg = weighted_avg_func(df, 'TS_added_100', 'Pos')
-    rim_weighted_avg = weighted_avg_func(df, 'rim_points_saved_100', 'Pos')
-    points_saved_weighted_avg = weighted_avg_func(df, 'points_saved_100', 'Pos')
-    
-    pos_map = {'PG': '1', 'SG': '2', 'SF': '3', 'PF': '4', 'C': '5'}
-    ts_weighted_avg = ts_weighted_avg.rename(columns=pos_map)
-    rim_weighted_avg = rim_weighted_avg.rename(columns=pos_map)
-    points_saved_weighted_avg = points_saved_weighted_avg.rename(columns=pos_map)
-    
-    def interpolate_pos(row, pos_avg):
-        pos_num = row['Position_Number']
-        year = row['year']
-        
-        if pd.isna(pos_num) or pd.isna(year):
-            return np.nan
-        
-        lower_pos = str(int(pos_num))
-        upper_pos = str(min(int(pos_num) + 1, 5))
-        fraction = pos_num - int(pos_num)
-        
-        lower_val = pos_avg.loc[year, lower_pos] if year in pos_avg.index and lower_pos in pos_avg.columns else 0
-        upper_val = pos_avg.loc[year, upper_pos] if year in pos_avg.index and upper_pos in pos_avg.columns else 0
-        
-        return float(lower_val) * (1 - fraction) + float(upper_val) * fraction
-    
-    df['pos_TS_added_100'] = df.apply(lambda row: row['TS_added_100'] - interpolate_pos(row, ts_weighted_avg), axis=1)
-    df['pos_rim_points_saved_100'] = df.apply(lambda row: row['rim_points_saved_100'] - interpolate_pos(row, rim_weighted_avg), axis=1)
-    df['pos_points_saved_100'] = df.apply(lambda row: row['points_saved_100'] - interpolate_pos(row, points_saved_weighted_avg), axis=1)
+    value_cols = ['TS_added_100', 'rim_points_saved_100', 'points_saved_100']
+    pos_avgs = [weighted_avg_func(df, col, 'Pos') for col in value_cols]
+    pos_map = {'PG': 1, 'SG': 2, 'SF': 3, 'PF': 4, 'C': 5}
+    
+    # Dense (year x position) tables over every year any table has. Column 0 and
+    # the last row stay 0 for positions outside 1-5 and years a table lacks.
+    years = pd.Index(sorted(set().union(*[pos_avg.index for pos_avg in pos_avgs])))
+    tables = np.zeros((len(pos_avgs), len(years) + 1, len(pos_map) + 1))
+    for table, pos_avg in zip(tables, pos_avgs):
+        rows = years.get_indexer(pos_avg.index)
+        for pos, number in pos_map.items():
+            if pos in pos_avg.columns:
+                table[rows, number] = pos_avg[pos].to_numpy(dtype='float64')
+    
+    pos_num = pd.to_numeric(df['Position_Number'], errors='coerce').to_numpy(dtype='float64')
+    year = pd.to_numeric(df['year'], errors='coerce').to_numpy(dtype='float64')
+    valid = ~np.isnan(pos_num) & ~np.isnan(year)
+    
+    whole = np.trunc(np.where(valid, pos_num, 0))
+    fraction = pos_num - whole
+    lower = np.where((whole >= 1) & (whole <= 5), whole, 0).astype(int)
+    upper = np.minimum(whole + 1, 5)
+    upper = np.where(upper >= 1, upper, 0).astype(int)
+    year_rows = years.get_indexer(np.where(valid, year, np.nan))
+    
+    cols = {}
+    for col, table in zip(value_cols, tables):
+        interpolated = table[year_rows, lower] * (1 - fraction) + table[year_rows, upper] * fraction
+        cols[f'pos_{col}'] = df[col] - np.where(valid, interpolated, np.nan)
+    
+    return attach_columns(df, cols)
+
+
+
+def year_group_avg(df, value_col, group_col, weight_col='Minutes'):
+    """
+    Weighted mean of value_col within each (year, group_col) pair.
     
-    return df
+    Returns:
+        DataFrame indexed by year with one column per group
+    """
+    keys = pd.MultiIndex.from_arrays([df['year'], df[group_col]])
+    means = pd.DataFrame({
+        'year': df['year'],
+        'group': df[group_col],
+        'mean': grouped_weighted_mean(df[value_col], df[weight_col], by=keys),
+    })
+    means = means.drop_duplicates(['year', 'group'])
+    return means.pivot(index='year', columns='group', values='mean')
 
+
+def legacy_chain(df, weighted_avg_func=year_group_avg):
+    """
+    Run every normalization stage in order on a frame that already has the
+    extra_fields columns, such as the master.
+    
+    Inputs in OPTIONAL_INPUTS the frame lacks are added as NaN first.
+    
+    Args:
+        df: Input DataFrame
+        weighted_avg_func: Function to calculate weighted averages by group,
+            passed on to positional_added_values
+        
+    Returns:
+        DataFrame with every legacy field added
+    """
+    df = attach_columns(df, {col: np.nan for col in OPTIONAL_INPUTS if col not in df.columns})
+    for stage in [new_modify_df, normalize_fields, basic_stats, adj_hustle, calculate_offensive_metrics,
+                  add_new_fields, create_dfg_breakdown_columns, calculate_weighted_ts_averages]:
+        df = stage(df)
+    return positional_added_values(df, weighted_avg_func)
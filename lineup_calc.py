@@ -1,168 +1,309 @@
+import argparse
 import pandas as pd
 import numpy as np
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
 from tqdm import tqdm
 
+import perf_profile
+from aggregations import grouped_weighted_mean
+from identity_store import season_code
+from perf_trace import traced
+
+ON_OFF_PATH = 'data/on_off_master.csv'
+ON_OFF_WIDE_PATH = 'data/on_off_wide.csv'
+# Keys of the wide table: one row per player, team and season
+WIDE_KEYS = ['player_id', 'team_id', 'season_code']
+ID_COLUMNS = ['player_id', 'team_id', 'year_season', 'status', 'is_playoffs']
+
+LOCATIONS = ['AtRim', 'ShortMidRange', 'LongMidRange', 'Corner3', 'Arc3']
+
+def percentage_metrics(totals):
+    """
+    Shooting, location and rating metrics from summed lineup counts.
+
+    Args:
+        totals: Column -> values mapping, either a DataFrame or a dict of
+            NumPy arrays/scalars; missing count columns count as 0
+
+    Returns:
+        {metric: values} in output column order
+    """
+    # Safe retrieval of core columns
+    fga = totals.get('FG2A', 0) + totals.get('FG3A', 0)
+    fgm = totals.get('FG2M', 0) + totals.get('FG3M', 0)
+    metrics = {'FGA': fga, 'FGM': fgm}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Shooting Percentages
+        if 'FG3A' in totals:
+            fg3_pct = totals['FG3M'] / totals['FG3A']
+            metrics['Fg3Pct'] = np.where(np.isnan(fg3_pct), 0.0, fg3_pct)
+        if 'FG2A' in totals:
+            fg2_pct = totals['FG2M'] / totals['FG2A']
+            metrics['Fg2Pct'] = np.where(np.isnan(fg2_pct), 0.0, fg2_pct)
+
+        # True Shooting with "w" factor
+        points = totals.get('Points', 0)
+        fta = totals.get('FTA', 0)
+        and1_2pt = totals.get('2pt And 1 Free Throw Trips', 0)
+        and1_3pt = totals.get('3pt And 1 Free Throw Trips', 0)
+
+        w = np.where(fta > 0, (and1_2pt + 1.5 * and1_3pt + 0.44 * (fta - and1_2pt - and1_3pt)) / fta, 0.44)
+        ts_denominator = 2 * (fga + w * fta)
+        metrics['TsPct'] = np.where(ts_denominator > 0, points / ts_denominator, 0)
+
+        # Advanced Ratings
+        off_poss = totals.get('OffPoss', 0)
+        def_poss = totals.get('DefPoss', 0)
+        metrics['ORtg'] = np.where(off_poss > 0, (points / off_poss * 100), 0)
+        metrics['DRtg'] = np.where(def_poss > 0, (totals.get('opp_Points', 0) / def_poss * 100), 0)
+        metrics['NetRtg'] = metrics['ORtg'] - metrics['DRtg']
+
+        # Location frequencies and accuracies
+        for loc in LOCATIONS:
+            fga_col, fgm_col = f"{loc}FGA", f"{loc}FGM"
+            if fga_col in totals and fgm_col in totals:
+                metrics[f"{loc}Frequency"] = np.where(fga > 0, totals[fga_col] / fga, 0)
+                metrics[f"{loc}Accuracy"] = np.where(totals[fga_col] > 0, totals[fgm_col] / totals[fga_col], 0)
+            else:
+                metrics[f"{loc}Frequency"] = 0
+                metrics[f"{loc}Accuracy"] = 0
+    return metrics
+
 def calculate_basketball_percentages(df):
     """
     Calculates percentage-based metrics safely and filters 
     to keep only IDs and newly generated metrics.
     """
     result = df.copy()
-    
-    # Safe retrieval of core columns
-    fga = result.get('FG2A', 0) + result.get('FG3A', 0)
-    fgm = result.get('FG2M', 0) + result.get('FG3M', 0)
-    result['FGA'] = fga
-    result['FGM'] = fgm
-    
-    # Shooting Percentages
-    if 'FG3A' in result.columns:
-        result['Fg3Pct'] = (result['FG3M'] / result['FG3A']).fillna(0)
-    if 'FG2A' in result.columns:
-        result['Fg2Pct'] = (result['FG2M'] / result['FG2A']).fillna(0)
-    
-    # True Shooting with "w" factor
-    points = result.get('Points', 0)
-    fta = result.get('FTA', 0)
-    and1_2pt = result.get('2pt And 1 Free Throw Trips', 0)
-    and1_3pt = result.get('3pt And 1 Free Throw Trips', 0)
-    
-    w = np.where(fta > 0, (and1_2pt + 1.5 * and1_3pt + 0.44 * (fta - and1_2pt - and1_3pt)) / fta, 0.44)
-    ts_denominator = 2 * (fga + w * fta)
-    result['TsPct'] = np.where(ts_denominator > 0, points / ts_denominator, 0)
-    
-    # Location frequencies and accuracies
-    locs = ['AtRim', 'ShortMidRange', 'LongMidRange', 'Corner3', 'Arc3']
-    for loc in locs:
-        fga_col, fgm_col = f"{loc}FGA", f"{loc}FGM"
-        if fga_col in result.columns and fgm_col in result.columns:
-            result[f"{loc}Frequency"] = np.where(fga > 0, result[fga_col] / fga, 0)
-            result[f"{loc}Accuracy"] = np.where(result[fga_col] > 0, result[fgm_col] / result[fga_col], 0)
-        else:
-            result[f"{loc}Frequency"] = 0
-            result[f"{loc}Accuracy"] = 0
-            
-    # Advanced Ratings
-    off_poss = result.get('OffPoss', 0)
-    def_poss = result.get('DefPoss', 0)
-    result['ORtg'] = np.where(off_poss > 0, (result.get('Points', 0) / off_poss * 100), 0)
-    result['DRtg'] = np.where(def_poss > 0, (result.get('opp_Points', 0) / def_poss * 100), 0)
-    result['NetRtg'] = result['ORtg'] - result['DRtg']
+    for col, values in percentage_metrics(df).items():
+        result[col] = values
     
     # --- Column Filtering ---
     # We only want ID info and the newly created calculated fields
-    id_info = ['player_id', 'team_id', 'year_season', 'status', 'is_playoffs']
     metrics = ['FGA', 'FGM', 'Fg3Pct', 'Fg2Pct', 'TsPct', 'ORtg', 'DRtg', 'NetRtg']
     loc_stats = []
-    for loc in locs:
+    for loc in LOCATIONS:
         loc_stats.extend([f"{loc}Frequency", f"{loc}Accuracy"])
     
     # Add weighted average columns to the allowed list (calculated later in pipeline)
     weighted_metrics = ['OffFGReboundPct', 'DefFGReboundPct', 'OffTwoPtReboundPct', 'DefTwoPtReboundPct']
     
-    keep_list = id_info + metrics + loc_stats + weighted_metrics
+    keep_list = ID_COLUMNS + metrics + loc_stats + weighted_metrics
     final_cols = [c for c in keep_list if c in result.columns]
     
     return result[final_cols]
 
-def calculate_weighted_average(df, value_col, weight_col):
-    """Safely calculates weighted average to avoid RuntimeWarnings."""
-    if weight_col not in df.columns or value_col not in df.columns:
-        return 0
-    weight_sum = df[weight_col].sum()
-    if weight_sum == 0:
-        return 0 
-    df_clean = df.dropna(subset=[value_col, weight_col])
-    return (df_clean[value_col] * df_clean[weight_col]).sum() / weight_sum
-
-def run_on_off_pipeline():
+def subset_weighted_averages(values, weights, subsets):
+    """
+    Weighted average of `values` over each row of the boolean (rows x lineups)
+    `subsets` matrix, with NaN weights counting as zero and 0 when the weights
+    sum to zero. Every subset is one group of a single grouped reduction, its
+    lineups kept in file order so each sum matches the per-subset result.
+    """
+    segment, lineup = np.nonzero(subsets)
+    values = np.asarray(values, dtype='float64')[lineup]
+    weights = np.asarray(weights, dtype='float64')[lineup]
+    means = grouped_weighted_mean(values, weights, by=segment, positive_weights=False,
+                                  full_denominator=True, fill_value=0)
+    return means[np.searchsorted(segment, np.arange(len(subsets)))]
+
+@traced()
+def load_lineups(year_season, team_id, columns=None):
+    """
+    A team-season's lineup rows with opponent columns (opp_ prefix) and the
+    rebound-rate weights attached, or None when the lineup file is missing.
+    `columns` limits both files to those columns (EntityId is always read).
+    """
+    is_ps = str(year_season).endswith('ps')
+    suffix = "_ps" if is_ps else ""
+    year_folder = re.sub(r'ps$', '', str(year_season))
+    
+    team_path = f"lineup_data/{year_folder}/{int(team_id)}{suffix}.csv"
+    opp_path = f"lineup_data/{year_folder}/{int(team_id)}_vs{suffix}.csv"
+    
+    if not os.path.exists(team_path):
+        return None
+        
+    usecols = None if columns is None else (lambda c: c == 'EntityId' or c in columns)
+    df_team = pd.read_csv(team_path, usecols=usecols)
+    
+    # Merge opponent data to calculate Defensive Ratings
+    if os.path.exists(opp_path):
+        df_opp = pd.read_csv(opp_path, usecols=usecols).rename(columns=lambda x: f"opp_{x}" if x != 'EntityId' else x)
+        df_merged = df_team.merge(df_opp, on='EntityId', how='left')
+    else:
+        df_merged = df_team.copy()
+        for col in df_team.columns:
+            if col != 'EntityId': df_merged[f"opp_{col}"] = 0
+
+    # Pre-calculate weights for rebound rates
+    df_merged['two_point_misses'] = df_merged.get('FG2A', 0) - df_merged.get('FG2M', 0)
+    df_merged['opp_two_point_misses'] = df_merged.get('opp_FG2A', 0) - df_merged.get('opp_FG2M', 0)
+    df_merged['fg_misses'] = (df_merged.get('FG2A', 0) + df_merged.get('FG3A', 0)) - \
+                             (df_merged.get('FG2M', 0) + df_merged.get('FG3M', 0))
+    df_merged['opp_fg_misses'] = (df_merged.get('opp_FG2A', 0) + df_merged.get('opp_FG3A', 0)) - \
+                                 (df_merged.get('opp_FG2M', 0) + df_merged.get('opp_FG3M', 0))
+    return df_merged
+
+def membership_matrix(lineup_ids, player_ids):
+    """
+    Sparse (players x lineups) 0/1 matrix: entry (i, j) is 1 when player_ids[i]
+    is one of the '-'-separated EntityIds of lineup_ids[j].
+    """
+    rows_by_id = {}
+    for i, pid in enumerate(player_ids):
+        rows_by_id.setdefault(pid, []).append(i)
+    rows, cols = [], []
+    for j, lineup in enumerate(lineup_ids):
+        for token in set(lineup.split('-')):
+            for i in rows_by_id.get(token, ()):
+                rows.append(i)
+                cols.append(j)
+    return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(player_ids), len(lineup_ids)))
+
+def on_off_totals(df, membership):
+    """
+    Numeric column totals over each player's ON and OFF lineups.
+
+    ON is one sparse product membership @ X; OFF is the team total minus ON.
+    Count columns (the only ones the percentages read) are integers, so they
+    match df[mask].sum() exactly; summed rate columns may differ in the last bit.
+
+    Returns:
+        (columns, on_totals, off_totals, on_counts) with one row per player
+    """
+    numeric = df.select_dtypes(include=['number', 'bool'])
+    X = numeric.to_numpy(dtype='float64', na_value=0.0)
+    on_totals = membership @ X
+    off_totals = X.sum(axis=0) - on_totals
+    on_counts = np.diff(membership.indptr)
+    return numeric.columns, on_totals, off_totals, on_counts
+
+WEIGHT_MAPPING = {
+    'OffFGReboundPct': 'fg_misses',
+    'DefFGReboundPct': 'opp_fg_misses',
+    'OffTwoPtReboundPct': 'two_point_misses',
+    'DefTwoPtReboundPct': 'opp_two_point_misses'
+}
+
+@traced()
+def process_team_season(args):
+    """
+    On/off rows for one team-season, loaded and computed inside the calling
+    process (a pool worker in parallel runs).
+
+    Args:
+        args: (year_season, team_id, players) with the team's player_id/EntityId rows
+
+    Returns:
+        ({column: array} long rows, {column: array} wide rows) for the
+        team-season, or None without lineup data
+    """
+    year_season, team_id, group_players = args
+    is_ps = str(year_season).endswith('ps')
+    df_merged = load_lineups(year_season, team_id)
+    if df_merged is None:
+        return None
+
+    membership = membership_matrix(df_merged['EntityId'].astype(str).tolist(),
+                                   group_players['EntityId'].astype(str).tolist())
+    columns, on_totals, off_totals, on_counts = on_off_totals(df_merged, membership)
+
+    # One totals row per player and status with at least one lineup, ON before OFF
+    n_players = len(group_players)
+    totals = np.empty((2 * n_players, len(columns)))
+    totals[0::2], totals[1::2] = on_totals, off_totals
+    present = np.column_stack([on_counts, len(df_merged) - on_counts]).ravel() > 0
+    if not present.any():
+        return None
+
+    calc_df = pd.DataFrame(totals[present], columns=columns)
+    calc_df['player_id'] = np.repeat(group_players['player_id'].to_numpy(), 2)[present]
+    calc_df['team_id'] = team_id
+    calc_df['year_season'] = year_season
+    calc_df['status'] = np.tile(['ON', 'OFF'], n_players)[present]
+    calc_df['is_playoffs'] = is_ps
+
+    # Perform percentage calculations and column filtering for every row at once
+    rows = calculate_basketball_percentages(calc_df)
+    result = {col: rows[col].to_numpy() for col in rows.columns}
+
+    # Re-insert weighted averages, each over the lineups behind its row
+    on_mask = membership.toarray() > 0
+    row_lineups = np.stack([on_mask, ~on_mask], axis=1).reshape(2 * n_players, -1)[present]
+    for val_col, weight_col in WEIGHT_MAPPING.items():
+        if val_col in df_merged.columns:
+            result[val_col] = subset_weighted_averages(df_merged[val_col], df_merged[weight_col], row_lineups)
+
+    # The same rows pivoted to one per player: {metric}_ON / {metric}_OFF, NaN without lineups
+    listed = present.reshape(n_players, 2).any(axis=1)
+    wide = {
+        'player_id': group_players['player_id'].to_numpy()[listed],
+        'team_id': np.full(listed.sum(), team_id),
+        'season_code': np.full(listed.sum(), season_code(int(str(year_season)[:4]), is_ps)),
+        'year_season': np.full(listed.sum(), year_season, dtype=object),
+    }
+    for col, values in result.items():
+        if col in ID_COLUMNS:
+            continue
+        full = np.full(2 * n_players, np.nan)
+        full[present] = values
+        wide[f"{col}_ON"], wide[f"{col}_OFF"] = full[0::2][listed], full[1::2][listed]
+    return result, wide
+
+@traced()
+def run_on_off_pipeline(workers=1):
+    """
+    Write data/on_off_master.csv with every player's ON and OFF metrics.
+
+    Args:
+        workers: Number of processes; team-seasons are independent, so they
+            fan out over a process pool. Rows keep index order either way.
+    """
     # 1. Load the player index
     if not os.path.exists('player_index_map.csv'):
         print("Error: player_index_map.csv not found.")
         return
     index = pd.read_csv('player_index_map.csv')
-    all_results = []
     
-    # 2. Group by Team-Year
-    groups = list(index.groupby(['year_season', 'team_id']))
+    # 2. Group by Team-Year; each task carries only that team's players
+    tasks = [(year_season, team_id, group_players[['player_id', 'EntityId']])
+             for (year_season, team_id), group_players in index.groupby(['year_season', 'team_id'])]
     
     # Progress Bar initialization
-    for (year_season, team_id), group_players in tqdm(groups, desc="WNBA On/Off Analysis", unit="team"):
-        is_ps = str(year_season).endswith('ps')
-        suffix = "_ps" if is_ps else ""
-        year_folder = re.sub(r'ps$', '', str(year_season))
-        
-        team_path = f"lineup_data/{year_folder}/{int(team_id)}{suffix}.csv"
-        opp_path = f"lineup_data/{year_folder}/{int(team_id)}_vs{suffix}.csv"
-        
-        if not os.path.exists(team_path):
-            continue
-            
-        df_team = pd.read_csv(team_path)
-        
-        # Merge opponent data to calculate Defensive Ratings
-        if os.path.exists(opp_path):
-            df_opp = pd.read_csv(opp_path).rename(columns=lambda x: f"opp_{x}" if x != 'EntityId' else x)
-            df_merged = df_team.merge(df_opp, on='EntityId', how='left')
-        else:
-            df_merged = df_team.copy()
-            for col in df_team.columns:
-                if col != 'EntityId': df_merged[f"opp_{col}"] = 0
-
-        # Pre-calculate weights for rebound rates
-        df_merged['two_point_misses'] = df_merged.get('FG2A', 0) - df_merged.get('FG2M', 0)
-        df_merged['opp_two_point_misses'] = df_merged.get('opp_FG2A', 0) - df_merged.get('opp_FG2M', 0)
-        df_merged['fg_misses'] = (df_merged.get('FG2A', 0) + df_merged.get('FG3A', 0)) - \
-                                 (df_merged.get('FG2M', 0) + df_merged.get('FG3M', 0))
-        df_merged['opp_fg_misses'] = (df_merged.get('opp_FG2A', 0) + df_merged.get('opp_FG3A', 0)) - \
-                                     (df_merged.get('opp_FG2M', 0) + df_merged.get('opp_FG3M', 0))
-
-        weight_mapping = {
-            'OffFGReboundPct': 'fg_misses',
-            'DefFGReboundPct': 'opp_fg_misses',
-            'OffTwoPtReboundPct': 'two_point_misses',
-            'DefTwoPtReboundPct': 'opp_two_point_misses'
-        }
-
-        for _, player in group_players.iterrows():
-            eid = str(player['EntityId'])
-            on_mask = df_merged['EntityId'].astype(str).apply(lambda x: eid in x.split('-'))
-            
-            for status in ['ON', 'OFF']:
-                mask = on_mask if status == 'ON' else ~on_mask
-                df_subset = df_merged[mask]
-                if df_subset.empty: continue
-                
-                # Aggregate totals for the subset
-                totals = df_subset.sum(numeric_only=True)
-                
-                # Create a temporary DataFrame for calculation
-                calc_df = pd.DataFrame([totals])
-                calc_df['player_id'] = player['player_id']
-                calc_df['team_id'] = team_id
-                calc_df['year_season'] = year_season
-                calc_df['status'] = status
-                calc_df['is_playoffs'] = is_ps
-                
-                # Perform percentage calculations and column filtering
-                filtered_row = calculate_basketball_percentages(calc_df).iloc[0].to_dict()
-                
-                # Re-insert weighted averages into the filtered dictionary
-                for val_col, weight_col in weight_mapping.items():
-                    if val_col in df_subset.columns:
-                        filtered_row[val_col] = calculate_weighted_average(df_subset, val_col, weight_col)
-                
-                all_results.append(filtered_row)
+    progress = dict(total=len(tasks), desc="WNBA On/Off Analysis", unit="team")
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(tqdm(pool.map(process_team_season, tasks, chunksize=4), **progress))
+    else:
+        results = [process_team_season(task) for task in tqdm(tasks, **progress)]
+    results = [result for result in results if result is not None]
                 
-    # 3. Save only the relevant ID and new Metric info
-    if all_results:
-        final_df = pd.DataFrame(all_results)
-        final_df.to_csv('data/on_off_master.csv', index=False)
-        print("\nComplete: on_off_master.csv generated with IDs and Metrics.")
+    # 3. Save only the relevant ID and new Metric info, long and keyed wide
+    if results:
+        final_df = pd.concat([pd.DataFrame(long) for long, _ in results], ignore_index=True)
+        final_df.to_csv(ON_OFF_PATH, index=False)
+        # A player listed twice for a team-season has identical rows; keep one per key
+        wide_df = pd.concat([pd.DataFrame(wide) for _, wide in results], ignore_index=True)
+        wide_df = wide_df.drop_duplicates(WIDE_KEYS)
+        wide_df.to_csv(ON_OFF_WIDE_PATH, index=False)
+        print("\nComplete: on_off_master.csv and on_off_wide.csv generated with IDs and Metrics.")
     else:
         print("\nNo data was processed.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute every player's on/off splits from lineup_data/.")
+    parser.add_argument('--workers', type=int, default=1, help="process team-seasons in parallel on this many processes")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
+    run_on_off_pipeline(workers=args.workers)
+
+
 if __name__ == "__main__":
-    import re
-    run_on_off_pipeline()
+    main()
@@ -0,0 +1,183 @@
+"""
+Duo and trio tables: every two- and three-player combination that shared the
+floor, per team-season, built from all of lineup_data/.
+
+Each five-player lineup becomes a row of an integer player matrix. Its
+C(5,2) = 10 pairs and C(5,3) = 10 triples are column picks of that matrix,
+packed with the team-season into one integer key per combination (unique
+rows instead where the key would overflow int64), and every
+combination's column sums come from a single sparse (combinations x lineups)
+product. Lineup stats are counts, so those sums are exact.
+"""
+import argparse
+import glob
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import perf_profile
+from lineup_calc import LOCATIONS, load_lineups, percentage_metrics
+from perf_trace import traced
+
+LINEUP_SIZE = 5
+COMBO_TABLES = {2: 'data/duos.csv', 3: 'data/trios.csv'}
+# Totals reported for every combination; opp_Points comes from the _vs file
+TOTAL_COLUMNS = ['Minutes', 'OffPoss', 'DefPoss', 'Points', 'opp_Points']
+# Counts percentage_metrics reads
+COUNT_COLUMNS = ['FG2A', 'FG2M', 'FG3A', 'FG3M', 'FTA', '2pt And 1 Free Throw Trips',
+                 '3pt And 1 Free Throw Trips'] + [f"{loc}{stat}" for loc in LOCATIONS for stat in ['FGA', 'FGM']]
+# Largest packed combination key; past it combinations are grouped as unique rows
+MAX_KEY = np.iinfo(np.int64).max
+
+
+def team_seasons(lineup_folder='lineup_data'):
+    """(year_season, team_id) for every team lineup file, in season then team order."""
+    found = []
+    for path in glob.glob(os.path.join(lineup_folder, '*', '*.csv')):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if '_vs' in name:
+            continue
+        team_id, _, suffix = name.partition('_')
+        year = int(os.path.basename(os.path.dirname(path)))
+        found.append((year, suffix == 'ps', int(team_id)))
+    return [(f"{year}{'ps' if is_ps else ''}", team_id) for year, is_ps, team_id in sorted(found)]
+
+
+def load_archive(seasons):
+    """
+    Every five-player lineup of `seasons` stacked into arrays.
+
+    Returns:
+        (players, season_codes, totals): (lineups x 5) EntityIds sorted within
+        each row, the index into `seasons` per lineup, and the lineups'
+        TOTAL_COLUMNS + COUNT_COLUMNS values
+    """
+    columns = TOTAL_COLUMNS + COUNT_COLUMNS
+    players, season_codes, totals = [], [], []
+    for code, (year_season, team_id) in enumerate(seasons):
+        df = load_lineups(year_season, team_id, columns=set(columns))
+        if df is None:
+            continue
+        tokens = df['EntityId'].astype(str).str.split('-')
+        df = df[tokens.str.len() == LINEUP_SIZE]
+        players.append(np.sort(np.array(tokens[df.index].tolist(), dtype=np.int64).reshape(-1, LINEUP_SIZE), axis=1))
+        season_codes.append(np.full(len(df), code))
+        totals.append(df.reindex(columns=columns).to_numpy(dtype='float64', na_value=0.0))
+    if not players:
+        return np.empty((0, LINEUP_SIZE), dtype=np.int64), np.empty(0, dtype=int), np.empty((0, len(columns)))
+    return np.concatenate(players), np.concatenate(season_codes), np.concatenate(totals)
+
+
+@traced()
+def combination_table(players, season_codes, totals, size):
+    """
+    Column sums for every `size`-player combination within each team-season.
+
+    Returns:
+        (members, season_codes, lineup_counts, sums) with one row per
+        combination, ordered by team-season and then player ids
+    """
+    picks = np.array(list(itertools.combinations(range(LINEUP_SIZE), size)))
+    members = players[:, picks].reshape(-1, size)
+    lineup = np.repeat(np.arange(len(players)), len(picks))
+    # A few source lineups list a player twice; like on/off, a lineup is the set of its players
+    distinct = (members[:, 1:] != members[:, :-1]).all(axis=1)
+    members, lineup = members[distinct], lineup[distinct]
+
+    # One integer key per (team-season, players): mixed-radix over compact player codes,
+    # or the (team-season, players) rows themselves when the keys would overflow int64.
+    # Both sort by team-season and then player ids.
+    entity_ids = np.unique(players)
+    member_codes = np.searchsorted(entity_ids, members)
+    if (int(season_codes.max(initial=0)) + 1) * len(entity_ids) ** size <= MAX_KEY:
+        keys = season_codes[lineup].astype(np.int64)
+        for j in range(size):
+            keys = keys * len(entity_ids) + member_codes[:, j]
+        _, first, group = np.unique(keys, return_index=True, return_inverse=True)
+    else:
+        rows = np.column_stack([season_codes[lineup], member_codes])
+        _, first, group = np.unique(rows, axis=0, return_index=True, return_inverse=True)
+        group = group.ravel()
+
+    grouping = sparse.csr_matrix((np.ones(len(group)), (group, lineup)), shape=(len(first), len(players)))
+    grouping.data[:] = 1  # a repeated player yields the same combination twice in one lineup
+    return members[first], season_codes[lineup[first]], np.diff(grouping.indptr), grouping @ totals
+
+
+def combination_frame(seasons, members, codes, lineup_counts, sums, player_ids):
+    """
+    The duo/trio table with ids, totals and percentage_metrics columns.
+
+    Combinations with a player missing from player_ids are dropped, as
+    lineup_calc only reports players listed in the index.
+    """
+    size = members.shape[1]
+    labels = np.array([year_season for year_season, _ in seasons], dtype=object)
+    names = pd.Series(list(zip(np.repeat(labels[codes], size), members.ravel().astype(str))))
+    pids = names.map(player_ids).to_numpy(dtype=object).reshape(-1, size)
+    mapped = pd.notna(pids).all(axis=1)
+    members, codes, lineup_counts, sums, pids = (
+        members[mapped], codes[mapped], lineup_counts[mapped], sums[mapped], pids[mapped])
+
+    sums = dict(zip(TOTAL_COLUMNS + COUNT_COLUMNS, sums.T))
+    metrics = percentage_metrics(sums)
+    year_seasons = labels[codes]
+    frame = {
+        'year_season': year_seasons,
+        'team_id': np.array([team_id for _, team_id in seasons])[codes],
+        'is_playoffs': pd.Series(year_seasons).str.endswith('ps').to_numpy(),
+        'EntityId': ['-'.join(row) for row in members.astype(str)],
+        'player_id': ['-'.join(row) for row in pids],
+        'lineups': lineup_counts,
+    }
+    frame.update({col: sums[col] for col in TOTAL_COLUMNS})
+    frame.update({metric: np.broadcast_to(values, len(members)) for metric, values in metrics.items()})
+    return pd.DataFrame(frame)
+
+
+@traced()
+def build_combination_tables(sizes=(2, 3)):
+    """
+    Write the duo (data/duos.csv) and trio (data/trios.csv) tables.
+
+    Returns:
+        {size: number of combinations written}
+    """
+    if not os.path.exists('player_index_map.csv'):
+        print("Error: player_index_map.csv not found.")
+        return {}
+    index = pd.read_csv('player_index_map.csv')
+    index = index.drop_duplicates(['year_season', 'EntityId'])
+    player_ids = dict(zip(zip(index['year_season'].astype(str), index['EntityId'].astype(str)), index['player_id']))
+
+    seasons = team_seasons()
+    players, season_codes, totals = load_archive(seasons)
+    print(f"Loaded {len(players)} lineups from {len(seasons)} team-seasons.")
+
+    written = {}
+    for size in sizes:
+        table = combination_frame(seasons, *combination_table(players, season_codes, totals, size), player_ids)
+        table.to_csv(COMBO_TABLES[size], index=False)
+        written[size] = len(table)
+        print(f"Wrote {len(table)} {size}-player combinations to {COMBO_TABLES[size]}")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build duo and trio tables from lineup_data/.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2, 3], choices=sorted(COMBO_TABLES),
+                        help="combination sizes to build")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
+    start = time.perf_counter()
+    build_combination_tables(args.sizes)
+    print(f"Done in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,101 @@
 import pandas as pd
-import unicodedata
+import numpy as np
 import re
 import os
-from difflib import SequenceMatcher
-import pandas as pd
-import unicodedata
-import re
-import os
-from difflib import SequenceMatcher
+import argparse
+
+import perf_profile
+from fuzzy_match import match_candidates
+from identity_store import (file_hash, load_manifest, load_store, save_manifest, save_store, season_rank,
+                            update_store)
+from name_normalization import load_cache, normalize_names, save_cache
+from perf_trace import traced
 
-def normalize_name(name):
-    if not isinstance(name, str): return ""
-    name = name.lower()
-    name = unicodedata.normalize('NFKD', name).encode('ASCII', 'ignore').decode('ASCII')
-    name = re.sub(r'[^a-z0-9 ]', '', name)
-    return name.strip()
+INDEX_PATH = 'player_index_map.csv'
+TEAM_INDEX_PATH = 'wteam_index.csv'
+UNMAPPED_PATH = 'unmapped_players.csv'
+INDEX_COLUMNS = ['year_season', 'player_id', 'EntityId', 'ref_name', 'pbp_name', 'team', 'team_id', 'match_method',
+                 'confidence']
+STATS_MATCH_CONFIDENCE = 0.5
 
-# Global map to persist matches across years
+# Global map to persist matches across years: player_id -> EntityId as of the latest season matched so far
 global_id_map = {} 
 
+def window_join(left_keys, left_vals, right_keys, right_vals, tol):
+    """
+    All (left, right) position pairs with equal keys and |left_val - right_val| <= tol.
+
+    Right rows are sorted by (key, value) once, so each left row's candidates
+    are the contiguous window found by two binary searches.
+    """
+    left_keys, right_keys = np.asarray(left_keys), np.asarray(right_keys)
+    left_vals = np.asarray(left_vals, dtype=float)
+    right_vals = np.asarray(right_vals, dtype=float)
+    left_ok = np.flatnonzero((left_keys >= 0) & np.isfinite(left_vals))
+    right_ok = np.flatnonzero((right_keys >= 0) & np.isfinite(right_vals))
+    if not len(left_ok) or not len(right_ok):
+        return np.array([], dtype=int), np.array([], dtype=int)
+
+    order = right_ok[np.lexsort((right_vals[right_ok], right_keys[right_ok]))]
+    # Keys are spread far enough apart that no window crosses into another key
+    span = 2 * (max(np.abs(left_vals[left_ok]).max(), np.abs(right_vals[order]).max()) + tol) + 1
+    composite = right_keys[order] * span + right_vals[order]
+    query = left_keys[left_ok] * span + left_vals[left_ok]
+    reach = tol + 1e-6 * span
+    lo = np.searchsorted(composite, query - reach, side='left')
+    hi = np.searchsorted(composite, query + reach, side='right')
+
+    counts = hi - lo
+    left_idx = np.repeat(left_ok, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    right_idx = order[np.repeat(lo, counts) + offsets]
+    exact = ((left_keys[left_idx] == right_keys[right_idx]) &
+             (np.abs(left_vals[left_idx] - right_vals[right_idx]) <= tol))
+    return left_idx[exact], right_idx[exact]
+
+
+def stats_candidates(ref_rows, pbp_rows, minutes_tol=5, points_tol=2):
+    """
+    Map each ref row position to the pbp row positions with the same games
+    played, minutes within `minutes_tol` and points within `points_tol`.
+    Candidates are restricted to the ref row's team unless it is a 'TOT' row.
+    """
+    ref = pd.DataFrame(ref_rows, columns=['team', 'team_mapped', 'g', 'mp', 'pts'])
+    pbp = pd.DataFrame(pbp_rows, columns=['TeamAbbreviation', 'GamesPlayed', 'Minutes', 'Points'])
+    is_tot = (ref['team'] == 'TOT').to_numpy()
+    pairs = {}
+    for left_mask, left_key, right_key in [(~is_tot, ['team_mapped', 'g'], ['TeamAbbreviation', 'GamesPlayed']),
+                                           (is_tot, ['g'], ['GamesPlayed'])]:
+        left_pos = np.flatnonzero(left_mask)
+        if not len(left_pos):
+            continue
+        keys = pd.Series(list(ref.iloc[left_pos][left_key].itertuples(index=False, name=None)) +
+                         list(pbp[right_key].itertuples(index=False, name=None)), dtype=object)
+        codes = pd.factorize(keys)[0]
+        left_idx, right_idx = window_join(codes[:len(left_pos)], ref['mp'].to_numpy()[left_pos],
+                                          codes[len(left_pos):], pbp['Minutes'].to_numpy(), minutes_tol)
+        points_ok = np.abs(ref['pts'].to_numpy(dtype=float)[left_pos[left_idx]] -
+                           pbp['Points'].to_numpy(dtype=float)[right_idx]) <= points_tol
+        for i, j in zip(left_pos[left_idx[points_ok]].tolist(), right_idx[points_ok].tolist()):
+            pairs.setdefault(i, []).append(j)
+    return {i: sorted(js) for i, js in pairs.items()}
+
+
+@traced()
 def match_players(df_ref, df_pbp, year_label):
     team_mapping = {'SAS': 'SAN'}
     df_ref = df_ref.copy()
     df_ref['team_mapped'] = df_ref['team'].replace(team_mapping)
-    df_ref['norm_name'] = df_ref['player'].apply(normalize_name)
+    df_ref['norm_name'] = normalize_names(df_ref['player'])
     
     df_pbp = df_pbp.copy()
-    df_pbp['norm_name'] = df_pbp['Name'].apply(normalize_name)
+    df_pbp['norm_name'] = normalize_names(df_pbp['Name'])
     
     matches = []
     used_entity_ids = set()
+    matched_pids = set()
     
-    def add_match(ref_row, pbp_row, method):
+    def add_match(ref_row, pbp_row, method, confidence=1.0):
         eid, pid,tid = pbp_row['EntityId'], ref_row['player_id'],pbp_row['TeamId']
         matches.append({
             'year_season': year_label,
@@ -41,84 +105,234 @@ def match_players(df_ref, df_pbp, year_label):
             'pbp_name': pbp_row['Name'],
             'team': ref_row['team'],
             'team_id':tid,
-            'match_method': method
+            'match_method': method,
+            'confidence': confidence
         })
         used_entity_ids.add(eid)
+        matched_pids.add(pid)
         global_id_map[pid] = eid
 
+    # Precomputed lookup keys so the exact passes are dict hits, not frame scans
+    pbp_records = df_pbp.to_dict('records')
+    pbp_by_eid = {}
+    pbp_by_name = {}
+    pbp_by_name_team = {}
+    for rec in pbp_records:
+        pbp_by_eid.setdefault(rec['EntityId'], rec)
+        pbp_by_name.setdefault(rec['norm_name'], []).append(rec)
+        pbp_by_name_team.setdefault((rec['norm_name'], rec['TeamAbbreviation']), []).append(rec)
+    ref_records = df_ref.to_dict('records')
+
+    def remaining_records():
+        return [r for r in ref_records if r['player_id'] not in matched_pids]
+
     # Pass 0: Persistent ID Match
-    for _, row in df_ref.iterrows():
+    for row in ref_records:
         if row['player_id'] in global_id_map:
-            pbp_row = df_pbp[df_pbp['EntityId'] == global_id_map[row['player_id']]]
-            if not pbp_row.empty:
-                add_match(row, pbp_row.iloc[0], 'persistent_id')
+            pbp_row = pbp_by_eid.get(global_id_map[row['player_id']])
+            if pbp_row is not None:
+                add_match(row, pbp_row, 'persistent_id')
 
     # Pass 1: Exact Name + Team
-    remaining = df_ref[~df_ref['player_id'].isin([m['player_id'] for m in matches])]
-    for _, row in remaining.iterrows():
-        potential = df_pbp[(df_pbp['norm_name'] == row['norm_name']) & 
-                           ((df_pbp['TeamAbbreviation'] == row['team_mapped']) | (row['team'] == 'TOT'))]
+    for row in remaining_records():
+        if row['team'] == 'TOT':
+            potential = pbp_by_name.get(row['norm_name'], [])
+        else:
+            potential = pbp_by_name_team.get((row['norm_name'], row['team_mapped']), [])
         if len(potential) == 1:
-            add_match(row, potential.iloc[0], 'exact_team_name')
+            add_match(row, potential[0], 'exact_team_name')
 
     # Pass 2: Global Name Match
-    remaining = df_ref[~df_ref['player_id'].isin([m['player_id'] for m in matches])]
-    for _, row in remaining.iterrows():
-        potential = df_pbp[(df_pbp['norm_name'] == row['norm_name']) & (~df_pbp['EntityId'].isin(used_entity_ids))]
+    for row in remaining_records():
+        potential = [p for p in pbp_by_name.get(row['norm_name'], []) if p['EntityId'] not in used_entity_ids]
+        if len(potential) == 1:
+            add_match(row, potential[0], 'exact_name_global')
+
+    # Pass 3: Fuzzy / Substring, blocked by team and assigned best-first
+    remaining = remaining_records()
+    candidates = [p for p in pbp_records if p['EntityId'] not in used_entity_ids]
+    fuzzy_matches = match_candidates(
+        [r['norm_name'] for r in remaining],
+        [None if r['team'] == 'TOT' else r['team_mapped'] for r in remaining],
+        [p['norm_name'] for p in candidates],
+        [p['TeamAbbreviation'] for p in candidates],
+    )
+    chosen, taken_pids, taken_eids = {}, set(), set()
+    for i, j, method, score in fuzzy_matches:
+        pid, eid = remaining[i]['player_id'], candidates[j]['EntityId']
+        if pid in taken_pids or eid in taken_eids:
+            continue
+        chosen[i] = (j, method, score)
+        taken_pids.add(pid)
+        taken_eids.add(eid)
+    for i in sorted(chosen):
+        j, method, score = chosen[i]
+        add_match(remaining[i], candidates[j], method, score)
+
+    # Pass 4: Lenient Stats (Tolerance: 5 min, 2 pts), one windowed join per season
+    remaining = remaining_records()
+    candidates = [p for p in pbp_records if p['EntityId'] not in used_entity_ids]
+    stat_pairs = stats_candidates(remaining, candidates)
+    for i, row in enumerate(remaining):
+        potential = [candidates[j] for j in stat_pairs.get(i, []) if candidates[j]['EntityId'] not in used_entity_ids]
         if len(potential) == 1:
-            add_match(row, potential.iloc[0], 'exact_name_global')
-
-    # Pass 3: Fuzzy / Substring
-    remaining = df_ref[~df_ref['player_id'].isin([m['player_id'] for m in matches])]
-    for _, row in remaining.iterrows():
-        potential = df_pbp[~df_pbp['EntityId'].isin(used_entity_ids)]
-        if row['team'] != 'TOT':
-            potential = potential[potential['TeamAbbreviation'] == row['team_mapped']]
-        for _, p_row in potential.iterrows():
-            if (row['norm_name'] in p_row['norm_name'] or p_row['norm_name'] in row['norm_name']) and len(row['norm_name']) > 5:
-                add_match(row, p_row, 'substring')
-                break
-            elif SequenceMatcher(None, row['norm_name'], p_row['norm_name']).ratio() > 0.85:
-                add_match(row, p_row, 'fuzzy')
-                break
-
-    # Pass 4: Lenient Stats (Tolerance: 5 min, 2 pts)
-    remaining = df_ref[~df_ref['player_id'].isin([m['player_id'] for m in matches])]
-    for _, row in remaining.iterrows():
-        potential = df_pbp[~df_pbp['EntityId'].isin(used_entity_ids)]
-        if row['team'] != 'TOT':
-            potential = potential[potential['TeamAbbreviation'] == row['team_mapped']]
-        
-        stat_match = potential[
-            (potential['GamesPlayed'] == row['g']) & 
-            (abs(potential['Minutes'] - row['mp']) <= 5) & 
-            (abs(potential['Points'] - row['pts']) <= 2)
-        ]
-        if len(stat_match) == 1:
-            add_match(row, stat_match.iloc[0], 'stats_match_lenient')
-
-    unmapped = df_ref[~df_ref['player_id'].isin([m['player_id'] for m in matches])]
+            add_match(row, potential[0], 'stats_match_lenient', STATS_MATCH_CONFIDENCE)
+
+    unmapped = df_ref[~df_ref['player_id'].isin(matched_pids)]
     return pd.DataFrame(matches), unmapped
 
-# Execution Loop for 2009-2025
-all_matches = []
-all_unmapped = []
+def season_files(data_folder='data'):
+    """(year_season, bballref path, pbp path) for every season with both inputs, in season order."""
+    seasons = []
+    for f in os.listdir(data_folder):
+        match = re.match(r'(\d+)(ps)?_bballref\.csv$', f)
+        if not match:
+            continue
+        label = f"{match.group(1)}{match.group(2) or ''}"
+        f_pbp = os.path.join(data_folder, f"{label}_pbp.csv")
+        if os.path.exists(f_pbp):
+            seasons.append((label, os.path.join(data_folder, f), f_pbp))
+    return sorted(seasons, key=lambda s: season_rank(s[0]))
+
+
+def read_output(path):
+    """Read a previous output as strings so untouched rows are rewritten byte for byte."""
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def merge_seasons(previous, new_frames, changed, seasons):
+    """Replace the `changed` seasons in `previous` with `new_frames`, keeping only `seasons`, in season order."""
+    frames = []
+    if previous is not None:
+        kept = previous[previous['year_season'].isin(seasons) & ~previous['year_season'].isin(changed)]
+        if not kept.empty:
+            frames.append(kept)
+    frames.extend(new_frames)
+    frame = pd.concat(frames, ignore_index=True)
+    order = frame['year_season'].map(season_rank)
+    return frame.loc[order.sort_values(kind='stable').index]
+
+
+def unmapped_columns(seasons):
+    """Columns of the unmapped file in the order concatenating every season's unmapped rows gives them."""
+    columns = {}
+    for _, f_ref, _ in seasons:
+        ref_columns = list(pd.read_csv(f_ref, nrows=0).columns)
+        columns.update(dict.fromkeys(ref_columns + ['team_mapped', 'norm_name', 'year_season']))
+    return list(columns)
+
+
+def id_pairs(rows):
+    """(player_id, EntityId) of every row, as strings, in row order."""
+    return [] if rows.empty else list(zip(rows['player_id'], rows['EntityId'].astype(str)))
+
+
+def stored_matches(rows):
+    """Index rows read as strings back in the types match_players records them with."""
+    return [dict(rec, EntityId=int(rec['EntityId']), confidence=float(rec['confidence']))
+            for rec in rows.to_dict('records')]
+
+
+@traced()
+def build_index(data_folder='data', rebuild=False):
+    """
+    Match only the seasons whose inputs are new or changed since the last run.
+
+    Seasons are walked in season order with global_id_map holding what the
+    seasons before them matched, so each season sees the same persistent ids
+    it would in a rebuild. An unchanged season replays its previous index
+    rows into the map instead of being matched. A re-matched season whose
+    (player_id, EntityId) pairs come out different invalidates the seasons
+    after it, since their persistent id pass saw the old pairs; those are
+    re-matched too. When only seasons after every indexed one are new, the
+    persisted identity store seeds the map and the store instead; otherwise
+    the store is replayed from every season's rows. Either way the outputs
+    are identical to a --rebuild.
+
+    Args:
+        data_folder: Folder holding the {year}{ps}_bballref.csv / _pbp.csv inputs
+        rebuild: Ignore the manifest and previous outputs and re-match every season
+    """
+    manifest = {} if rebuild else load_manifest()
+    previous_index = None if rebuild else read_output(INDEX_PATH)
+    previous_unmapped = None if rebuild else read_output(UNMAPPED_PATH)
+    if previous_index is None or 'confidence' not in previous_index.columns:
+        # Indexes written before confidence was recorded cannot replay the store
+        manifest, previous_index, previous_unmapped = {}, None, None
+    previous_rows = {} if previous_index is None else dict(list(previous_index.groupby('year_season', sort=False)))
+
+    load_cache()
+    global_id_map.clear()
+    store = {}
+    all_matches = []
+    all_unmapped = []
+    changed = []
+    seasons = season_files(data_folder)
+    labels = [label for label, _, _ in seasons]
+    hashes = {label: file_hash(f_ref, f_pbp) for label, f_ref, f_pbp in seasons}
+    vanished = [label for label in manifest if label not in labels]
+    # The saved store is the store, and its links global_id_map, after every season
+    # of the last run. When those seasons are all unchanged and come before any new
+    # one, it stands in for replaying their rows.
+    known = [label for label in labels if label in manifest]
+    if (previous_index is not None and known and not vanished and known == labels[:len(known)]
+            and all(manifest[label] == hashes[label] for label in known)):
+        store = load_store()
+        if max((rec['last_season'] for rec in store.values()), key=season_rank, default=None) != known[-1]:
+            store = {}
+    seeded = set(known) if store else set()
+    for rec in store.values():
+        global_id_map[rec['player_id']] = rec['EntityId']
+    stale = False
+    for label, f_ref, f_pbp in seasons:
+        if label in seeded:
+            continue
+        input_hash = hashes[label]
+        # A season removed from before this one took its pairs out of the map
+        stale = stale or any(season_rank(v) < season_rank(label) for v in vanished)
+        old_rows = None if previous_index is None else previous_rows.get(label, previous_index.iloc[:0])
+        if not stale and old_rows is not None and manifest.get(label) == input_hash:
+            records = stored_matches(old_rows)
+            for rec in records:
+                global_id_map[rec['player_id']] = rec['EntityId']
+            update_store(store, records)
+            continue
+        m, u = match_players(pd.read_csv(f_ref), pd.read_csv(f_pbp), label)
+        update_store(store, m.to_dict('records'))
+        all_matches.append(m.reindex(columns=INDEX_COLUMNS))
+        all_unmapped.append(u.assign(year_season=label))
+        manifest[label] = input_hash
+        changed.append(label)
+        if old_rows is None or id_pairs(m) != id_pairs(old_rows):
+            stale = True
 
-for yr in range(2009, 2026):
-    for suffix in ['', 'ps']: # Regular and Postseason
-        f_ref, f_pbp = f"data/{yr}{suffix}_bballref.csv", f"data/{yr}{suffix}_pbp.csv"
-        if os.path.exists(f_ref) and os.path.exists(f_pbp):
-            m, u = match_players(pd.read_csv(f_ref), pd.read_csv(f_pbp), f"{yr}{suffix}")
-            all_matches.append(m)
-            all_unmapped.append(u.assign(year_season=f"{yr}{suffix}"))
+    save_cache()
+    if not changed and not vanished:
+        print("Player index is up to date.")
+        return
 
-# Save results
-pd.concat(all_matches).to_csv('player_index_map.csv', index=False)
+    print(f"Matched {len(changed)} season(s): {', '.join(changed)}")
+    for label in vanished:
+        del manifest[label]
+    index = merge_seasons(previous_index, all_matches, changed, labels)
+    index.to_csv(INDEX_PATH, index=False)
+    index[['team_id', 'team', 'year_season']].to_csv(TEAM_INDEX_PATH, index=False)
+    unmapped = merge_seasons(previous_unmapped, all_unmapped, changed, labels)
+    unmapped.reindex(columns=unmapped_columns(seasons)).to_csv(UNMAPPED_PATH, index=False)
+    save_store(store)
+    save_manifest(manifest)
 
 
-frame=pd.concat(all_matches)
-frame=frame[['team_id','team','year_season']]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the Basketball Reference <-> pbpstats player index.")
+    parser.add_argument('--rebuild', action='store_true', help="re-match every season from scratch")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
+    build_index(rebuild=args.rebuild)
 
-frame.to_csv('wteam_index.csv',index=False)
 
-pd.concat(all_unmapped).to_csv('unmapped_players.csv', index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,167 +1,303 @@
 import pandas as pd
 import numpy as np
+import argparse
+import hashlib
+import json
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 
-def process_wnba_pipeline(data_folder='data'):
-    # 1. Load the index map from the current directory
-    if not os.path.exists('player_index_map.csv'):
-        print("Error: player_index_map.csv not found in the current directory.")
-        return
-        
-    index_df = pd.read_csv('player_index_map.csv')
-    index_df['year_season'] = index_df['year_season'].astype(str)
-    
-    # 2. Identify files in the data subdirectory
-    if not os.path.isdir(data_folder):
-        print(f"Error: Subdirectory '{data_folder}' not found.")
-        return
-        
-    files = os.listdir(data_folder)
-    br_files = sorted([f for f in files if '_bballref.csv' in f])
-    
-    league_averages = []
-    # Position mapping for WNBA (normalizing strings to 1-5 scale)
-    pos_to_num = {'G': 1.0, 'G-F': 2.0, 'F-G': 2.0, 'F': 3.0, 'F-C': 4.0, 'C-F': 4.0, 'C': 5.0}
+import aggregations
+import metrics
+import perf_profile
+from identity_store import file_hash, season_rank
+from league_context import build_league_context
+from metrics import EXTRA_FIELDS, attach_columns, evaluate_metrics
+from perf_trace import traced
 
-    master_set=[]
-    
-    for br_file in br_files:
+MERGE_MANIFEST_PATH = 'merge_manifest.csv'
+MASTER_PATH = 'data/wnba_master.csv'
+
+# Position mapping for WNBA (normalizing strings to 1-5 scale)
+POS_TO_NUM = {'G': 1.0, 'G-F': 2.0, 'F-G': 2.0, 'F': 3.0, 'F-C': 4.0, 'C-F': 4.0, 'C': 5.0}
+
+
+def season_tasks(data_folder='data'):
+    """(year_str, is_ps) for every {year}{ps}_bballref.csv with a matching pbp file, in file order."""
+    tasks = []
+    for br_file in sorted(f for f in os.listdir(data_folder) if '_bballref.csv' in f):
         # Regex to handle years and playoffs (e.g., 2010_bballref.csv or 2009ps_bballref.csv)
         match = re.match(r'(\d+)(ps)?_bballref\.csv', br_file)
         if not match: continue
-        
         year_str = match.group(1)
-        is_ps = match.group(2) == 'ps'
-        suffix = 'ps' if is_ps else ''
-        pbp_file = f"{year_str}{suffix}_pbp.csv"
-        team_pbp_file = f"team_{year_str}{suffix}_pbp.csv"
-        
-        br_path = os.path.join(data_folder, br_file)
-        pbp_path = os.path.join(data_folder, pbp_file)
-        team_pbp_path = os.path.join(data_folder, team_pbp_file)
-        
-        if not os.path.exists(pbp_path):
+        suffix = match.group(2) or ''
+        if not os.path.exists(os.path.join(data_folder, f"{year_str}{suffix}_pbp.csv")):
             print(f"Skipping {year_str}{suffix}: Corresponding PBP file not found.")
             continue
-            
-        print(f"Processing {year_str} {'Playoffs' if is_ps else 'Regular Season'}...")
-        
-        # Load datasets
-        br_df = pd.read_csv(br_path)
-        pbp_df = pd.read_csv(pbp_path)
-        
-        # Load team data if available for league averages
-        team_df = None
-        league_ortg = None
-        league_drtg = None
-        if os.path.exists(team_pbp_path):
-            team_df = pd.read_csv(team_pbp_path)
-            # Calculate league average offensive and defensive ratings
-            total_points = team_df['Points'].sum()
-            total_off_poss = team_df['OffPoss'].sum()
-            total_opp_points = team_df['OpponentPoints'].sum()
-            total_def_poss = team_df['DefPoss'].sum()
-            
-            if total_off_poss > 0:
-                league_ortg = (total_points / total_off_poss) * 100
-            if total_def_poss > 0:
-                league_drtg = (total_opp_points / total_def_poss) * 100
-                
-            print(f"  League ortg: {league_ortg:.2f}, League drtg: {league_drtg:.2f}")
-        
-        # Determine mapping key from filename
-        map_key = f"{year_str}{suffix}"
-        year_index = index_df[index_df['year_season'] == map_key].copy()
-        
-        # Merge BBallRef with Index, then with PBP
-        merged_br = br_df.merge(year_index[['player_id', 'EntityId', 'pbp_name']], 
-                                on='player_id', how='left')
-        combined = merged_br.merge(pbp_df, on='EntityId', how='inner')
-        combined.drop_duplicates(subset='player_id',inplace=True)
-        # Calculate offensive rating, defensive rating, and net rating
-        combined['ortg'] = np.where(
-            combined['OffPoss'] > 0,
-            ((combined['OpponentPoints'] + combined['PlusMinus']) / combined['OffPoss']) * 100,
-            np.nan
-        )
-        
-        combined['drtg'] = np.where(
-            combined['DefPoss'] > 0,
-            (combined['OpponentPoints'] / combined['DefPoss']) * 100,
-            np.nan
-        )
-        
-        combined['NetRtg'] = combined['ortg'] - combined['drtg']
-        
-        # Calculate relative ratings if league averages are available
-        if league_ortg is not None:
-            combined['rortg'] = combined['ortg'] - league_ortg
-        else:
-            combined['rortg'] = np.nan
-            
-        if league_drtg is not None:
-            combined['rdrtg'] = combined['drtg'] - league_drtg
-        else:
-            combined['rdrtg'] = np.nan
-        
-        # Standardize columns for field_calculations.py
-        combined['year'] = int(year_str)
-        combined['nba_id'] = combined['EntityId']
-        if 'pos' in combined.columns:
-            combined['Pos'] = combined['pos']
-            combined['Position_Number'] = combined['pos'].map(pos_to_num).fillna(3.0) # Default to F
-            
-        # Save the combined file in the main directory
-        out_name = f"data/{year_str}{suffix}_combined.csv"
+        tasks.append((year_str, suffix == 'ps'))
+    return tasks
 
 
+def combined_path(year_season):
+    return f"data/{year_season}_combined.csv"
 
 
+def code_version():
+    """Hash of the modules that shape a combined file, so editing a formula invalidates every season."""
+    return file_hash(__file__, metrics.__file__, aggregations.__file__)
 
-        combined= basic_stats(combined)
-        combined=extra_fields(combined)
 
-        combined.to_csv(out_name, index=False)
-        combined['is_playoffs']=is_ps
-        master_set.append(combined)
-        print(f"  -> Saved {out_name}")
-        
-        # Calculate League Shooting Baseline (Regular Season only)
-        if not is_ps:
-            calc_df = pbp_df.fillna(0)
-            
-            # Components for TSA (as defined in your field_calculations module)
-            s_ft_poss = (calc_df['TwoPtShootingFoulsDrawn'] - calc_df['2pt And 1 Free Throw Trips']) + \
-                        (calc_df['ThreePtShootingFoulsDrawn'] - calc_df['3pt And 1 Free Throw Trips'])
-            ns_ft_poss = calc_df['NonShootingFoulsDrawn']
-            
-            # TSA = FGA (FG2A+FG3A) + FT Possession terms
-            tsa = (calc_df['FG2A'] + calc_df['FG3A']) + s_ft_poss + ns_ft_poss
-            
-            # Points adjusted for estimated technical FT value
-            pts_adj = calc_df['Points'] - (calc_df.get('Technical Free Throw Trips', 0) * 0.8)
-            
-            league_pts = pts_adj.sum()
-            league_tsa = tsa.sum()
-            
-            if league_tsa > 0:
-                league_ts_pct = league_pts / (2 * league_tsa)
-                # Format Season as (year-1)-year (e.g., 2009-10) so the script increments it back to 2010
-                season_str = f"{int(year_str)-1}-{year_str[-2:]}"
-                league_averages.append({'Season': season_str, 'TS%': league_ts_pct})
+def season_hash(year_str, is_ps, year_index, league_context, data_folder, version):
+    """
+    Hash of everything a season's combined file depends on: its bballref, pbp
+    and team pbp files, its player-index rows, the league baselines it reads
+    and the metric code version.
+    """
+    label = f"{year_str}{'ps' if is_ps else ''}"
+    paths = [os.path.join(data_folder, f"{prefix}{label}_{kind}.csv")
+             for prefix, kind in [('', 'bballref'), ('', 'pbp'), ('team_', 'pbp')]]
+    league = league_context.season(label)
+    baselines = [league['league_ortg'], league['league_drtg'], league['opp_ts_pct'],
+                 league_context.avg_ts_by_year().get(int(year_str), np.nan)]
+    digest = hashlib.sha256()
+    digest.update(file_hash(*[p for p in paths if os.path.exists(p)]).encode())
+    digest.update(year_index.to_csv(index=False).encode())
+    digest.update(repr([float(b) for b in baselines]).encode())
+    digest.update(version.encode())
+    return digest.hexdigest()
 
-    # Output the reference file for rTS calculation in the main directory
-    if league_averages:
-        pd.DataFrame(league_averages).to_csv('data/avg_shooting.csv', index=False)
-        print("\nGenerated avg_shooting.csv for the WNBA pipeline.")
-    return pd.concat(master_set)
 
+def read_combined(year_season, is_ps):
+    """A previous run's combined file, parsed back to the frame that was written."""
+    combined = pd.read_csv(combined_path(year_season), float_precision='round_trip')
+    combined['is_playoffs'] = is_ps
+    return combined
+
+
+def load_merge_manifest(path=MERGE_MANIFEST_PATH):
+    """Return {year_season: (input_hash, schema)}, schema being the combined file's [(column, dtype), ...]."""
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path, dtype=str)
+    if 'schema' not in df.columns:
+        return {}
+    return {r.year_season: (r.input_hash, json.loads(r.schema)) for r in df.itertuples()}
+
+
+def save_merge_manifest(manifest, path=MERGE_MANIFEST_PATH):
+    rows = [{'year_season': k, 'input_hash': manifest[k][0], 'schema': json.dumps(manifest[k][1])}
+            for k in sorted(manifest, key=season_rank)]
+    pd.DataFrame(rows, columns=['year_season', 'input_hash', 'schema']).to_csv(path, index=False)
+
+
+def frame_schema(df):
+    return [(col, str(dtype)) for col, dtype in df.dtypes.items()]
+
+
+def master_layout(schemas):
+    """
+    Columns and dtypes of the master, from each season's schema alone.
+
+    Columns come in first-seen order. Each distinct pattern of per-season
+    dtypes is resolved once by concatenating zero-row frames, which applies
+    exactly the reconciliation the full concat would: common dtypes, and
+    int/bool columns that some season lacks widened so they can hold NaN.
+    """
+    columns = list(dict.fromkeys(col for schema in schemas for col, _ in schema))
+    by_season = [dict(schema) for schema in schemas]
+    patterns = {col: tuple(s.get(col) for s in by_season) for col in columns}
+    resolved = {}
+    for pattern in set(patterns.values()):
+        empties = [pd.DataFrame({'c': np.empty(0, dtype=d)}) if d else pd.DataFrame({'_': np.empty(0)})
+                   for d in pattern]
+        resolved[pattern] = pd.concat(empties)['c'].dtype
+    return pd.Series({col: resolved[patterns[col]] for col in columns}, dtype=object)
+
+
+@traced()
+def write_master(path, seasons, layout):
+    """
+    Stream the master one season at a time, reconciling each to `layout`.
+
+    Args:
+        path: Output CSV
+        seasons: (year_season, is_playoffs) in master order
+        layout: Column -> dtype Series from master_layout
+
+    Returns:
+        Number of rows written
+    """
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        for i, (label, is_ps) in enumerate(seasons):
+            season = read_combined(label, is_ps)
+            # Missing columns become NaN, and columns widened across seasons are cast here
+            columns = {}
+            for col, dtype in layout.items():
+                if col in season.columns:
+                    values = season[col].to_numpy()
+                    columns[col] = values if values.dtype == dtype else values.astype(dtype)
+                else:
+                    columns[col] = np.full(len(season), np.nan, dtype=dtype)
+            pd.DataFrame(columns).to_csv(f, header=(i == 0), index=False)
+            rows += len(season)
+    return rows
+
+
+@traced()
+def process_season(year_str, is_ps, year_index, league_context, data_folder='data'):
+    """Merge, compute and write one season's combined file; returns the combined frame."""
+    suffix = 'ps' if is_ps else ''
+    br_path = os.path.join(data_folder, f"{year_str}{suffix}_bballref.csv")
+    pbp_path = os.path.join(data_folder, f"{year_str}{suffix}_pbp.csv")
+
+    print(f"Processing {year_str} {'Playoffs' if is_ps else 'Regular Season'}...")
+
+    # Load datasets
+    br_df = pd.read_csv(br_path)
+    pbp_df = pd.read_csv(pbp_path)
+
+    # League average offensive and defensive ratings from the precomputed context
+    league = league_context.season(f"{year_str}{suffix}")
+    league_ortg = None if pd.isna(league['league_ortg']) else league['league_ortg']
+    league_drtg = None if pd.isna(league['league_drtg']) else league['league_drtg']
+    if league_ortg is not None and league_drtg is not None:
+        print(f"  League ortg: {league_ortg:.2f}, League drtg: {league_drtg:.2f}")
+
+    # Merge BBallRef with Index, then with PBP
+    merged_br = br_df.merge(year_index[['player_id', 'EntityId', 'pbp_name']],
+                            on='player_id', how='left')
+    combined = merged_br.merge(pbp_df, on='EntityId', how='inner')
+    combined.drop_duplicates(subset='player_id',inplace=True)
+    # Calculate offensive rating, defensive rating, and net rating
+    combined['ortg'] = np.where(
+        combined['OffPoss'] > 0,
+        ((combined['OpponentPoints'] + combined['PlusMinus']) / combined['OffPoss']) * 100,
+        np.nan
+    )
+
+    combined['drtg'] = np.where(
+        combined['DefPoss'] > 0,
+        (combined['OpponentPoints'] / combined['DefPoss']) * 100,
+        np.nan
+    )
+
+    combined['NetRtg'] = combined['ortg'] - combined['drtg']
+
+    # Calculate relative ratings if league averages are available
+    if league_ortg is not None:
+        combined['rortg'] = combined['ortg'] - league_ortg
+    else:
+        combined['rortg'] = np.nan
+
+    if league_drtg is not None:
+        combined['rdrtg'] = combined['drtg'] - league_drtg
+    else:
+        combined['rdrtg'] = np.nan
+
+    # Standardize columns for field_calculations.py
+    combined['year'] = int(year_str)
+    combined['nba_id'] = combined['EntityId']
+    if 'pos' in combined.columns:
+        combined['Pos'] = combined['pos']
+        combined['Position_Number'] = combined['pos'].map(POS_TO_NUM).fillna(3.0) # Default to F
+
+    # Save the combined file in the main directory
+    out_name = combined_path(f"{year_str}{suffix}")
+
+    combined = basic_stats(combined)
+    combined = extra_fields(combined, ps=is_ps, league_context=league_context)
+
+    combined.to_csv(out_name, index=False)
+    combined['is_playoffs'] = is_ps
+    print(f"  -> Saved {out_name}")
+    return combined
 
 
+def build_season(args):
+    """Pool task: build one season and return only its schema, so no full frame travels back."""
+    return frame_schema(process_season(*args))
 
 
-def extra_fields(df, ps=False, avg_shooting_df=None, season_totals_df=None):
+@traced()
+def process_wnba_pipeline(data_folder='data', workers=1, rebuild_context=False, rebuild=False,
+                          master_path=MASTER_PATH):
+    """
+    Build every {year}{ps}_combined.csv and stream them into the master file.
+
+    Args:
+        data_folder: Folder holding the bballref/pbp/team files
+        workers: Number of processes; seasons are independent once the league
+            baselines are known, so they fan out over a process pool
+        rebuild_context: Recompute every season's league baselines instead of
+            reusing league_context.csv
+        rebuild: Rebuild every combined file, ignoring merge_manifest.csv
+        master_path: Where to write all seasons concatenated in file order
+
+    Returns:
+        Number of master rows written; the file is the same for any worker count
+    """
+    # 1. Load the index map from the current directory
+    if not os.path.exists('player_index_map.csv'):
+        print("Error: player_index_map.csv not found in the current directory.")
+        return
+
+    index_df = pd.read_csv('player_index_map.csv')
+    index_df['year_season'] = index_df['year_season'].astype(str)
+
+    # 2. Identify files in the data subdirectory
+    if not os.path.isdir(data_folder):
+        print(f"Error: Subdirectory '{data_folder}' not found.")
+        return
+
+    tasks = season_tasks(data_folder)
+    league_context = build_league_context(data_folder, [f"{y}{'ps' if ps else ''}" for y, ps in tasks],
+                                          rebuild=rebuild_context)
+
+    # 3. One task per season, carrying only that season's index rows
+    index_by_season = dict(tuple(index_df.groupby('year_season')))
+    empty_index = index_df.iloc[0:0]
+    manifest = {} if rebuild else load_merge_manifest()
+    version = code_version()
+    labels, hashes, season_args = [], {}, []
+    for year_str, is_ps in tasks:
+        label = f"{year_str}{'ps' if is_ps else ''}"
+        year_index = index_by_season.get(label, empty_index)
+        hashes[label] = season_hash(year_str, is_ps, year_index, league_context, data_folder, version)
+        labels.append((label, is_ps))
+        # Unchanged seasons keep their combined file and are only read back for the master
+        if manifest.get(label, (None,))[0] != hashes[label] or not os.path.exists(combined_path(label)):
+            season_args.append((year_str, is_ps, year_index, league_context, data_folder))
+
+    if workers > 1 and len(season_args) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            schemas = list(pool.map(build_season, season_args))
+    else:
+        schemas = [build_season(args) for args in season_args]
+    for args, schema in zip(season_args, schemas):
+        label = f"{args[0]}{'ps' if args[1] else ''}"
+        manifest[label] = (hashes[label], schema)
+    if season_args:
+        print(f"\nRebuilt {len(season_args)} of {len(labels)} season(s).")
+    else:
+        print("\nCombined season files are up to date.")
+    save_merge_manifest(manifest)
+
+    # 4. Stream the master in season order, holding one season at a time
+    layout = master_layout([manifest[label][1] for label, _ in labels])
+    rows = write_master(master_path, labels, layout)
+    print(f"Wrote {rows} rows to {master_path}")
+
+    # Output the reference file for rTS calculation in the main directory
+    avg_shooting_df = league_context.avg_shooting()
+    if len(avg_shooting_df):
+        avg_shooting_df.to_csv('data/avg_shooting.csv', index=False)
+        print("\nGenerated avg_shooting.csv for the WNBA pipeline.")
+    return rows
+
+
+@traced()
+def extra_fields(df, ps=False, avg_shooting_df=None, season_totals_df=None, outputs=None, league_context=None):
     """
     Add extra calculated fields to player statistics DataFrame.
     
@@ -170,170 +306,41 @@ def extra_fields(df, ps=False, avg_shooting_df=None, season_totals_df=None):
         ps: If True, process playoff data (uses different TS% baseline)
         avg_shooting_df: Pre-loaded avg_shooting.csv DataFrame
         season_totals_df: Pre-loaded season_totals.csv DataFrame
-        playoff_rts_df: Pre-loaded playoffRTS.csv DataFrame
-        late_df: Pre-loaded last_second.csv DataFrame
-        pay_table_df: Pre-loaded pay_table.csv DataFrame
+        outputs: Metric names to add (defaults to every field in metrics.EXTRA_FIELDS)
+        league_context: Precomputed LeagueContext; takes the place of avg_shooting_df
+            and gives the playoff rTSPct its opponent TS% baseline
         
     Returns:
         DataFrame with additional calculated fields
     """
     print(len(df))
-    df = df.copy()
+    outputs = EXTRA_FIELDS if outputs is None else outputs
     df = df.fillna(0)
     if '3pt And 1 Free Throw Trips' not in df.columns:
         df['3pt And 1 Free Throw Trips']=0
-
-    
-
-    
-    # Calculate basic metrics
-    df['TotalMisses'] = ((df['AtRimFGA'] - df['AtRimFGM']) + 
-                        (df['ShortMidRangeFGA'] - df['ShortMidRangeFGM']) + 
-                        (df['LongMidRangeFGA'] - df['LongMidRangeFGM']) + 
-                        (df['Corner3FGA'] + df['Arc3FGA'] - df['Corner3FGM'] - df['Arc3FGM']))
-    
-    df['TotalOffRebounds'] = ((df['AtRimFGA'] - df['AtRimFGM']) * df['AtRimOffReboundedPct'] + 
-                             (df['ShortMidRangeFGA'] - df['ShortMidRangeFGM']) * df['ShortMidRangeOffReboundedPct'] + 
-                             (df['LongMidRangeFGA'] - df['LongMidRangeFGM']) * df['LongMidRangeOffReboundedPct'] + 
-                             (df['Corner3FGA'] + df['Arc3FGA'] - df['Corner3FGM'] - df['Arc3FGM']) * df['ThreePtOffReboundedPct'])
-    
-    df['ProbabilityOffRebounded'] = df['TotalOffRebounds'] / df['TotalMisses']
-    df['Shooting_FT_Possessions'] = ((df['TwoPtShootingFoulsDrawn'] - df['2pt And 1 Free Throw Trips']) +
-                                     (df['ThreePtShootingFoulsDrawn'] - df['3pt And 1 Free Throw Trips']))
-    
-    df['FT_PERC'] = df['FtPoints'] / df['FTA']
-    df['2TSA'] = (df['FG2A'] + (df['TwoPtShootingFoulsDrawn'] - df['2pt And 1 Free Throw Trips']) + 
-                  df['NonShootingFoulsDrawn'])
-    df['2FTA'] = ((df['TwoPtShootingFoulsDrawn'] - df['2pt And 1 Free Throw Trips']) * 2 + 
-                  df['2pt And 1 Free Throw Trips'] + df['NonShootingFoulsDrawn'] * 2)
-    df['3TSA'] = df['FG3A'] + (df['ThreePtShootingFoulsDrawn'] - df['3pt And 1 Free Throw Trips'])
-    df['3FTA'] = (df['ThreePtShootingFoulsDrawn'] - df['3pt And 1 Free Throw Trips']) * 3 + df['3pt And 1 Free Throw Trips']
-    df['2FTPoints'] = df['2FTA'] * df['FT_PERC']
-    df['3FTPoints'] = df['3FTA'] * df['FT_PERC']
-    df['2_Points'] = df['2FTPoints'] + df['FG2M'] * 2
-    df['3_Points'] = df['3FTPoints'] + df['FG3M'] * 3
-    df['2TS_percent'] = df['2_Points'] / (2 * df['2TSA'])
-    df['3TS_percent'] = df['3_Points'] / (2 * df['3TSA'])
-    df['PPG'] = df['Points'] / df['GamesPlayed']
-    df['APG'] = df['Assists'] / df['GamesPlayed']
-    
-    # Teammate miss ORB%
-    df['totalORB'] = df['OffThreePtRebounds'] + df['OffTwoPtRebounds']
-    df['total_team_misses'] = df['totalORB'] / df['OffFGReboundPct']
-    df['FGA'] = df['FG2A'] + df['FG3A']
-    df['FGM'] = df['FG2M'] + df['FG3M']
-    df['SelfOReb/100'] = (df['SelfOReb'] / 100) * df['OffPoss']
-    
-    df['total_teammate_misses'] = df['total_team_misses'] - (df['FGA'] - df['FGM'])
-    df['teammatemissorb'] = df['totalORB'] - df['SelfOReb']
-    df['TeammateMissORebPerc'] = df['teammatemissorb'] / df['total_teammate_misses']
-    df['TeammateMissORebPerc'] = df['TeammateMissORebPerc'].replace([np.inf, -np.inf], np.nan).fillna(0)
-    df['NonShooting_FT_Possessions'] = df['NonShootingFoulsDrawn']
-    
-    df['FT_Possessions'] = df['Shooting_FT_Possessions'] + df['NonShooting_FT_Possessions']
-    df['FGA'] = df['FG2A'] + df['FG3A']
-    
-    df['2P_PERC'] = df['FG2M'] / df['FG2A']
-    df['3P_PERC'] = df['FG3M'] / df['FG3A']
-    df['3P_PERC'] = df['3P_PERC'].replace([np.inf, -np.inf], np.nan).fillna(0)
-    df['FT_PERC'] = df['FtPoints'] / df['FTA']
-    df['FTA_100'] = df['FTA'] / df['OffPoss'] * 100
-    df['2PA_100'] = df['FG2A'] / df['OffPoss'] * 100
-    df['3PA_100'] = df['FG3A'] / df['OffPoss'] * 100
-    df['TSA'] = df['FGA'] + df['FT_Possessions']
-    df['MPG'] = df['Minutes'] / df['GamesPlayed']
-    df['TS%'] = df['Points'] / (2 * df['TSA'])
-    df['TS_percent'] = (df['Points'] - (df['Technical Free Throw Trips'] * 0.8)) / (2 * df['TSA'])
-    df['diff_in_points'] = df['FTA'] * 0.85 - df['FTA'] * df['FT_PERC']
-    df['TS_eightyfive'] = ((df['Points'] + df['diff_in_points'] - (df['Technical Free Throw Trips'] * 0.8)) / 
-                           (2 * df['TSA']))
-    df['nontech_TS_percent'] = ((df['Points'] - (df['Technical Free Throw Trips'] * df['FT_PERC'])) / 
-                                (2 * (df['TSA'])))
-    
-    df['mod_points'] = df['Points'] - (df['Technical Free Throw Trips'] * 0.8)
-    df['mod_ts'] = df['mod_points'] / (2 * (df['TSA'] - df['SelfOReb']))
-    
-    # Optimized weighted average calculations using vectorized operations
-
-    def calculate_weighted_avg_by_year(df, value_col, weight_col):
-        """Calculate weighted average by year using vectorized operations."""
-        # Create mask for valid values
-        mask = (~np.isnan(df[value_col])) & (df[weight_col] > 0)
-        
-        # Group by year
-        grouped = df[mask].groupby('year')
-        
-        # FIX: Add include_groups=False to the apply call
-        weighted_sum = grouped.apply(
-            lambda x: (x[value_col] * x[weight_col]).sum(), 
-            include_groups=False
-        )
-        
-        weight_sum = grouped[weight_col].sum()
-        
-        # Calculate weighted average
-        weighted_avg = weighted_sum / weight_sum
-        
-        # Map back to original DataFrame
-        return df['year'].map(weighted_avg)
-    
-    # Calculate weighted averages
-    df['mod_ts_avg'] = calculate_weighted_avg_by_year(df, 'mod_ts', 'TSA')
-    df['2ts_avg'] = calculate_weighted_avg_by_year(df, '2TS_percent', '2TSA')
-    df['3ts_avg'] = calculate_weighted_avg_by_year(df, '3TS_percent', '3TSA')
-    
-    df['2rTS'] = df['2TS_percent'] - df['2ts_avg']
-    df['3rTS'] = df['3TS_percent'] - df['3ts_avg']
-    df['mod_rTS'] = (df['mod_ts'] - df['mod_ts_avg']) * 100
-    
-    # Load and merge avg shooting data
-    if avg_shooting_df is None:
-        avg = pd.read_csv('data/avg_shooting.csv')
-    else:
-        avg = avg_shooting_df.copy()
-    
-    avg['year'] = avg['Season'].str.split('-', expand=True)[0]
-    avg['year'] = avg['year'].astype(int) + 1
-    avg = avg[['year', 'TS%']]
-    
-
-
-    avg.columns = ['year', 'avg_ts']
-    print(avg)
-    df = df.merge(avg, on='year', how='left')
-    
-
-    
-    # Rename columns (replace % with _pct)
-
-   
-    df['TSA100'] = 100 * (df['TSA'] / df['OffPoss'])
-    
-    # Drop TS_pct if exists and recreate
-    if 'TS_pct' in df.columns:
+    # TS_pct is always recreated at the end of the frame
+    if 'TS_pct' in df.columns and 'TS_pct' in outputs:
         df.drop(columns=['TS_pct'], inplace=True)
-    df['TS_pct'] = (df['Points'] - (df['Technical Free Throw Trips'] * 0.8)) / (2 * df['TSA'])
-    
-    if not ps:
-        df['rTSPct'] = ((df['TS_pct'] - df['avg_ts']) * 100)
-    else:
-        df['rTSPct'] = ((df['TS_pct'] - (df['OPP_TS_PCT'] / 100)) * 100)
-    
-    df['Pts75'] = ((df['Points'] / df['OffPoss']) * 75).round(3)
-    df['final_bp_tov_100'] = ((df['BadPassTurnovers'] + df['BadPassOutOfBoundsTurnovers']) / 
-                             df['OffPoss']) * 100
-    df['scoring_tov_100'] = ((df['Turnovers'] - df['BadPassTurnovers'] - 
-                              df['BadPassOutOfBoundsTurnovers']) / df['OffPoss']) * 100
-    df['tov_100'] = df['Turnovers'] / df['OffPoss'] * 100
-    
-    df['nonPassTOVPct'] = ((df['Turnovers'] - df['BadPassTurnovers'] - 
-                           df['BadPassOutOfBoundsTurnovers']) / df['TSA']) * 100
-    df['ProbabilityOffRebounded'] = df['ProbabilityOffRebounded'] * 100
-    df['FG3A100'] = (df['FG3A'] / df['OffPoss']) * 100
-    df['firstchanceperc'] = df['FirstChancePoints'] / (df['FirstChancePoints'] + df['SecondChancePoints'])
 
+    context = {}
+    if 'avg_ts' in outputs or ('rTSPct' in outputs and not ps):
+        if league_context is not None:
+            avg_ts_by_year = league_context.avg_ts_by_year()
+        else:
+            # Load avg shooting data
+            avg = pd.read_csv('data/avg_shooting.csv') if avg_shooting_df is None else avg_shooting_df.copy()
+            avg['year'] = avg['Season'].str.split('-', expand=True)[0]
+            avg['year'] = avg['year'].astype(int) + 1
+            avg_ts_by_year = avg.set_index('year')['TS%']
+        print(avg_ts_by_year.rename_axis('year').rename('avg_ts').reset_index())
+        context['avg_ts_by_year'] = avg_ts_by_year
 
-    return df
+    frame = df
+    if ps and 'rTSPct' in outputs and 'OPP_TS_PCT' not in df.columns and league_context is not None:
+        # The playoff rTSPct baseline, read by the formula as OPP_TS_PCT but not written out
+        frame = df.assign(OPP_TS_PCT=df['year'].map(league_context.opp_ts_by_year()))
+    computed = evaluate_metrics(frame, outputs, playoffs=ps, context=context)
+    return attach_columns(df, computed)
 
 
 def basic_stats(df):
@@ -356,6 +363,17 @@ def basic_stats(df):
     
     return df
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge bballref and pbpstats seasons and compute derived metrics.")
+    parser.add_argument('--workers', type=int, default=1, help="process seasons in parallel on this many processes")
+    parser.add_argument('--rebuild-context', action='store_true', help="recompute every season's league baselines")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild every combined file, not just changed seasons")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
+    process_wnba_pipeline(workers=args.workers, rebuild_context=args.rebuild_context, rebuild=args.rebuild)
+
+
 if __name__ == "__main__":
-    masterframe=process_wnba_pipeline()
-    masterframe.to_csv('data/wnba_master.csv',index=False)
\ No newline at end of file
+    main()
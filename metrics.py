@@ -0,0 +1,336 @@
+"""
+Declarative registry of derived player metrics.
+
+Each metric declares the columns or metrics it reads and a NumPy formula over
+them. evaluate_metrics resolves the dependency graph for the requested
+outputs only, computing every shared intermediate once from the frame's
+column arrays without copying the frame. Names starting with '_' are
+intermediates that are never written out.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from aggregations import grouped_weighted_mean
+
+Metric = namedtuple('Metric', ['name', 'inputs', 'func', 'uses_context'])
+
+REGISTRY = {}
+PLAYOFF_REGISTRY = {}
+
+AND1_2 = '2pt And 1 Free Throw Trips'
+AND1_3 = '3pt And 1 Free Throw Trips'
+TECH = 'Technical Free Throw Trips'
+
+# Derived columns written by merge_data.extra_fields, in output order
+EXTRA_FIELDS = [
+    'TotalMisses', 'TotalOffRebounds', 'ProbabilityOffRebounded', 'Shooting_FT_Possessions',
+    'FT_PERC', '2TSA', '2FTA', '3TSA', '3FTA', '2FTPoints', '3FTPoints', '2_Points', '3_Points',
+    '2TS_percent', '3TS_percent', 'PPG', 'APG', 'totalORB', 'total_team_misses', 'FGA', 'FGM',
+    'SelfOReb/100', 'total_teammate_misses', 'teammatemissorb', 'TeammateMissORebPerc',
+    'NonShooting_FT_Possessions', 'FT_Possessions', '2P_PERC', '3P_PERC', 'FTA_100', '2PA_100',
+    '3PA_100', 'TSA', 'MPG', 'TS%', 'TS_percent', 'diff_in_points', 'TS_eightyfive',
+    'nontech_TS_percent', 'mod_points', 'mod_ts', 'mod_ts_avg', '2ts_avg', '3ts_avg', '2rTS',
+    '3rTS', 'mod_rTS', 'avg_ts', 'TSA100', 'TS_pct', 'rTSPct', 'Pts75', 'final_bp_tov_100',
+    'scoring_tov_100', 'tov_100', 'nonPassTOVPct', 'FG3A100', 'firstchanceperc',
+]
+
+
+def metric(name, inputs, playoffs=False, uses_context=False):
+    """Register `func(*input_arrays)` as the formula for `name`."""
+    def register(func):
+        registry = PLAYOFF_REGISTRY if playoffs else REGISTRY
+        registry[name] = Metric(name, tuple(inputs), func, uses_context)
+        return func
+    return register
+
+
+def finite_or_zero(x):
+    return np.where(np.isfinite(x), x, 0)
+
+
+def weighted_avg_by_year(values, weights, year):
+    """Per-year weighted mean of `values`, broadcast back to every row."""
+    return grouped_weighted_mean(values, weights, by=year)
+
+
+# --- Shot misses and offensive rebounding ---
+
+@metric('_rim_misses', ['AtRimFGA', 'AtRimFGM'])
+def _(fga, fgm): return fga - fgm
+
+@metric('_short_mid_misses', ['ShortMidRangeFGA', 'ShortMidRangeFGM'])
+def _(fga, fgm): return fga - fgm
+
+@metric('_long_mid_misses', ['LongMidRangeFGA', 'LongMidRangeFGM'])
+def _(fga, fgm): return fga - fgm
+
+@metric('_three_misses', ['Corner3FGA', 'Arc3FGA', 'Corner3FGM', 'Arc3FGM'])
+def _(c3a, a3a, c3m, a3m): return c3a + a3a - c3m - a3m
+
+@metric('TotalMisses', ['_rim_misses', '_short_mid_misses', '_long_mid_misses', '_three_misses'])
+def _(rim, short, long, three): return rim + short + long + three
+
+@metric('TotalOffRebounds', ['_rim_misses', 'AtRimOffReboundedPct', '_short_mid_misses', 'ShortMidRangeOffReboundedPct',
+                             '_long_mid_misses', 'LongMidRangeOffReboundedPct', '_three_misses', 'ThreePtOffReboundedPct'])
+def _(rim, rim_pct, short, short_pct, long, long_pct, three, three_pct):
+    return rim * rim_pct + short * short_pct + long * long_pct + three * three_pct
+
+@metric('ProbabilityOffRebounded', ['TotalOffRebounds', 'TotalMisses'])
+def _(orebs, misses): return (orebs / misses) * 100
+
+@metric('totalORB', ['OffThreePtRebounds', 'OffTwoPtRebounds'])
+def _(three, two): return three + two
+
+@metric('total_team_misses', ['totalORB', 'OffFGReboundPct'])
+def _(orb, pct): return orb / pct
+
+@metric('SelfOReb/100', ['SelfOReb', 'OffPoss'])
+def _(self_oreb, off_poss): return (self_oreb / 100) * off_poss
+
+@metric('total_teammate_misses', ['total_team_misses', 'FGA', 'FGM'])
+def _(team_misses, fga, fgm): return team_misses - (fga - fgm)
+
+@metric('teammatemissorb', ['totalORB', 'SelfOReb'])
+def _(orb, self_oreb): return orb - self_oreb
+
+@metric('TeammateMissORebPerc', ['teammatemissorb', 'total_teammate_misses'])
+def _(orebs, misses): return finite_or_zero(orebs / misses)
+
+
+# --- Free throw trips and true shooting attempts ---
+
+@metric('_two_pt_ft_trips', ['TwoPtShootingFoulsDrawn', AND1_2])
+def _(fouls, and1): return fouls - and1
+
+@metric('_three_pt_ft_trips', ['ThreePtShootingFoulsDrawn', AND1_3])
+def _(fouls, and1): return fouls - and1
+
+@metric('Shooting_FT_Possessions', ['_two_pt_ft_trips', '_three_pt_ft_trips'])
+def _(two, three): return two + three
+
+@metric('NonShooting_FT_Possessions', ['NonShootingFoulsDrawn'])
+def _(fouls): return fouls
+
+@metric('FT_Possessions', ['Shooting_FT_Possessions', 'NonShooting_FT_Possessions'])
+def _(shooting, non_shooting): return shooting + non_shooting
+
+@metric('FT_PERC', ['FtPoints', 'FTA'])
+def _(ft_points, fta): return ft_points / fta
+
+@metric('2TSA', ['FG2A', '_two_pt_ft_trips', 'NonShootingFoulsDrawn'])
+def _(fg2a, trips, non_shooting): return fg2a + trips + non_shooting
+
+@metric('2FTA', ['_two_pt_ft_trips', AND1_2, 'NonShootingFoulsDrawn'])
+def _(trips, and1, non_shooting): return trips * 2 + and1 + non_shooting * 2
+
+@metric('3TSA', ['FG3A', '_three_pt_ft_trips'])
+def _(fg3a, trips): return fg3a + trips
+
+@metric('3FTA', ['_three_pt_ft_trips', AND1_3])
+def _(trips, and1): return trips * 3 + and1
+
+@metric('2FTPoints', ['2FTA', 'FT_PERC'])
+def _(fta, pct): return fta * pct
+
+@metric('3FTPoints', ['3FTA', 'FT_PERC'])
+def _(fta, pct): return fta * pct
+
+@metric('2_Points', ['2FTPoints', 'FG2M'])
+def _(ft_points, fg2m): return ft_points + fg2m * 2
+
+@metric('3_Points', ['3FTPoints', 'FG3M'])
+def _(ft_points, fg3m): return ft_points + fg3m * 3
+
+@metric('2TS_percent', ['2_Points', '2TSA'])
+def _(points, tsa): return points / (2 * tsa)
+
+@metric('3TS_percent', ['3_Points', '3TSA'])
+def _(points, tsa): return points / (2 * tsa)
+
+
+# --- Shooting volume and efficiency ---
+
+@metric('FGA', ['FG2A', 'FG3A'])
+def _(fg2a, fg3a): return fg2a + fg3a
+
+@metric('FGM', ['FG2M', 'FG3M'])
+def _(fg2m, fg3m): return fg2m + fg3m
+
+@metric('2P_PERC', ['FG2M', 'FG2A'])
+def _(fgm, fga): return fgm / fga
+
+@metric('3P_PERC', ['FG3M', 'FG3A'])
+def _(fgm, fga): return finite_or_zero(fgm / fga)
+
+@metric('FTA_100', ['FTA', 'OffPoss'])
+def _(fta, off_poss): return fta / off_poss * 100
+
+@metric('2PA_100', ['FG2A', 'OffPoss'])
+def _(fga, off_poss): return fga / off_poss * 100
+
+@metric('3PA_100', ['FG3A', 'OffPoss'])
+def _(fga, off_poss): return fga / off_poss * 100
+
+@metric('FG3A100', ['FG3A', 'OffPoss'])
+def _(fga, off_poss): return (fga / off_poss) * 100
+
+@metric('TSA', ['FGA', 'FT_Possessions'])
+def _(fga, ft_poss): return fga + ft_poss
+
+@metric('TSA100', ['TSA', 'OffPoss'])
+def _(tsa, off_poss): return 100 * (tsa / off_poss)
+
+@metric('_tech_points', [TECH])
+def _(trips): return trips * 0.8
+
+@metric('mod_points', ['Points', '_tech_points'])
+def _(points, tech): return points - tech
+
+@metric('TS%', ['Points', 'TSA'])
+def _(points, tsa): return points / (2 * tsa)
+
+@metric('TS_percent', ['mod_points', 'TSA'])
+def _(points, tsa): return points / (2 * tsa)
+
+@metric('TS_pct', ['mod_points', 'TSA'])
+def _(points, tsa): return points / (2 * tsa)
+
+@metric('diff_in_points', ['FTA', 'FT_PERC'])
+def _(fta, pct): return fta * 0.85 - fta * pct
+
+@metric('TS_eightyfive', ['Points', 'diff_in_points', '_tech_points', 'TSA'])
+def _(points, diff, tech, tsa): return (points + diff - tech) / (2 * tsa)
+
+@metric('nontech_TS_percent', ['Points', TECH, 'FT_PERC', 'TSA'])
+def _(points, trips, pct, tsa): return (points - (trips * pct)) / (2 * tsa)
+
+@metric('mod_ts', ['mod_points', 'TSA', 'SelfOReb'])
+def _(points, tsa, self_oreb): return points / (2 * (tsa - self_oreb))
+
+
+# --- League-relative shooting ---
+
+@metric('mod_ts_avg', ['mod_ts', 'TSA', 'year'])
+def _(ts, tsa, year): return weighted_avg_by_year(ts, tsa, year)
+
+@metric('2ts_avg', ['2TS_percent', '2TSA', 'year'])
+def _(ts, tsa, year): return weighted_avg_by_year(ts, tsa, year)
+
+@metric('3ts_avg', ['3TS_percent', '3TSA', 'year'])
+def _(ts, tsa, year): return weighted_avg_by_year(ts, tsa, year)
+
+@metric('2rTS', ['2TS_percent', '2ts_avg'])
+def _(ts, avg): return ts - avg
+
+@metric('3rTS', ['3TS_percent', '3ts_avg'])
+def _(ts, avg): return ts - avg
+
+@metric('mod_rTS', ['mod_ts', 'mod_ts_avg'])
+def _(ts, avg): return (ts - avg) * 100
+
+@metric('avg_ts', ['year'], uses_context=True)
+def _(context, year):
+    return pd.Series(year).map(context['avg_ts_by_year']).to_numpy(dtype='float64')
+
+@metric('rTSPct', ['TS_pct', 'avg_ts'])
+def _(ts, avg): return (ts - avg) * 100
+
+@metric('rTSPct', ['TS_pct', 'OPP_TS_PCT'], playoffs=True)
+def _(ts, opp_ts): return (ts - (opp_ts / 100)) * 100
+
+
+# --- Per-game, per-possession and turnover rates ---
+
+@metric('PPG', ['Points', 'GamesPlayed'])
+def _(points, games): return points / games
+
+@metric('APG', ['Assists', 'GamesPlayed'])
+def _(assists, games): return assists / games
+
+@metric('MPG', ['Minutes', 'GamesPlayed'])
+def _(minutes, games): return minutes / games
+
+@metric('Pts75', ['Points', 'OffPoss'])
+def _(points, off_poss): return np.round((points / off_poss) * 75, 3)
+
+@metric('_scoring_tovs', ['Turnovers', 'BadPassTurnovers', 'BadPassOutOfBoundsTurnovers'])
+def _(tovs, bad_pass, bad_pass_oob): return tovs - bad_pass - bad_pass_oob
+
+@metric('final_bp_tov_100', ['BadPassTurnovers', 'BadPassOutOfBoundsTurnovers', 'OffPoss'])
+def _(bad_pass, bad_pass_oob, off_poss): return ((bad_pass + bad_pass_oob) / off_poss) * 100
+
+@metric('scoring_tov_100', ['_scoring_tovs', 'OffPoss'])
+def _(tovs, off_poss): return (tovs / off_poss) * 100
+
+@metric('tov_100', ['Turnovers', 'OffPoss'])
+def _(tovs, off_poss): return tovs / off_poss * 100
+
+@metric('nonPassTOVPct', ['_scoring_tovs', 'TSA'])
+def _(tovs, tsa): return (tovs / tsa) * 100
+
+@metric('firstchanceperc', ['FirstChancePoints', 'SecondChancePoints'])
+def _(first, second): return first / (first + second)
+
+
+def lookup(name, playoffs=False):
+    if playoffs and name in PLAYOFF_REGISTRY:
+        return PLAYOFF_REGISTRY[name]
+    return REGISTRY.get(name)
+
+
+def evaluate_metrics(df, outputs, playoffs=False, context=None):
+    """
+    Compute the requested metrics from the columns of `df`.
+
+    Args:
+        df: Frame supplying every base column the outputs depend on
+        outputs: Metric names to return
+        playoffs: Use the playoff variant of a metric where one is registered
+        context: Extra inputs for metrics that need them (e.g. 'avg_ts_by_year')
+
+    Returns:
+        Dict of output name -> NumPy array aligned with `df`
+    """
+    values = {}
+
+    def resolve(name, path=()):
+        if name in values:
+            return values[name]
+        if name in path:
+            raise ValueError(f"Metric dependency cycle: {' -> '.join(path + (name,))}")
+        m = lookup(name, playoffs)
+        if m is None:
+            values[name] = df[name].to_numpy()
+        else:
+            args = [resolve(i, path + (name,)) for i in m.inputs]
+            if m.uses_context:
+                args.insert(0, context or {})
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values[name] = m.func(*args)
+        return values[name]
+
+    return {name: resolve(name) for name in outputs}
+
+
+def attach_columns(df, columns):
+    """
+    Set every column of `columns` (name -> values aligned with `df`) on `df`.
+
+    Columns `df` already has are overwritten in place, keeping their
+    position; the rest are appended in dict order by a single concat instead
+    of one insert each, which would fragment the frame.
+
+    Returns:
+        The frame holding every column (a new frame if any were appended)
+    """
+    new_cols = {}
+    for name, values in columns.items():
+        if name in df.columns:
+            df[name] = values
+        else:
+            new_cols[name] = values
+    if new_cols:
+        df = pd.concat([df, pd.DataFrame(new_cols, index=df.index)], axis=1)
+    return df
@@ -0,0 +1,84 @@
+"""
+Shared player-name normalization.
+
+Names are lowercased, reduced to ASCII and stripped of everything but
+letters, digits and spaces. Columns are factorized so each distinct name is
+normalized once with vectorized .str kernels, and results are memoized in a
+process-wide dictionary that can be persisted between runs. Use
+normalize_names for any name-based join (bballref 'player', pbpstats 'Name',
+PLAYER1_NAME in pbp_data, ...).
+"""
+import os
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+NAME_CACHE_PATH = 'name_cache.csv'
+
+_cache = {}
+_dirty = False
+
+
+def normalize_name(name):
+    if not isinstance(name, str): return ""
+    name = name.lower()
+    name = unicodedata.normalize('NFKD', name).encode('ASCII', 'ignore').decode('ASCII')
+    name = re.sub(r'[^a-z0-9 ]', '', name)
+    return name.strip()
+
+
+def _normalize_unique(names):
+    """Vectorized normalize_name over a list of distinct names."""
+    return (pd.Series(names, dtype=object)
+              .str.lower()
+              .str.normalize('NFKD')
+              .str.encode('ascii', 'ignore')
+              .str.decode('ascii')
+              .str.replace(r'[^a-z0-9 ]', '', regex=True)
+              .str.strip()
+              .fillna("")
+              .tolist())
+
+
+def normalize_names(values):
+    """
+    Normalize a column of names, touching each distinct name at most once.
+
+    Args:
+        values: Series (or array-like) of raw names; non-strings normalize to ""
+
+    Returns:
+        Series of normalized names aligned with `values`
+    """
+    global _dirty
+    values = values if isinstance(values, pd.Series) else pd.Series(values)
+    codes, uniques = pd.factorize(values)
+
+    missing = [u for u in uniques if u not in _cache]
+    if missing:
+        _cache.update(zip(missing, _normalize_unique(missing)))
+        _dirty = True
+
+    # Trailing "" is picked up by code -1 (missing values)
+    lookup = np.array([_cache[u] for u in uniques] + [""], dtype=object)
+    return pd.Series(lookup[codes], index=values.index, dtype=object)
+
+
+def load_cache(path=NAME_CACHE_PATH):
+    """Seed the memo from a previous run's cache file."""
+    global _dirty
+    if os.path.exists(path):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        _cache.update(zip(df['name'], df['norm_name']))
+        _dirty = False
+
+
+def save_cache(path=NAME_CACHE_PATH):
+    """Write the memo out if any new names were normalized since it was loaded."""
+    global _dirty
+    if _dirty:
+        names = sorted(k for k in _cache if isinstance(k, str))
+        pd.DataFrame({'name': names, 'norm_name': [_cache[k] for k in names]}).to_csv(path, index=False)
+        _dirty = False
@@ -0,0 +1,222 @@
+"""
+Opt-in sampling profiler for any pipeline entry point.
+
+`--profile [DIR]` on a script, or PIPELINE_PROFILE=<dir> in its environment,
+starts a background thread that every INTERVAL_S records the main thread's
+Python stack, weighted by the wall time since the previous sample. At exit
+the samples are written to {DIR}/{script}-{time}-{pid}.folded as collapsed
+stacks ("script;outer;...;inner microseconds", the input of flamegraph.pl,
+inferno or speedscope) and to a .txt summary of the top functions by self
+and total time. The summary has one table for the whole run and one per
+section, a section being the innermost @traced function (see perf_trace) on
+the stack, e.g. merge_data.process_season or league_context.build_league_context.
+`pipeline.py --profile` profiles every stage it runs and merges them into
+run.folded and run.txt with one section per pipeline stage.
+
+Nothing is instrumented, so the cost is one stack walk every 10 ms, about
+50 us for a 60-frame stack or 0.5% of the run. Only the
+main thread is sampled: work in thread or process pools shows up as the main
+thread waiting on the pool.
+
+    python perf_profile.py summary FILE.folded [FILE.folded ...] [--top 25]
+"""
+import argparse
+import atexit
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from perf_trace import TRACED_CODE
+
+PROFILE_ENV = 'PIPELINE_PROFILE'
+PROFILE_DIR = 'profiles'
+INTERVAL_S = 0.01
+TOP_N = 25
+# Samples outside every @traced function
+UNTRACED = '(untraced)'
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_state = {'thread': None, 'path': None, 'script': None, 'interval': INTERVAL_S, 'started': None, 'samples': 0}
+_stop = threading.Event()
+# (section, code objects outermost first) -> microseconds
+_stacks = {}
+_names = {}
+
+
+def add_argument(parser):
+    """Add the --profile [DIR] option every entry point takes."""
+    parser.add_argument('--profile', nargs='?', const=PROFILE_DIR, metavar='DIR',
+                        help=f"sample this run and write a collapsed-stack file and hot-function summary "
+                             f"to DIR (default {PROFILE_DIR}/)")
+
+
+def _frame_name(code):
+    """'module.qualname' of a code object, modules named from the repo root or site-packages."""
+    name = _names.get(code)
+    if name is None:
+        path = code.co_filename
+        if path.startswith(REPO_DIR + os.sep):
+            module = os.path.relpath(path, REPO_DIR)
+        elif 'site-packages' + os.sep in path:
+            module = path.split('site-packages' + os.sep, 1)[1]
+        else:
+            module = os.path.basename(path)
+        module = os.path.splitext(module)[0].replace(os.sep, '.')
+        module = module[:-len('.__init__')] if module.endswith('.__init__') else module
+        name = _names[code] = f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+    return name
+
+
+def _sample(thread_id, interval):
+    last = time.perf_counter()
+    while not _stop.wait(interval):
+        frame = sys._current_frames().get(thread_id)
+        now = time.perf_counter()
+        # Weighted by elapsed time: a sample delayed by a long call that holds the GIL still counts in full
+        weight, last = int((now - last) * 1e6), now
+        section, stack = None, []
+        while frame is not None:
+            code = frame.f_code
+            if section is None and code in TRACED_CODE:
+                section = TRACED_CODE[code]
+            stack.append(code)
+            frame = frame.f_back
+        key = (section or UNTRACED, tuple(reversed(stack)))
+        _stacks[key] = _stacks.get(key, 0) + weight
+        _state['samples'] += 1
+
+
+def start(directory, interval=INTERVAL_S):
+    """Start sampling the main thread; the profile is written to `directory` at exit. None does nothing."""
+    if directory is None or _state['thread'] is not None:
+        return
+    script = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    thread = threading.Thread(target=_sample, args=(threading.main_thread().ident, interval),
+                              name='perf_profile', daemon=True)
+    _state.update(thread=thread, path=os.path.join(directory, f"{script}-{stamp}-{os.getpid()}"),
+                  started=time.perf_counter(), interval=interval, script=script)
+    thread.start()
+    atexit.register(stop)
+
+
+def stop():
+    """Stop sampling and write the .folded and .txt files; returns the path of the summary or None."""
+    thread = _state['thread']
+    if thread is None or _stop.is_set():
+        return None
+    _stop.set()
+    thread.join()
+    if not _stacks:
+        return None
+    wall = time.perf_counter() - _state['started']
+    sections = {}
+    for (section, codes), weight in _stacks.items():
+        stack = (_state['script'],) + tuple(_frame_name(code) for code in codes)
+        for name in [None, section]:
+            stacks = sections.setdefault(name, {})
+            stacks[stack] = stacks.get(stack, 0) + weight
+    os.makedirs(os.path.dirname(_state['path']) or '.', exist_ok=True)
+    write_folded(sections[None], f"{_state['path']}.folded")
+    header = (f"{' '.join(sys.argv)}\n{_state['samples']} samples every {_state['interval'] * 1000:.0f} ms over "
+              f"{wall:.1f} s; one section per innermost @traced function\n")
+    titled = {'all': sections.pop(None)}
+    titled.update(sorted(sections.items(), key=lambda item: -sum(item[1].values())))
+    path = f"{_state['path']}.txt"
+    with open(path, 'w') as f:
+        f.write(header + format_sections(titled))
+    return path
+
+
+def write_folded(stacks, path):
+    with open(path, 'w') as f:
+        for stack, weight in sorted(stacks.items()):
+            f.write(f"{';'.join(stack)} {weight}\n")
+    return path
+
+
+def read_folded(path):
+    """{stack tuple: microseconds} of a collapsed-stack file."""
+    stacks = {}
+    with open(path) as f:
+        for line in f:
+            stack, weight = line.rstrip('\n').rsplit(' ', 1)
+            stack = tuple(stack.split(';'))
+            stacks[stack] = stacks.get(stack, 0) + int(weight)
+    return stacks
+
+
+def hot_functions(stacks, top=TOP_N):
+    """
+    The `top` functions by self time of one set of stacks.
+
+    Returns:
+        List of (function, self seconds, total seconds), total counting each
+        stack once however often the function recurses in it
+    """
+    own, total = {}, {}
+    for stack, weight in stacks.items():
+        own[stack[-1]] = own.get(stack[-1], 0) + weight
+        for name in set(stack):
+            total[name] = total.get(name, 0) + weight
+    ranked = sorted(own, key=lambda name: -own[name])[:top]
+    return [(name, own[name] / 1e6, total[name] / 1e6) for name in ranked]
+
+
+def format_sections(sections, top=TOP_N):
+    """One hot-function table per {title: stacks} entry."""
+    lines = []
+    for title, stacks in sections.items():
+        seconds = sum(stacks.values()) / 1e6
+        lines.append(f"\n== {title}: {seconds:.2f} s ==")
+        lines.append(f"{'self_s':>9} {'self%':>6} {'total_s':>9} {'total%':>6}  function")
+        for name, own, total in hot_functions(stacks, top):
+            lines.append(f"{own:9.3f} {own / seconds:6.1%} {total:9.3f} {total / seconds:6.1%}  {name}")
+    return '\n'.join(lines) + '\n'
+
+
+def by_script(paths, section_names=None):
+    """
+    The stacks of several .folded files, all together under 'all' and then
+    one section per script (each stack's root frame), titled by
+    `section_names` {script: title} where given.
+    """
+    sections = {'all': {}}
+    for path in paths:
+        for stack, weight in read_folded(path).items():
+            for title in ['all', (section_names or {}).get(stack[0], stack[0])]:
+                stacks = sections.setdefault(title, {})
+                stacks[stack] = stacks.get(stack, 0) + weight
+    merged = sections.pop('all')
+    return {'all': merged, **dict(sorted(sections.items(), key=lambda item: -sum(item[1].values())))}
+
+
+def merge_profiles(paths, out_base, section_names=None, top=TOP_N):
+    """Combine the .folded files of several processes into {out_base}.folded and a per-script {out_base}.txt."""
+    sections = by_script(paths, section_names)
+    write_folded(sections['all'], f"{out_base}.folded")
+    with open(f"{out_base}.txt", 'w') as f:
+        f.write(f"{len(paths)} profile(s): {', '.join(os.path.basename(p) for p in paths)}\n"
+                + format_sections(sections, top))
+    return f"{out_base}.txt"
+
+
+if os.environ.get(PROFILE_ENV):
+    start(os.environ[PROFILE_ENV])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize collapsed-stack profiles.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    summary_parser = sub.add_parser('summary', help="top functions of one or more .folded files, per script")
+    summary_parser.add_argument('paths', nargs='+', metavar='FILE')
+    summary_parser.add_argument('--top', type=int, default=TOP_N, help="functions listed per section")
+    args = parser.parse_args(argv)
+    print(format_sections(by_script(args.paths), args.top), end='')
+
+
+if __name__ == "__main__":
+    main()
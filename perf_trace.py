@@ -0,0 +1,302 @@
+"""
+Per-stage performance trace for pipeline runs.
+
+Stages and hot functions are wrapped with `stage(name)` or `@traced()`. When
+the PIPELINE_TRACE environment variable names a directory, every span records
+wall and CPU time (this process plus finished child processes, e.g. pool
+workers), the peak RSS reached by the time it closed, the DataFrame rows in and
+returned, and the CSV rows, bytes and HTTP requests issued while it was open
+(read_csv, to_csv and requests are counted only while tracing). At exit the
+run is written to {PIPELINE_TRACE}/{script}-{time}-{pid}.json in Chrome trace
+format (chrome://tracing, Perfetto) with a per-name summary that
+`python perf_trace.py diff OLD NEW` compares between runs. Without the
+variable the hooks cost one flag check per call.
+
+Spans opened inside pool worker processes are not recorded; their time
+shows up in the enclosing stage's CPU time once the pool is shut down.
+"""
+import argparse
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+TRACE_ENV = 'PIPELINE_TRACE'
+# I/O counters, added to every span open while the I/O happens
+COUNTERS = ['csv_rows_read', 'csv_rows_written', 'bytes_read', 'bytes_written', 'http_requests', 'http_bytes']
+# ru_maxrss is in KiB on Linux and bytes on macOS
+_RSS_SCALE = 1 if sys.platform == 'darwin' else 1024
+SUMMARY_FIELDS = ['calls', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rows_in', 'rows_out'] + COUNTERS
+
+# Code object of every @traced function -> its span name, for perf_profile's sections
+TRACED_CODE = {}
+
+_state = {'enabled': False, 'path': None}
+_events = []
+_open = []
+_lock = threading.Lock()
+
+
+def enabled():
+    return _state['enabled']
+
+
+def _cpu_seconds():
+    if resource is None:
+        return time.process_time()
+    own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * _RSS_SCALE / 2**20
+
+
+def _frame_rows(value):
+    """Rows of a DataFrame/Series, or of every one inside a tuple/list/dict, else 0."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_frame_rows(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_frame_rows(v) for v in value.values())
+    return 0
+
+
+def count(**amounts):
+    """Add I/O counts to every open span."""
+    if not _state['enabled']:
+        return
+    with _lock:
+        for span in _open:
+            for name, amount in amounts.items():
+                span['counters'][name] += amount
+
+
+@contextmanager
+def stage(name, **args):
+    """
+    Record the enclosed block as one span named `name`.
+
+    Yields a dict whose 'rows_in'/'rows_out' entries may be set, and whose
+    'args' take any extra detail to store with the span. Setting 'cpu_s' or
+    'peak_rss_mb' in the block replaces what this process measures (e.g. with
+    the usage of the one child process the block waited for).
+    """
+    if not _state['enabled']:
+        yield {'args': {}}
+        return
+    span = {'name': name, 'args': dict(args), 'rows_in': 0, 'rows_out': 0,
+            'counters': dict.fromkeys(COUNTERS, 0), 'tid': threading.get_ident()}
+    with _lock:
+        _open.append(span)
+    # ts is wall-clock so that spans of separate processes line up when merged
+    span['ts'] = time.time() * 1e6
+    wall, cpu = time.perf_counter(), _cpu_seconds()
+    try:
+        yield span
+    finally:
+        span['wall_s'] = time.perf_counter() - wall
+        span.setdefault('cpu_s', _cpu_seconds() - cpu)
+        span.setdefault('peak_rss_mb', _peak_rss_mb())
+        with _lock:
+            _open.remove(span)
+            _events.append(span)
+
+
+def set_usage(span, usage):
+    """Attribute the CPU time and peak RSS of a waited-for child's resource usage to `span`."""
+    span['cpu_s'] = usage.ru_utime + usage.ru_stime
+    span['peak_rss_mb'] = usage.ru_maxrss * _RSS_SCALE / 2**20
+
+
+def traced(name=None):
+    """Decorator recording every call as a span, with its DataFrame rows in and out."""
+    def decorate(func):
+        module = func.__module__
+        if module == '__main__':
+            # Name spans by the script's module whether it is run or imported
+            module = os.path.splitext(os.path.basename(getattr(sys.modules['__main__'], '__file__', 'main')))[0]
+        label = name or f"{module}.{func.__qualname__}"
+        TRACED_CODE[func.__code__] = label
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return func(*args, **kwargs)
+            with stage(label) as span:
+                span['rows_in'] = _frame_rows(args) + _frame_rows(kwargs)
+                result = func(*args, **kwargs)
+                span['rows_out'] = _frame_rows(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def _path_size(path):
+    return os.path.getsize(path) if isinstance(path, (str, os.PathLike)) and os.path.isfile(path) else 0
+
+
+def _install_hooks():
+    """Count CSV and HTTP traffic; only ever called once tracing is on."""
+    read_csv, to_csv = pd.read_csv, pd.DataFrame.to_csv
+
+    @functools.wraps(read_csv)
+    def counted_read_csv(filepath_or_buffer, *args, **kwargs):
+        df = read_csv(filepath_or_buffer, *args, **kwargs)
+        if isinstance(df, pd.DataFrame):
+            count(csv_rows_read=len(df), bytes_read=_path_size(filepath_or_buffer))
+        return df
+
+    @functools.wraps(to_csv)
+    def counted_to_csv(self, path_or_buf=None, *args, **kwargs):
+        before = path_or_buf.tell() if hasattr(path_or_buf, 'tell') else None
+        result = to_csv(self, path_or_buf, *args, **kwargs)
+        if before is not None:
+            written = path_or_buf.tell() - before
+        else:
+            written = len(result.encode()) if isinstance(result, str) else _path_size(path_or_buf)
+        count(csv_rows_written=len(self), bytes_written=written)
+        return result
+
+    pd.read_csv = counted_read_csv
+    pd.DataFrame.to_csv = counted_to_csv
+
+    try:
+        import requests
+    except ImportError:
+        return
+    request = requests.Session.request
+
+    @functools.wraps(request)
+    def counted_request(self, *args, **kwargs):
+        response = request(self, *args, **kwargs)
+        size = 0 if kwargs.get('stream') else len(response.content or b'')
+        count(http_requests=1, http_bytes=size)
+        return response
+
+    requests.Session.request = counted_request
+
+
+def enable(directory):
+    """Start tracing this process; the trace is written to `directory` at exit."""
+    if _state['enabled']:
+        return
+    script = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    _state.update(enabled=True, path=os.path.join(directory, f"{script}-{stamp}-{os.getpid()}.json"))
+    _install_hooks()
+    atexit.register(write_trace)
+
+
+def summarize(events):
+    """{span name: totals over its calls}, peak RSS being the highest seen."""
+    summary = {}
+    for e in events:
+        s = summary.setdefault(e['name'], dict.fromkeys(SUMMARY_FIELDS, 0))
+        s['calls'] += 1
+        for field in ['wall_s', 'cpu_s', 'rows_in', 'rows_out']:
+            s[field] += e[field]
+        s['peak_rss_mb'] = max(s['peak_rss_mb'], e['peak_rss_mb'] or 0)
+        for counter in COUNTERS:
+            s[counter] += e['counters'][counter]
+    return summary
+
+
+def write_trace(path=None):
+    """Write the spans recorded so far as a Chrome trace; returns the path or None."""
+    path = path or _state['path']
+    if not _events or path is None:
+        return None
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with _lock:
+        events = sorted(_events, key=lambda e: e['ts'])
+    pid = os.getpid()
+    trace = {
+        'traceEvents': [
+            {'name': e['name'], 'ph': 'X', 'ts': e['ts'], 'dur': e['wall_s'] * 1e6, 'pid': pid, 'tid': e['tid'],
+             'args': {'cpu_s': e['cpu_s'], 'peak_rss_mb': e['peak_rss_mb'], 'rows_in': e['rows_in'],
+                      'rows_out': e['rows_out'], **e['counters'], **e['args']}}
+            for e in events
+        ],
+        'displayTimeUnit': 'ms',
+        'otherData': {'argv': sys.argv, 'started': datetime.now().isoformat(timespec='seconds')},
+        'summary': summarize(events),
+    }
+    with open(path, 'w') as f:
+        json.dump(trace, f, indent=1, default=str)
+    return path
+
+
+def merge_traces(paths, out_path):
+    """Combine the traces of several processes (one pid each) into one file."""
+    merged = {'traceEvents': [], 'displayTimeUnit': 'ms', 'otherData': {'sources': list(paths)}, 'summary': {}}
+    for path in paths:
+        with open(path) as f:
+            trace = json.load(f)
+        merged['traceEvents'].extend(trace['traceEvents'])
+        for name, s in trace['summary'].items():
+            total = merged['summary'].setdefault(name, dict.fromkeys(SUMMARY_FIELDS, 0))
+            for field in SUMMARY_FIELDS:
+                total[field] = max(total[field], s[field]) if field == 'peak_rss_mb' else total[field] + s[field]
+    with open(out_path, 'w') as f:
+        json.dump(merged, f, indent=1)
+    return out_path
+
+
+def diff(old_path, new_path, threshold=0.10):
+    """
+    Per-span comparison of two traces' summaries.
+
+    Returns:
+        DataFrame of old/new wall, CPU, peak RSS and I/O per span name, with
+        'flag' set where wall or CPU time grew by more than `threshold`
+    """
+    frames = []
+    for path in [old_path, new_path]:
+        with open(path) as f:
+            frames.append(pd.DataFrame.from_dict(json.load(f)['summary'], orient='index'))
+    old, new = frames
+    table = old.join(new, how='outer', lsuffix='_old', rsuffix='_new')
+    fields = ['calls', 'wall_s', 'cpu_s', 'peak_rss_mb', 'csv_rows_read', 'http_requests']
+    table = table[[f"{field}_{side}" for field in fields for side in ['old', 'new']]]
+    table['wall_change'] = table['wall_s_new'] / table['wall_s_old'] - 1
+    grew = [(table[f"{field}_new"] > table[f"{field}_old"] * (1 + threshold)) for field in ['wall_s', 'cpu_s']]
+    table['flag'] = (grew[0] | grew[1]).map({True: 'SLOWER', False: ''})
+    return table.sort_values('wall_s_new', ascending=False)
+
+
+if os.environ.get(TRACE_ENV):
+    enable(os.environ[TRACE_ENV])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the per-stage summaries of two pipeline traces.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    diff_parser = sub.add_parser('diff', help="compare two trace files")
+    diff_parser.add_argument('old')
+    diff_parser.add_argument('new')
+    diff_parser.add_argument('--threshold', type=float, default=0.10,
+                             help="flag spans whose wall or CPU time grew by more than this fraction")
+    args = parser.parse_args(argv)
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.3f}'.format):
+        print(diff(args.old, args.new, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+Dependency-graph runner for the whole pipeline, replacing scrape.sh.
+
+Each stage declares the script it runs, the files it reads and the files it
+writes. A stage depends on every stage whose outputs match its inputs, and
+stages with no dependency between them run concurrently as subprocesses.
+
+A stage is skipped when all of its outputs exist and either every output is
+newer than every input (its code included) or its inputs hash to what
+pipeline_manifest.csv recorded after its last successful run; a stage whose
+last run failed is never skipped. The scrapes only run when an output is
+missing or with --force: editing a scraper or rewriting a file it reads (the
+schedule for pbp, wteam_index.csv for lineups) does not make its outputs
+stale, as the remote data is unchanged. --season limits the
+per-season scrapes to the given years, which may go past the default range
+(e.g. a new season); the stages after them are incremental per season
+already. With --trace every stage script writes a performance
+trace (see perf_trace.py) next to the runner's own, and the runner merges
+them into traces/<time>/run.json. With --profile every stage script is
+sampled (see perf_profile.py) and the profiles are merged into
+profiles/<time>/run.folded and run.txt, one summary section per stage.
+"""
+import argparse
+import fnmatch
+import glob
+import hashlib
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+import perf_profile
+import perf_trace
+from identity_store import file_hash
+
+MANIFEST_PATH = 'pipeline_manifest.csv'
+LOG_DIR = 'pipeline_logs'
+TRACE_DIR = 'traces'
+FAILED = 'failed'  # manifest entry of a stage whose last run failed
+YEARS = range(2009, 2026)
+
+# Paths may hold '{year}' (2024) or '{season}' (2024 and 2024ps) and glob
+# wildcards; a wildcard output that matches no file counts as missing.
+# `code` lists the modules besides the script whose edits make the stage
+# stale; None marks a scrape, whose outputs depend on the remote data only,
+# so it runs only when an output is missing or with --force.
+# `years` are the seasons a stage covers by default, from its first season on.
+# Stages with `season_arg` take --years and write only the seasons given; with
+# --season they cover every requested season from their first one, later
+# seasons than the defaults included.
+Stage = namedtuple('Stage', ['name', 'script', 'inputs', 'outputs', 'code', 'years', 'season_arg'],
+                   defaults=[None, YEARS, False])
+
+STAGES = [
+    Stage('totals', 'wnba_totals.py', [], ['data/{season}_pbp.csv', 'data/team_{season}_pbp.csv'],
+          season_arg=True),
+    Stage('bballref', 'bballref.py', [], ['data/{season}_bballref.csv'], season_arg=True),
+    Stage('schedule', 'wnba_schedule.py', [], ['data/wnba_game_dates.csv']),
+    Stage('pbp', 'async_pbp_scrape.py', ['data/wnba_game_dates.csv'], ['pbp_data/*.csv']),
+    Stage('index', 'make_index.py', ['data/*_bballref.csv', 'data/[0-9]*_pbp.csv'],
+          ['player_index_map.csv', 'wteam_index.csv', 'unmapped_players.csv'],
+          code=['identity_store.py', 'fuzzy_match.py', 'name_normalization.py']),
+    Stage('lineups', 'wnba_lineups.py', ['wteam_index.csv'], ['lineup_data/{year}/*.csv'],
+          years=range(2010, 2026), season_arg=True),
+    Stage('merge', 'merge_data.py', ['data/*_bballref.csv', 'data/*_pbp.csv', 'player_index_map.csv'],
+          ['data/*_combined.csv', 'data/wnba_master.csv', 'data/avg_shooting.csv'],
+          code=['metrics.py', 'aggregations.py', 'league_context.py', 'identity_store.py']),
+    Stage('on_off', 'lineup_calc.py', ['lineup_data/*/*.csv', 'player_index_map.csv'],
+          ['data/on_off_master.csv', 'data/on_off_wide.csv'], code=['aggregations.py', 'identity_store.py']),
+    Stage('final', 'final_merge.py', ['data/wnba_master.csv', 'data/on_off_wide.csv'],
+          ['data/updated_wnba_master.csv'], code=['identity_store.py']),
+]
+
+
+def expand(patterns, years):
+    """Every path of `patterns` for `years`, as (pattern, sorted matching paths)."""
+    expanded = []
+    for pattern in patterns:
+        if '{season}' in pattern:
+            names = [pattern.format(season=f"{year}{ps}") for year in years for ps in ['', 'ps']]
+        elif '{year}' in pattern:
+            names = [pattern.format(year=year) for year in years]
+        else:
+            names = [pattern]
+        for name in names:
+            if glob.has_magic(name):
+                expanded.append((name, sorted(glob.glob(name))))
+            else:
+                expanded.append((name, [name] if os.path.exists(name) else []))
+    return expanded
+
+
+def dependencies(stages=STAGES):
+    """{stage name: names of the stages whose outputs it reads}."""
+    def wildcard(pattern):
+        return pattern.replace('{season}', '*').replace('{year}', '*')
+
+    deps = {}
+    for stage in stages:
+        deps[stage.name] = set()
+        for other in stages:
+            if other is stage:
+                continue
+            for i in map(wildcard, stage.inputs):
+                if any(i == o or fnmatch.fnmatch(o, i) or fnmatch.fnmatch(i, o) for o in map(wildcard, other.outputs)):
+                    deps[stage.name].add(other.name)
+    return deps
+
+
+def inputs_hash(paths):
+    """SHA-256 over the name and contents of every path."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        digest.update(file_hash(path).encode())
+    return digest.hexdigest()
+
+
+def load_pipeline_manifest(path=MANIFEST_PATH):
+    """Return {stage name: input_hash} from the manifest file."""
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path, dtype=str)
+    return dict(zip(df['stage'], df['input_hash']))
+
+
+def save_pipeline_manifest(manifest, path=MANIFEST_PATH):
+    rows = [{'stage': k, 'input_hash': manifest[k]} for k in sorted(manifest)]
+    pd.DataFrame(rows, columns=['stage', 'input_hash']).to_csv(path, index=False)
+
+
+class Plan:
+    """One run's view of a stage: its paths and script arguments for the selected years."""
+
+    def __init__(self, stage, years=None):
+        self.stage = stage
+        if years is None:
+            self.years = list(stage.years)
+        else:
+            # Any requested season from the stage's first one on, later seasons than the defaults included
+            self.years = sorted({y for y in years if y >= min(stage.years)})
+        targeted = stage.season_arg and years is not None
+        self.args = ['--years'] + [str(y) for y in self.years] if targeted else []
+
+    @property
+    def idle(self):
+        """True for a per-season stage none of the requested seasons falls in, which never runs."""
+        return self.stage.season_arg and not self.years
+
+    def input_paths(self):
+        paths = [p for _, found in expand(self.stage.inputs, self.years) for p in found]
+        if self.stage.code is not None:
+            paths += [self.stage.script] + list(self.stage.code)
+        return paths
+
+    def status(self, manifest):
+        """(up_to_date, reason, input hash or None)."""
+        outputs = expand(self.stage.outputs, self.years)
+        missing = [name for name, found in outputs if not found]
+        if self.idle:
+            return True, "no selected seasons", None
+        if missing:
+            return False, f"missing {missing[0]}" + (f" (+{len(missing) - 1})" if len(missing) > 1 else ''), None
+        if manifest.get(self.stage.name) == FAILED:
+            return False, "last run failed", None
+        inputs = self.input_paths()
+        # A scrape's local inputs only order it after the stages that write them
+        if not inputs or self.stage.code is None:
+            return True, "outputs present", None
+        oldest_output = min(os.path.getmtime(p) for _, found in outputs for p in found)
+        if oldest_output >= max(os.path.getmtime(p) for p in inputs):
+            return True, "outputs newer than inputs", None
+        digest = inputs_hash(inputs)
+        if manifest.get(self.stage.name) == digest:
+            return True, "inputs unchanged", digest
+        return False, "inputs changed", digest
+
+
+def run_stage(plan, log_dir=LOG_DIR, env=None):
+    """Run the stage's script, logging to {log_dir}/{stage}.log; returns (returncode, seconds)."""
+    os.makedirs(log_dir, exist_ok=True)
+    with perf_trace.stage(f"pipeline.{plan.stage.name}", script=plan.stage.script, years=plan.args[1:]) as span:
+        start = time.perf_counter()
+        with open(os.path.join(log_dir, f"{plan.stage.name}.log"), 'w') as log:
+            proc = subprocess.Popen([sys.executable, plan.stage.script] + plan.args, stdout=log,
+                                    stderr=subprocess.STDOUT, env=env)
+            if hasattr(os, 'wait4'):
+                # The stage's own CPU time and peak RSS, which concurrent stages would blur otherwise
+                _, status, usage = os.wait4(proc.pid, 0)
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                perf_trace.set_usage(span, usage)
+            else:
+                proc.wait()
+        # The script's I/O is in its own trace; what the span counted is the runner's manifest writes
+        span['counters'] = dict.fromkeys(perf_trace.COUNTERS, 0)
+        span['args']['returncode'] = proc.returncode
+    return proc.returncode, time.perf_counter() - start
+
+
+def selected_stages(targets, deps):
+    """Names of `targets` and every stage upstream of them, in STAGES order."""
+    wanted = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in wanted:
+            wanted.add(name)
+            stack.extend(deps[name])
+    return [stage for stage in STAGES if stage.name in wanted]
+
+
+def run_pipeline(targets=None, years=None, jobs=4, force=(), dry_run=False, trace_dir=None, profile_dir=None):
+    """
+    Bring `targets` (default every stage) and their upstream stages up to date.
+
+    Args:
+        targets: Stage names to build
+        years: Seasons the per-season stages cover, default each stage's own
+            (YEARS); requested seasons past those are scraped too
+        jobs: Stages run at once
+        force: Stage names to run even when up to date ('all' for every stage)
+        dry_run: Only report which stages are stale right now
+        trace_dir: Directory to write the stages' performance traces to, merged into run.json
+        profile_dir: Directory to write the stages' sampling profiles to, merged into run.folded
+            and run.txt
+
+    Returns:
+        {stage name: 'ran', 'skipped', 'failed' or 'blocked'}; ValueError
+        when `years` leaves a named stage, or every per-season stage, with
+        no season to run
+    """
+    deps = dependencies()
+    stages = selected_stages(targets or [stage.name for stage in STAGES], deps)
+    plans = {stage.name: Plan(stage, years) for stage in stages}
+    forced = {stage.name for stage in stages} if 'all' in force else set(force)
+    if years is not None:
+        seasons = ', '.join(map(str, years))
+        # A stage named on the command line must have seasons to run; 'all' only the ones that do
+        named = (set(targets or []) | set(force)) & set(plans)
+        empty = sorted(name for name in named if plans[name].idle)
+        if empty:
+            raise ValueError(f"{', '.join(empty)} covers none of the seasons {seasons}")
+        if all(plan.idle for plan in plans.values() if plan.stage.season_arg):
+            raise ValueError(f"no per-season stage covers the seasons {seasons}")
+        forced = {name for name in forced if name not in plans or not plans[name].idle}
+    manifest = load_pipeline_manifest()
+
+    if dry_run:
+        for name, plan in plans.items():
+            fresh, reason, _ = plan.status(manifest)
+            action = 'run' if name in forced or not fresh else 'skip'
+            reason = 'forced' if name in forced else reason
+            after = ', '.join(sorted(deps[name] & set(plans))) or '-'
+            print(f"{name:>9}: {action:<4} {reason:<28} after {after}")
+        return {}
+
+    env = None
+    if trace_dir is not None:
+        perf_trace.enable(trace_dir)
+        env = dict(os.environ, **{perf_trace.TRACE_ENV: trace_dir})
+    if profile_dir is not None:
+        env = dict(env or os.environ, **{perf_profile.PROFILE_ENV: profile_dir})
+
+    results = {}
+    pending = list(plans)
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in list(pending):
+                upstream = deps[name] & set(plans)
+                if any(results.get(d) in ('failed', 'blocked') for d in upstream):
+                    results[name] = 'blocked'
+                    pending.remove(name)
+                    print(f"[{name}] blocked by a failed upstream stage")
+                    continue
+                if not all(results.get(d) in ('ran', 'skipped') for d in upstream) or len(running) >= jobs:
+                    continue
+                pending.remove(name)
+                fresh, reason, digest = plans[name].status(manifest)
+                if fresh and name not in forced:
+                    results[name] = 'skipped'
+                    print(f"[{name}] up to date ({reason})")
+                    continue
+                inputs = plans[name].input_paths()
+                digest = digest or (inputs_hash(inputs) if inputs else None)
+                print(f"[{name}] running {plans[name].stage.script} {' '.join(plans[name].args)}".rstrip()
+                      + f" ({'forced' if name in forced else reason})")
+                running[pool.submit(run_stage, plans[name], env=env)] = (name, digest)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, digest = running.pop(future)
+                returncode, seconds = future.result()
+                if returncode == 0:
+                    results[name] = 'ran'
+                    if digest is not None:
+                        manifest[name] = digest
+                        save_pipeline_manifest(manifest)
+                    print(f"[{name}] done in {seconds:.1f} s")
+                else:
+                    # Outputs it left behind may be newer than its inputs; keep it stale until it succeeds
+                    results[name] = 'failed'
+                    manifest[name] = FAILED
+                    save_pipeline_manifest(manifest)
+                    print(f"[{name}] failed with exit code {returncode} after {seconds:.1f} s, "
+                          f"see {os.path.join(LOG_DIR, name + '.log')}")
+    if trace_dir is not None:
+        perf_trace.write_trace()
+        traces = sorted(p for p in glob.glob(os.path.join(trace_dir, '*.json')) if not p.endswith('run.json'))
+        if traces:
+            print(f"Trace written to {perf_trace.merge_traces(traces, os.path.join(trace_dir, 'run.json'))}")
+    if profile_dir is not None:
+        profiles = sorted(p for p in glob.glob(os.path.join(profile_dir, '*.folded')) if not p.endswith('run.folded'))
+        if profiles:
+            # One section per stage, titled by stage name; each stage's own .txt splits it by function
+            titles = {os.path.splitext(plan.stage.script)[0]: f"{name} ({plan.stage.script})"
+                      for name, plan in plans.items()}
+            summary = perf_profile.merge_profiles(profiles, os.path.join(profile_dir, 'run'), titles)
+            print(f"Profile written to {summary}")
+    return results
+
+
+def main(argv=None):
+    names = [stage.name for stage in STAGES]
+    parser = argparse.ArgumentParser(description="Run the pipeline stages that are out of date.")
+    parser.add_argument('targets', nargs='*', metavar='STAGE',
+                        help=f"stages to bring up to date with everything upstream of them "
+                             f"(default all: {', '.join(names)})")
+    parser.add_argument('--season', type=int, nargs='+', help="limit the per-season scrapes to these years")
+    parser.add_argument('--jobs', type=int, default=4, help="run up to this many independent stages at once")
+    parser.add_argument('--force', nargs='+', default=[], choices=names + ['all'], metavar='STAGE',
+                        help="run these stages even if up to date ('all' for every stage)")
+    parser.add_argument('--dry-run', action='store_true', help="only report which stages are out of date")
+    parser.add_argument('--trace', action='store_true',
+                        help=f"write a performance trace of every stage run to {TRACE_DIR}/<time>/")
+    parser.add_argument('--profile', action='store_true',
+                        help=f"sample every stage run and write flame graph stacks and hot-function summaries "
+                             f"to {perf_profile.PROFILE_DIR}/<time>/")
+    args = parser.parse_args(argv)
+    unknown = [t for t in args.targets if t not in names]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    start = time.perf_counter()
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    trace_dir = os.path.join(TRACE_DIR, stamp) if args.trace else None
+    profile_dir = os.path.join(perf_profile.PROFILE_DIR, stamp) if args.profile else None
+    try:
+        results = run_pipeline(args.targets, years=args.season, jobs=args.jobs, force=args.force,
+                               dry_run=args.dry_run, trace_dir=trace_dir, profile_dir=profile_dir)
+    except ValueError as e:
+        parser.error(f"--season: {e}")
+    print(f"Done in {time.perf_counter() - start:.1f} s")
+    return 1 if any(r in ('failed', 'blocked') for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
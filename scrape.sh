@@ -1,4 +1 @@
-python wnba_totals.py
-python bballref.py
-python make_index.py
-python merge_data.py
\ No newline at end of file
+python pipeline.py "$@"
@@ -0,0 +1,36 @@
+"""
+group_sums must give bit for bit what Series.sum gives on each group's rows,
+which the published yearly averages and league baselines were computed with.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregations import group_sums, grouped_weighted_mean
+
+
+@pytest.fixture
+def grouped_values():
+    # Group sizes from 0 to 600 cross NumPy's 8-wide unrolled and 128-row pairwise blocks,
+    # and values over nine orders of magnitude make the summation order show in the last bit
+    rng = np.random.default_rng(7)
+    sizes = np.concatenate([np.arange(0, 140), [255, 256, 257, 600], np.zeros(5, dtype=int)])
+    codes = rng.permutation(np.repeat(np.arange(len(sizes)), sizes))
+    values = [rng.normal(size=len(codes)) * 10 ** rng.uniform(-3, 6, len(codes)) for _ in range(2)]
+    return codes, len(sizes), values
+
+
+def test_group_sums_match_series_sum_bit_for_bit(grouped_values):
+    codes, n_groups, values = grouped_values
+    for column, sums in zip(values, group_sums(codes, n_groups, *values)):
+        expected = np.array([pd.Series(column[codes == g]).sum() for g in range(n_groups)], dtype='float64')
+        assert sums.tobytes() == expected.tobytes()
+
+
+def test_grouped_weighted_mean_matches_groupby_apply(grouped_values):
+    codes, _, (values, weights) = grouped_values
+    weights = np.abs(weights)
+    df = pd.DataFrame({'g': codes, 'v': values, 'w': weights})
+    means = df.groupby('g').apply(lambda d: (d['v'] * d['w']).sum() / d['w'].sum(), include_groups=False)
+    expected = df['g'].map(means).to_numpy(dtype='float64')
+    assert grouped_weighted_mean(values, weights, by=codes).tobytes() == expected.tobytes()
@@ -0,0 +1,41 @@
+"""
+The checked-in on/off tables must be what lineup_calc computes now: every
+row of a few team-seasons is recomputed from lineup_data/ and compared with
+data/on_off_master.csv and data/on_off_wide.csv through the same CSV round
+trip, bit for bit.
+"""
+import io
+
+import pandas as pd
+import pytest
+
+import lineup_calc
+from conftest import REPO_DIR
+
+TEAM_SEASONS = [('2010', 1611661313), ('2018ps', 1611661320), ('2024', 1611661330)]
+
+
+def round_trip(df):
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)), float_precision='round_trip')
+
+
+def checked_in(path, year_season, team_id):
+    df = pd.read_csv(path, float_precision='round_trip', dtype={'year_season': str})
+    return df[(df['year_season'] == year_season) & (df['team_id'] == team_id)].reset_index(drop=True)
+
+
+@pytest.mark.parametrize('year_season, team_id', TEAM_SEASONS)
+def test_on_off_tables_are_current(monkeypatch, year_season, team_id):
+    monkeypatch.chdir(REPO_DIR)
+    index = pd.read_csv('player_index_map.csv', dtype={'year_season': str})
+    players = index[(index['year_season'] == year_season) & (index['team_id'] == team_id)]
+    assert len(players)
+    long, wide = lineup_calc.process_team_season((year_season, team_id, players[['player_id', 'EntityId']]))
+
+    expected = checked_in(lineup_calc.ON_OFF_PATH, year_season, team_id)
+    pd.testing.assert_frame_equal(round_trip(pd.DataFrame(long)).astype({'year_season': str}), expected,
+                                  check_exact=True, check_dtype=False)
+    wide = pd.DataFrame(wide).drop_duplicates(lineup_calc.WIDE_KEYS)
+    expected = checked_in(lineup_calc.ON_OFF_WIDE_PATH, year_season, team_id)
+    pd.testing.assert_frame_equal(round_trip(wide).astype({'year_season': str}), expected,
+                                  check_exact=True, check_dtype=False)
@@ -0,0 +1,39 @@
+"""
+combination_table groups combinations the same way whether it packs them
+into int64 keys or, when those would overflow, takes unique rows.
+"""
+import numpy as np
+import pytest
+
+import lineup_combos
+from conftest import REPO_DIR
+
+
+@pytest.fixture
+def archive(monkeypatch):
+    monkeypatch.chdir(REPO_DIR)
+    seasons = [season for season in lineup_combos.team_seasons() if season[0] in ('2024', '2024ps')][:3]
+    return lineup_combos.load_archive(seasons)
+
+
+@pytest.mark.parametrize('size', [2, 3])
+def test_unique_rows_match_packed_keys(archive, monkeypatch, size):
+    packed = lineup_combos.combination_table(*archive, size)
+    monkeypatch.setattr(lineup_combos, 'MAX_KEY', 0)
+    rows = lineup_combos.combination_table(*archive, size)
+    assert len(packed[0]) > 0
+    for a, b in zip(packed, rows):
+        assert np.array_equal(np.asarray(a), np.asarray(b))
+
+
+
+def test_unmapped_players_drop_their_combinations():
+    seasons = [('2024', 1611661313)]
+    members = np.array([[10, 11], [10, 12], [11, 12]])
+    codes = np.zeros(3, dtype=np.int64)
+    sums = np.ones((3, len(lineup_combos.TOTAL_COLUMNS + lineup_combos.COUNT_COLUMNS)))
+    player_ids = {('2024', '10'): 'a', ('2024', '11'): 'b'}
+    table = lineup_combos.combination_frame(seasons, members, codes, np.array([4, 5, 6]), sums, player_ids)
+    assert table['EntityId'].tolist() == ['10-11']
+    assert table['player_id'].tolist() == ['a-b']
+    assert table['lineups'].tolist() == [4]
@@ -0,0 +1,109 @@
+"""
+Incremental make_index runs must write exactly what --rebuild writes, on a
+copy of four checked-in seasons.
+"""
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import make_index
+from conftest import REPO_DIR
+
+SEASONS = ['2021', '2021ps', '2022', '2022ps', '2023', '2023ps', '2024', '2024ps']
+OUTPUTS = [make_index.INDEX_PATH, make_index.TEAM_INDEX_PATH, make_index.UNMAPPED_PATH, 'player_identity_store.csv',
+           'index_manifest.csv']
+
+
+@pytest.fixture
+def seasons_dir(tmp_path, monkeypatch):
+    os.mkdir(tmp_path / 'data')
+    for label in SEASONS:
+        for name in [f"{label}_bballref.csv", f"{label}_pbp.csv"]:
+            shutil.copy(os.path.join(REPO_DIR, 'data', name), tmp_path / 'data')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def outputs():
+    result = {}
+    for path in OUTPUTS:
+        with open(path, 'rb') as f:
+            result[path] = f.read()
+    return result
+
+
+def rebuilt_outputs():
+    make_index.build_index(rebuild=True)
+    return outputs()
+
+
+def edit_pbp(label, func):
+    path = f"data/{label}_pbp.csv"
+    df = pd.read_csv(path)
+    func(df)
+    df.to_csv(path, index=False)
+
+
+def test_unchanged_inputs_are_not_rewritten(seasons_dir):
+    make_index.build_index(rebuild=True)
+    before = {path: os.stat(path).st_mtime_ns for path in OUTPUTS}
+    make_index.build_index()
+    assert {path: os.stat(path).st_mtime_ns for path in OUTPUTS} == before
+
+
+def test_rematched_historical_season_matches_rebuild(seasons_dir):
+    make_index.build_index(rebuild=True)
+
+    # A new EntityId for one player in 2022 only: 2022 re-matches her by name,
+    # and 2023 then finds the 2022 id missing and goes back to the old one
+    def new_id(df):
+        df.loc[df['Name'] == 'Kelsey Plum', 'EntityId'] = 9999999
+    edit_pbp('2022', new_id)
+    make_index.build_index()
+    incremental = outputs()
+    assert incremental == rebuilt_outputs()
+    index = pd.read_csv(make_index.INDEX_PATH, dtype={'year_season': str})
+    plum = index[index['ref_name'] == 'Kelsey Plum'].set_index('year_season')['EntityId']
+    assert plum['2022'] == 9999999 and plum['2023'] == plum['2021'] != 9999999
+
+
+def test_renamed_player_matches_rebuild(seasons_dir):
+    make_index.build_index(rebuild=True)
+
+    def rename(df):
+        df.loc[df['Name'] == 'Sabrina Ionescu', 'Name'] = 'S. Ionescu-Smith'
+    edit_pbp('2021', rename)
+    make_index.build_index()
+    assert outputs() == rebuilt_outputs()
+
+
+def test_removed_season_matches_rebuild(seasons_dir):
+    make_index.build_index(rebuild=True)
+    os.remove('data/2022_pbp.csv')
+    make_index.build_index()
+    assert outputs() == rebuilt_outputs()
+
+
+def test_new_season_is_seeded_from_the_identity_store(seasons_dir, monkeypatch):
+    for label in ['2024', '2024ps']:
+        for kind in ['bballref', 'pbp']:
+            os.rename(f"data/{label}_{kind}.csv", f"{label}_{kind}.csv")
+    make_index.build_index(rebuild=True)
+    for label in ['2024', '2024ps']:
+        for kind in ['bballref', 'pbp']:
+            os.rename(f"{label}_{kind}.csv", f"data/{label}_{kind}.csv")
+
+    # Only the new seasons are matched, on top of the persisted store rather than replayed index rows
+    matched = []
+    match_players, stored_matches = make_index.match_players, make_index.stored_matches
+    monkeypatch.setattr(make_index, 'stored_matches', lambda rows: pytest.fail("replayed index rows"))
+    monkeypatch.setattr(make_index, 'match_players',
+                        lambda ref, pbp, label: matched.append(label) or match_players(ref, pbp, label))
+    make_index.build_index()
+    assert matched == ['2024', '2024ps']
+    incremental = outputs()
+    monkeypatch.setattr(make_index, 'match_players', match_players)
+    monkeypatch.setattr(make_index, 'stored_matches', stored_matches)
+    assert incremental == rebuilt_outputs()
@@ -0,0 +1,35 @@
+"""
+--season selections: seasons past the default range reach the per-season
+scrapes, and a selection that leaves a stage with no season is an error
+rather than a bare --years.
+"""
+import pytest
+
+import pipeline
+
+STAGES = {stage.name: stage for stage in pipeline.STAGES}
+
+
+def test_season_past_default_range_is_scraped():
+    assert pipeline.Plan(STAGES['totals'], [2026]).args == ['--years', '2026']
+    assert pipeline.Plan(STAGES['lineups'], [2026, 2025]).args == ['--years', '2025', '2026']
+    assert pipeline.Plan(STAGES['totals']).args == []
+
+
+def test_season_before_a_stage_starts_leaves_it_idle():
+    plan = pipeline.Plan(STAGES['lineups'], [2009])
+    assert plan.idle and plan.status({}) == (True, "no selected seasons", None)
+    assert not pipeline.Plan(STAGES['totals'], [2009]).idle
+
+
+@pytest.mark.parametrize('targets, force', [(None, ['lineups']), (['lineups'], [])])
+def test_named_stage_without_seasons_is_an_error(tmp_path, monkeypatch, targets, force):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError, match='lineups'):
+        pipeline.run_pipeline(targets, years=[2009], force=force, dry_run=True)
+
+
+def test_main_rejects_seasons_no_stage_covers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(SystemExit):
+        pipeline.main(['--season', '2008', '--dry-run'])
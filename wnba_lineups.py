@@ -1,45 +1,21 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import argparse
 import pandas as pd
-import requests
-import plotly.graph_objects as go
-import math
-from scipy import stats
-import string
-import numpy as np
 import time
-from scipy.stats import zscore
-import sys
 import os
-import glob
 
-start_time = time.time()
-SEASONYEAR = 2025
-directory = f"lineup_data/{SEASONYEAR}"
-ps = False
-
-# Use glob to find all CSV files in the directory
-csv_files = glob.glob(os.path.join(directory, "*.csv"))
-
-# Loop through the list of files and delete based on `ps`
-
-'''
-for file in csv_files:
-    filename = os.path.basename(file)
-    if (ps and '_ps' in filename) or (not ps and '_ps' not in filename):
-        try:
-            os.remove(file)
-            print(f"Deleted: {file}")
-        except Exception as e:
-            print(f"Error deleting {file}: {e}")
-print("Relevant CSV files deleted.")
-'''
+import perf_profile
+from perf_trace import traced
 
-time.sleep(1)
+SEASONYEAR = 2025
 
 
+@traced()
 def lineuppull(team_id, season, opp=False, ps=False):
+    import requests
+
     term = "Opponent" if opp else "Team"
     s_type = "Playoffs" if ps else "Regular Season"
 
@@ -85,6 +61,7 @@ def get_filename(team_id, year, opp=False, ps=False):
     return filename
 
 
+@traced()
 def pull_onoff(years, opp=False, ps=False):
     count = 0
     # Read WNBA team index
@@ -154,27 +131,40 @@ def pull_onoff(years, opp=False, ps=False):
     return pd.concat(all_frames) if all_frames else pd.DataFrame()
 
 
-# Run the data pulls
-years = [i for i in range(SEASONYEAR, SEASONYEAR+1)]
-print(years)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pull team and opponent lineup files from pbpstats.")
+    parser.add_argument('--years', type=int, nargs='+',
+                        help=f"seasons to pull (default {SEASONYEAR}, then 2010-{SEASONYEAR - 1})")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
+    start_time = time.time()
+
+    # Run the data pulls
+    years = args.years or [i for i in range(SEASONYEAR, SEASONYEAR+1)]
+    print(years)
+
+    # Pull regular season data
+    pull_onoff(years, opp=False, ps=False)
+    pull_onoff(years, opp=True, ps=False)
 
-# Pull regular season data
-df = pull_onoff(years, opp=False, ps=False) 
-df = pull_onoff(years, opp=True, ps=False) 
+    # Pull playoff data
+    pull_onoff(years, opp=False, ps=True)
+    pull_onoff(years, opp=True, ps=True)
 
-# Pull playoff data
-df_ps = pull_onoff(years, opp=False, ps=True) 
-df_ps = pull_onoff(years, opp=True, ps=True) 
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    print(f"Time taken: {elapsed_time} seconds")
 
-end_time = time.time()
-elapsed_time = end_time - start_time
-print(f"Time taken: {elapsed_time} seconds")
+    if not args.years:
+        # Optionally pull historical years
+        years = [i for i in range(2010, SEASONYEAR)]
+        pull_onoff(years, opp=False, ps=False)
+        pull_onoff(years, opp=True, ps=False)
 
-# Optionally pull historical years
-years = [i for i in range(2010, SEASONYEAR)]
-df = pull_onoff(years, opp=False, ps=False) 
-df = pull_onoff(years, opp=True, ps=False)
+        pull_onoff(years, opp=False, ps=True)
+        pull_onoff(years, opp=True, ps=True)
 
 
-df = pull_onoff(years, opp=False, ps=True) 
-df = pull_onoff(years, opp=True, ps=True)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
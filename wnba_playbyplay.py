@@ -1,9 +1,14 @@
+import argparse
 import pandas as pd
-import requests
 import os
 import time
 
+import perf_profile
+
+
 def scrape_pbp_data():
+    import requests
+
     # 1. Setup Input/Output
     input_file = 'data/wnba_game_dates.csv'
     output_dir = 'pbp_data'
@@ -102,5 +107,14 @@ def scrape_pbp_data():
 
     print("Scrape complete.")
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch the play-by-play of every game in data/wnba_game_dates.csv, one at a time.")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
+    scrape_pbp_data()
+
+
 if __name__ == "__main__":
-    scrape_pbp_data()
\ No newline at end of file
+    main()
@@ -1,8 +1,14 @@
-import requests
+import argparse
 import pandas as pd
 import time
 
+import perf_profile
+from perf_trace import traced
+
+@traced()
 def scrape_wnba_schedules():
+    import requests
+
     all_games_data = []
     
     # Headers are necessary because the WNBA/NBA APIs often block generic scripts
@@ -66,5 +72,14 @@ def scrape_wnba_schedules():
     else:
         print("No data collected.")
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch the WNBA schedule of every season to data/wnba_game_dates.csv.")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
+    scrape_wnba_schedules()
+
+
 if __name__ == "__main__":
-    scrape_wnba_schedules()
\ No newline at end of file
+    main()
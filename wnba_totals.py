@@ -1,12 +1,15 @@
 # Define the API URL
 
+import argparse
 import pandas as pd
-import requests
 import sys
 import os
 import time
 from datetime import datetime
 
+import perf_profile
+from perf_trace import traced
+
 url = "https://api.pbpstats.com/get-totals/wnba"
 
 # Get the current year
@@ -14,6 +17,7 @@ current_year = datetime.now().year
 
 # Iterate over seasons from 2001 to current year
 
+@traced()
 def fetch_wnba_data(start_year, end_year, season_type='rs', data_type='Player', save_to_csv=True):
     """
     Fetch WNBA player or team stats from the PBP Stats API for a given range of seasons and season type.
@@ -28,6 +32,8 @@ def fetch_wnba_data(start_year, end_year, season_type='rs', data_type='Player',
     Returns:
     - List of DataFrames containing the fetched data for each season.
     """
+    import requests
+
     # Define the API URL
     url = "https://api.pbpstats.com/get-totals/wnba"
 
@@ -82,26 +88,37 @@ def fetch_wnba_data(start_year, end_year, season_type='rs', data_type='Player',
     return all_data
 
 
-os.makedirs("data", exist_ok=True)
-
-for year in range(2009, 2026):  # inclusive of 2025
-    for season_string in ["rs", "ps"]:
-        # Fetch Player data
-        print(f"Fetching {year} {season_string} Player data...")
-        player_data = fetch_wnba_data(
-            year,
-            year,
-            season_type=season_string,
-            data_type='Player',
-            save_to_csv=True
-        )
-        
-        # Fetch Team data
-        print(f"Fetching {year} {season_string} Team data...")
-        team_data = fetch_wnba_data(
-            year,
-            year,
-            season_type=season_string,
-            data_type='Team',
-            save_to_csv=True
-        )
\ No newline at end of file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch pbpstats player and team totals for each season.")
+    parser.add_argument('--years', type=int, nargs='+', default=list(range(2009, 2026)),
+                        help="seasons to fetch, regular season and playoffs (default 2009-2025)")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
+    os.makedirs("data", exist_ok=True)
+
+    for year in args.years:
+        for season_string in ["rs", "ps"]:
+            # Fetch Player data
+            print(f"Fetching {year} {season_string} Player data...")
+            player_data = fetch_wnba_data(
+                year,
+                year,
+                season_type=season_string,
+                data_type='Player',
+                save_to_csv=True
+            )
+            
+            # Fetch Team data
+            print(f"Fetching {year} {season_string} Team data...")
+            team_data = fetch_wnba_data(
+                year,
+                year,
+                season_type=season_string,
+                data_type='Team',
+                save_to_csv=True
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+With-or-without-you (WOWY) queries over one team-season's lineups.
+
+Every lineup carries a bitmask of the roster players in it and the lineup
+stats sit in one (lineups x columns) array, so any boolean combination of
+players is a vectorized mask over the lineups followed by one matrix product.
+Each answer has the calculate_basketball_percentages metric set, with the
+rebound rates weighted by misses as in the on/off pipeline.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import perf_profile
+from lineup_calc import WEIGHT_MAPPING, load_lineups, membership_matrix, percentage_metrics
+
+WORD_BITS = 64
+# Sample size reported next to the metrics
+SAMPLE_COLUMNS = ['OffPoss', 'DefPoss']
+PAIR_SPLITS = ['together', 'a_without_b', 'b_without_a', 'neither']
+
+
+class WowyIndex:
+    """Player bitmasks and stat columns for one team-season, queried by player_id."""
+
+    def __init__(self, lineups, players):
+        """
+        Args:
+            lineups: The team-season's load_lineups() frame
+            players: Its player_index_map.csv rows (player_id, EntityId)
+        """
+        self.player_ids = players['player_id'].tolist()
+        self.position = {pid: i for i, pid in enumerate(self.player_ids)}
+        membership = membership_matrix(lineups['EntityId'].astype(str).tolist(),
+                                       players['EntityId'].astype(str).tolist()).tocoo()
+        n_words = max(1, -(-len(self.player_ids) // WORD_BITS))
+        self.bits = np.zeros((n_words, len(lineups)), dtype=np.uint64)
+        np.bitwise_or.at(self.bits, (membership.row // WORD_BITS, membership.col),
+                         np.left_shift(np.uint64(1), (membership.row % WORD_BITS).astype(np.uint64)))
+
+        numeric = lineups.select_dtypes(include=['number', 'bool'])
+        self.columns = list(numeric.columns)
+        # Each weighted rebound rate sums as two extra columns: value * weight and weight
+        self.rates = [val_col for val_col in WEIGHT_MAPPING if val_col in lineups.columns]
+        rate_parts = []
+        for val_col in self.rates:
+            weights = lineups[WEIGHT_MAPPING[val_col]].to_numpy(dtype='float64')
+            products = lineups[val_col].to_numpy(dtype='float64') * weights
+            rate_parts += [np.where(np.isnan(products), 0.0, products), np.where(np.isnan(weights), 0.0, weights)]
+        self.values = np.column_stack([numeric.to_numpy(dtype='float64', na_value=0.0), *rate_parts])
+
+    @classmethod
+    def load(cls, year_season, team_id, index=None):
+        """
+        Index a team-season from lineup_data/ and the player index.
+
+        Args:
+            year_season: Season label, e.g. '2024' or '2024ps'
+            team_id: Team id of the lineup files
+            index: player_index_map.csv frame; read from disk when None
+
+        Returns:
+            WowyIndex, or None when the team-season has no lineup file
+        """
+        lineups = load_lineups(year_season, team_id)
+        if lineups is None:
+            return None
+        if index is None:
+            index = pd.read_csv('player_index_map.csv')
+        players = index[(index['year_season'].astype(str) == str(year_season)) & (index['team_id'] == int(team_id))]
+        return cls(lineups, players)
+
+    def player_bits(self, player_ids):
+        """Bitmask words with every player in `player_ids` set."""
+        words = np.zeros(len(self.bits), dtype=np.uint64)
+        for pid in player_ids:
+            i = self.position[pid]
+            words[i // WORD_BITS] |= np.uint64(1) << np.uint64(i % WORD_BITS)
+        return words
+
+    def has(self, player_id):
+        """Boolean mask of the lineups `player_id` is in; combine with &, | and ~."""
+        i = self.position[player_id]
+        return (self.bits[i // WORD_BITS] >> np.uint64(i % WORD_BITS)) & np.uint64(1) == 1
+
+    def lineups(self, on=(), off=()):
+        """Boolean mask of the lineups with every player in `on` and none in `off`."""
+        on_bits, off_bits = self.player_bits(on)[:, None], self.player_bits(off)[:, None]
+        return (((self.bits & on_bits) == on_bits) & ((self.bits & off_bits) == 0)).all(axis=0)
+
+    def evaluate(self, masks):
+        """
+        Metrics over the lineups selected by each boolean mask.
+
+        Args:
+            masks: One (lineups,) mask, or a (queries x lineups) stack of them
+
+        Returns:
+            {metric: value} for one mask, {metric: array} for a stack
+        """
+        masks = np.asarray(masks)
+        totals = np.moveaxis(masks.astype('float64') @ self.values, -1, 0)
+        n_columns = len(self.columns)
+        sums = dict(zip(self.columns, totals[:n_columns]))
+        result = {'lineups': masks.sum(axis=-1)}
+        result.update({col: sums[col] for col in SAMPLE_COLUMNS if col in sums})
+        result.update(percentage_metrics(sums))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for k, val_col in enumerate(self.rates):
+                numerator, denominator = totals[n_columns + 2 * k], totals[n_columns + 2 * k + 1]
+                result[val_col] = np.where(denominator == 0, 0.0, numerator / denominator)
+        if masks.ndim == 1:
+            return {metric: np.asarray(value).item() for metric, value in result.items()}
+        return result
+
+    def query(self, on=(), off=()):
+        """Metrics with every player in `on` on the floor and every player in `off` sitting."""
+        return self.evaluate(self.lineups(on, off))
+
+    def query_many(self, queries):
+        """
+        Answer a batch of (on, off) queries with one matrix product.
+
+        Returns:
+            DataFrame with one row per query, in order
+        """
+        masks = np.array([self.lineups(on, off) for on, off in queries]).reshape(len(queries), -1)
+        result = pd.DataFrame({metric: np.broadcast_to(values, len(queries))
+                               for metric, values in self.evaluate(masks).items()})
+        result.insert(0, 'on', ['-'.join(on) for on, _ in queries])
+        result.insert(1, 'off', ['-'.join(off) for _, off in queries])
+        return result
+
+    def pairs(self):
+        """
+        Every pair of players split four ways: together, each without the
+        other, and neither.
+
+        Returns:
+            DataFrame with player_a, player_b, split and the metric columns
+        """
+        n_players = len(self.player_ids)
+        on = np.array([self.has(pid) for pid in self.player_ids]).reshape(n_players, -1)
+        a, b = np.triu_indices(n_players, k=1)
+        masks = np.stack([on[a] & on[b], on[a] & ~on[b], ~on[a] & on[b], ~on[a] & ~on[b]], axis=1)
+        masks = masks.reshape(-1, on.shape[1])
+        result = pd.DataFrame({metric: np.broadcast_to(values, len(masks))
+                               for metric, values in self.evaluate(masks).items()})
+        ids = np.array(self.player_ids, dtype=object)
+        result.insert(0, 'player_a', np.repeat(ids[a], len(PAIR_SPLITS)))
+        result.insert(1, 'player_b', np.repeat(ids[b], len(PAIR_SPLITS)))
+        result.insert(2, 'split', np.tile(PAIR_SPLITS, len(a)))
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="With-or-without-you splits for one team-season.")
+    parser.add_argument('year_season', help="season label, e.g. 2024 or 2024ps")
+    parser.add_argument('team_id', type=int)
+    parser.add_argument('--on', nargs='*', default=[], help="player_ids that must be on the floor")
+    parser.add_argument('--off', nargs='*', default=[], help="player_ids that must be off the floor")
+    parser.add_argument('--pairs', metavar='CSV', help="write every pair's splits to this file instead")
+    perf_profile.add_argument(parser)
+    args = parser.parse_args(argv)
+    perf_profile.start(args.profile)
+
+    wowy = WowyIndex.load(args.year_season, args.team_id)
+    if wowy is None:
+        print(f"Error: no lineup data for team {args.team_id} in {args.year_season}.")
+    elif args.pairs:
+        wowy.pairs().to_csv(args.pairs, index=False)
+        print(f"Wrote {len(wowy.player_ids)} players' pair splits to {args.pairs}")
+    else:
+        for metric, value in wowy.query(args.on, args.off).items():
+            print(f"{metric:>20}: {value}")
+
+
+if __name__ == "__main__":
+    main()